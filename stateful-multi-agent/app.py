@@ -1,37 +1,91 @@
 import asyncio
+import os
+import queue
+import threading
+import uuid
+
 import streamlit as st
 from customer_service_agent.agent import customer_service_agent
 from dotenv import load_dotenv
+from event_log import set_event_sink
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from utils import add_user_query_to_history, call_agent_async
+from session_snapshot import SnapshotSessionService
+from sqlite_session_service import SqliteSessionService
+from state_transaction import TransactionalSessionService, session_turn
+from utils import add_user_query_to_history, call_agent_async, set_display_level
+from worker_pool import WorkerPool
 
 # Load environment variables
 load_dotenv()
 
+# Nobody reads the server console state dump or agent trace in the web app
+set_display_level(os.getenv("STATE_DISPLAY_LEVEL", "off"))
+set_event_sink(os.getenv("EVENT_SINK", "off"))
+
 # --- App Configuration ---
 st.set_page_config(page_title="Customer Service Chat", page_icon="🤖")
 st.title("Customer Service Chat")
 st.write("Welcome! I'm here to help with sales, course support, and policy questions. How can I assist you today?")
 
-# --- Initialization (runs once per session) ---
-@st.cache_resource
+APP_NAME = "Customer Support"
+
+# Set AGENT_WORKERS=N to serve turns from N worker processes instead of this one
+AGENT_WORKERS = int(os.getenv("AGENT_WORKERS", "0"))
+
+# --- Initialization (runs once per server process) ---
+def stop_loop(loop):
+    loop.call_soon_threadsafe(loop.stop)
+
+@st.cache_resource(on_release=stop_loop)
+def background_loop():
+    """One long-lived event loop, shared by every browser session.
+
+    Turns are submitted to it with run_coroutine_threadsafe, so there is no
+    per-turn loop setup and different users' turns overlap.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="agent-event-loop", daemon=True).start()
+    return loop
+
+def close_services(services):
+    # Runs when the app is shut down or the cache is cleared,
+    # properly closing the database connection.
+    session_service, _ = services
+    session_service.close()
+
+@st.cache_resource(on_release=close_services)
 def initialize_services():
-    """Initialize services and define cleanup logic."""
-    session_service = InMemorySessionService()
+    """Initialize the session service and the runner shared by all users."""
+    # SESSION_SNAPSHOT_PATH keeps sessions in memory, snapshotted to that file
+    if os.getenv("SESSION_SNAPSHOT_PATH"):
+        session_store = SnapshotSessionService(
+            os.getenv("SESSION_SNAPSHOT_PATH"),
+            interval=float(os.getenv("SESSION_SNAPSHOT_INTERVAL", "60")),
+        )
+    else:
+        session_store = SqliteSessionService(os.getenv("SESSION_DB_PATH", "sessions.db"))
+    session_service = TransactionalSessionService(session_store)
     runner = Runner(
         agent=customer_service_agent,
-        app_name="Customer Support",
+        app_name=APP_NAME,
         session_service=session_service,
     )
-    try:
-        yield session_service, runner
-    finally:
-        # This block will be executed when the app is shut down
-        # or the cache is cleared, properly closing the connection.
-        asyncio.run(runner.close())
+    return session_service, runner
+
+def close_pool(pool):
+    pool.close()
 
-session_service, runner = initialize_services()
+@st.cache_resource(on_release=close_pool)
+def worker_pool():
+    """Worker processes with their own runners, sharing the SQLite store."""
+    return WorkerPool(AGENT_WORKERS, os.getenv("SESSION_DB_PATH", "sessions.db"), APP_NAME)
+
+if AGENT_WORKERS:
+    pool = worker_pool()
+else:
+    pool = None
+    loop = background_loop()
+    session_service, runner = initialize_services()
 
 # Define the initial state for a new user session
 initial_state = {
@@ -41,16 +95,22 @@ initial_state = {
 }
 
 # --- Session State Management ---
-# Ensure a session is created and stored in Streamlit's session state
-if "session_id" not in st.session_state:
-    new_session = session_service.create_session(
-        app_name="Customer Support",
-        user_id="streamlit_user", # A generic ID for all web users
-        state=initial_state,
-    )
-    st.session_state.session_id = new_session.id
+# The web UI is per tab: each browser tab gets its own random user id and
+# session, kept server-side in st.session_state. Without authentication there
+# is no identity to resume a conversation under, so a reload starts over.
+if "user_id" not in st.session_state:
+    st.session_state.user_id = f"web_{uuid.uuid4().hex}"
     st.session_state.messages = [] # To store chat history
 
+def create_session(user_id):
+    """Create a session for this tab; returns its id."""
+    if pool:
+        # Created on the worker that will serve the session's turns
+        return pool.create_session(user_id, initial_state).result()
+    return session_service.create_session(
+        app_name=APP_NAME, user_id=user_id, state=initial_state
+    ).id
+
 # --- Chat History Display ---
 # Display previous messages from the chat history
 for message in st.session_state.messages:
@@ -58,28 +118,84 @@ for message in st.session_state.messages:
         st.markdown(message["content"])
 
 # --- Main Chat Logic ---
-async def run_chat_turn(prompt: str):
+class StreamingTurn:
+    """Runs one agent turn in the background and yields its output as it arrives.
+
+    Iterating gives ``(agent_name, text)`` pairs; text is empty when another
+    agent takes over. ``response_text`` holds the final answer afterwards.
+    """
+
+    def __init__(self, prompt: str, user_id: str, session_id: str):
+        self.prompt = prompt
+        self.user_id = user_id
+        self.session_id = session_id
+        self.response_text = None
+        self._chunks = queue.Queue()
+
+    def _on_partial(self, agent_name, text):
+        # Called on the event loop (or worker pool) thread; the queue hands
+        # chunks to Streamlit
+        self._chunks.put((agent_name, text))
+
+    async def _run(self):
+        async with session_turn(session_service, APP_NAME, self.user_id, self.session_id):
+            add_user_query_to_history(
+                session_service, APP_NAME, self.user_id, self.session_id, self.prompt
+            )
+            return await call_agent_async(
+                runner=runner,
+                session_id=self.session_id,
+                user_id=self.user_id,
+                query=self.prompt,
+                on_partial=self._on_partial,
+            )
+
+    def __iter__(self):
+        if pool:
+            future = pool.run_turn(
+                self.user_id, self.session_id, self.prompt, on_partial=self._on_partial
+            )
+        else:
+            future = asyncio.run_coroutine_threadsafe(self._run(), loop)
+        future.add_done_callback(lambda _: self._chunks.put(None))
+        while (item := self._chunks.get()) is not None:
+            yield item
+        self.response_text = future.result()
+
+
+def run_chat_turn(prompt: str):
     """Handles a single turn of the chat conversation."""
+    # Only tabs that actually chat get a session in the store
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = create_session(st.session_state.user_id)
+
     # Add user message to chat history
     st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # Get agent response
+    # Stream the agent response as it is generated
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            response_text = await call_agent_async(
-                runner=runner,
-                session_id=st.session_state.session_id,
-                user_id="streamlit_user",
-                query=prompt,
-            )
+        status = st.empty()
+        status.caption("Thinking...")
+        turn = StreamingTurn(prompt, st.session_state.user_id, st.session_state.session_id)
+
+        def text_chunks():
+            for agent_name, text in turn:
+                status.caption(f"{agent_name} is responding...")
+                if text:
+                    yield text
+
+        streamed = st.write_stream(text_chunks())
+        response_text = turn.response_text
+        if not streamed:
+            # Nothing was streamed (e.g. a cached answer); show the final text
             st.markdown(response_text)
+        status.empty()
 
     # Add agent response to chat history
     st.session_state.messages.append({"role": "assistant", "content": response_text})
 
 # --- User Input ---
 if prompt := st.chat_input("What can I help you with?"):
-    # Streamlit requires running async functions with asyncio.run()
-    asyncio.run(run_chat_turn(prompt))
+    run_chat_turn(prompt)
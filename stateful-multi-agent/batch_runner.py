@@ -0,0 +1,301 @@
+"""Batch conversation runner for QA replay and offline evaluation.
+
+Reads scripted conversations from a JSONL file, one per line:
+
+    {"id": "qa-1", "user_id": "u1", "session_id": "s1",
+     "state": {"user_name": "Jane"}, "turns": ["What courses do you offer?", "..."]}
+
+Only ``turns`` is required. Each conversation gets a fresh session (an
+existing ``session_id`` is replaced), so session ids must be unique within a
+file. Conversations run on one shared Runner, at most ``--concurrency`` at a
+time, and the input is read as it is consumed, so files of any size work.
+
+One JSON line is appended to the output per finished conversation, in the
+order they finish:
+
+    {"id": "qa-1", "line": 1, "user_id": "u1", "session_id": "s1",
+     "turns": [{"query": "...", "agent": "sales_agent", "response": "..."}],
+     "error": null, "duration_ms": 1234.5}
+
+The output doubles as the checkpoint: with ``--resume``, input lines that
+already have a result are skipped and an unfinished last line is dropped, so
+an interrupted run can be restarted with the same command.
+
+A turn whose agent run fails ends its conversation: the turn is the last one
+listed, with a null response, and ``error`` says what went wrong.
+
+Usage:
+    python batch_runner.py conversations.jsonl --output results.jsonl --concurrency 20
+    python batch_runner.py conversations.jsonl --output results.jsonl --resume
+"""
+
+import argparse
+import asyncio
+import contextlib
+import copy
+import json
+import os
+import sys
+import time
+
+from customer_service_agent.agent import customer_service_agent
+from customer_service_agent.records import DICT_TYPES
+from dotenv import load_dotenv
+from event_log import set_event_sink
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from interaction_log import forget_interaction_log, get_interaction_log
+from sqlite_session_service import SqliteSessionService
+from state_transaction import TransactionalSessionService, session_turn
+from utils import add_user_query_to_history, call_agent_async, set_display_level
+
+load_dotenv()
+
+APP_NAME = "Customer Support"
+DEFAULT_USER_ID = "batch_user"
+
+# State every conversation starts from; a record's "state" is merged on top
+INITIAL_STATE = {
+    "user_name": "Valued Customer",
+    "purchased_courses": [],
+    "interaction_history": [],
+}
+
+
+def load_checkpoint(output_path):
+    """Return the input line numbers that already have a result.
+
+    A last line cut off by an interruption is removed from the file.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    complete_size = 0
+    with open(output_path, "rb") as f:
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            complete_size += len(raw)
+            try:
+                done.add(json.loads(raw)["line"])
+            except (ValueError, KeyError, TypeError):
+                continue
+    if complete_size < os.path.getsize(output_path):
+        with open(output_path, "r+b") as f:
+            f.truncate(complete_size)
+    return done
+
+
+def read_records(input_path, done):
+    """Yield ``(line_number, record, error)`` for each input line not in ``done``."""
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip() or line_number in done:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict) or not isinstance(record.get("turns"), list):
+                yield line_number, None, "Record needs a 'turns' list"
+                continue
+            yield line_number, record, None
+
+
+class ResultWriter:
+    """Appends results to the output file as they finish, with progress on stderr."""
+
+    def __init__(self, output_path, progress_every=100):
+        self.output_path = output_path
+        self.progress_every = progress_every
+        self.written = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+        self._file = open(output_path, "a", encoding="utf-8")
+
+    def write(self, result):
+        # One write + flush per line, so an interruption loses at most this line
+        self._file.write(json.dumps(result) + "\n")
+        self._file.flush()
+        self.written += 1
+        self.failed += 1 if result["error"] else 0
+        if self.progress_every and self.written % self.progress_every == 0:
+            self.report()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        rate = self.written / elapsed if elapsed else 0.0
+        print(
+            f"{self.written} conversations done ({self.failed} failed), {rate:.1f}/s",
+            file=sys.stderr,
+        )
+
+    def close(self):
+        self._file.close()
+
+
+def _last_agent(session_service, user_id, session_id):
+    """The agent that gave the latest response in the session's history."""
+    log = get_interaction_log(session_service, APP_NAME, user_id, session_id)
+    if len(log):
+        entry = log[-1]
+        if isinstance(entry, DICT_TYPES) and entry.get("action") == "agent_response":
+            return entry.get("agent")
+    return None
+
+
+async def run_conversation(runner, line_number, record, keep_sessions):
+    """Run one record's turns in order and return its result line."""
+    session_service = runner.session_service
+    user_id = record.get("user_id") or DEFAULT_USER_ID
+    session_id = record.get("session_id") or f"batch-{line_number}"
+    result = {
+        "id": record.get("id", line_number),
+        "line": line_number,
+        "user_id": user_id,
+        "session_id": session_id,
+        "turns": [],
+        "error": None,
+    }
+    started = time.perf_counter()
+    try:
+        # Re-running a line (e.g. after --resume) starts its session over
+        forget_interaction_log(session_service, APP_NAME, user_id, session_id)
+        state = copy.deepcopy(INITIAL_STATE)
+        state.update(record.get("state") or {})
+        session_service.create_session(
+            app_name=APP_NAME, user_id=user_id, session_id=session_id, state=state
+        )
+        for query in record["turns"]:
+            turn = {"query": query, "agent": None, "response": None}
+            # A failed turn stays in the list and ends the conversation
+            result["turns"].append(turn)
+            async with session_turn(session_service, APP_NAME, user_id, session_id):
+                add_user_query_to_history(
+                    session_service, APP_NAME, user_id, session_id, query
+                )
+                turn["response"] = await call_agent_async(
+                    runner, user_id, session_id, query, raise_errors=True
+                )
+            if turn["response"]:
+                turn["agent"] = _last_agent(session_service, user_id, session_id)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if not keep_sessions:
+            # Nothing reads in-memory sessions afterwards; free them
+            session_service.delete_session(
+                app_name=APP_NAME, user_id=user_id, session_id=session_id
+            )
+            forget_interaction_log(session_service, APP_NAME, user_id, session_id)
+    result["duration_ms"] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+async def run_batch(runner, records, writer, concurrency, keep_sessions):
+    """Feed records to ``concurrency`` workers through a bounded queue.
+
+    Only a few records beyond those in flight are read ahead of the workers.
+    """
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def worker():
+        while (item := await queue.get()) is not None:
+            line_number, record, error = item
+            if error:
+                writer.write(
+                    {"id": line_number, "line": line_number, "turns": [], "error": error}
+                )
+                continue
+            writer.write(await run_conversation(runner, line_number, record, keep_sessions))
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        for item in records:
+            await queue.put(item)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+async def main_async(args):
+    if args.stub_model:
+        from benchmarks.stub_model import install_stub_models
+
+        install_stub_models(customer_service_agent, latency=args.stub_latency_ms / 1000)
+
+    if args.db:
+        inner = SqliteSessionService(args.db)
+    else:
+        inner = InMemorySessionService()
+    session_service = TransactionalSessionService(inner)
+    runner = Runner(
+        agent=customer_service_agent,
+        app_name=APP_NAME,
+        session_service=session_service,
+    )
+
+    if args.resume:
+        done = load_checkpoint(args.output)
+        print(f"Resuming: {len(done)} conversations already done", file=sys.stderr)
+    else:
+        done = set()
+        open(args.output, "w").close()
+
+    writer = ResultWriter(args.output, args.progress_every)
+    try:
+        with contextlib.ExitStack() as stack:
+            if not args.verbose:
+                # The agent trace is too verbose for thousands of conversations
+                set_event_sink("off")
+                devnull = stack.enter_context(open(os.devnull, "w"))
+                stack.enter_context(contextlib.redirect_stdout(devnull))
+            await run_batch(
+                runner,
+                read_records(args.input, done),
+                writer,
+                args.concurrency,
+                keep_sessions=bool(args.db),
+            )
+    finally:
+        writer.report()
+        writer.close()
+        close = getattr(session_service, "close", None)
+        if close:
+            close()
+    return 1 if writer.failed else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file of conversations")
+    parser.add_argument("--output", default="batch_results.jsonl", help="JSONL results file")
+    parser.add_argument("--concurrency", type=int, default=10, help="conversations in flight")
+    parser.add_argument(
+        "--resume", action="store_true", help="skip conversations already in --output"
+    )
+    parser.add_argument(
+        "--db", help="keep sessions in this SQLite file instead of discarding them"
+    )
+    parser.add_argument("--progress-every", type=int, default=100)
+    parser.add_argument("--verbose", action="store_true", help="print the agent trace")
+    parser.add_argument(
+        "--stub-model", action="store_true", help="use the offline benchmark model"
+    )
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Entry point for the batch runner."""
+    args = parse_args(argv)
+    set_display_level("off")
+    return asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""Offline end-to-end throughput benchmark.
+
+Drives Runner + customer_service_agent + utils.call_agent_async with every
+agent's model replaced by a deterministic stub, so no Gemini calls are made.
+For each starting history size it reports turns/sec, p50/p95/p99 turn
+latency and how each turn splits between our own code and the model.
+
+Usage:
+    python -m benchmarks.bench_end_to_end --history-sizes 0,100,1000,5000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.common import SCRIPTED_TURNS, percentile, quiet, synthetic_history
+from benchmarks.stub_model import install_stub_models
+
+from customer_service_agent.agent import customer_service_agent
+from customer_service_agent.router import fast_router
+from customer_service_agent.state_slices import state_slicer
+from customer_service_agent.sub_agents.policy_agent.agent import policy_cache
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from sqlite_session_service import SqliteSessionService
+from state_transaction import TransactionalSessionService, session_turn
+from utils import add_user_query_to_history, call_agent_async, set_display_level
+
+APP_NAME = "Customer Support Benchmark"
+USER_ID = "bench_user"
+
+
+def make_session_service(backend, db_path):
+    if backend == "sqlite":
+        return TransactionalSessionService(SqliteSessionService(db_path))
+    return TransactionalSessionService(InMemorySessionService())
+
+
+async def run_history_size(runner, stub_stats, history_size, turns):
+    """Run ``turns`` scripted turns on a session pre-seeded with history."""
+    session_service = runner.session_service
+    session = session_service.create_session(
+        app_name=APP_NAME,
+        user_id=USER_ID,
+        state={
+            "user_name": "Benchmark User",
+            "purchased_courses": [],
+            "interaction_history": synthetic_history(history_size),
+        },
+    )
+
+    latencies, own_times, model_times = [], [], []
+    started = time.perf_counter()
+    for turn in range(turns):
+        query = SCRIPTED_TURNS[turn % len(SCRIPTED_TURNS)]
+        model_before = stub_stats.seconds
+        turn_started = time.perf_counter()
+        with quiet():
+            async with session_turn(session_service, APP_NAME, USER_ID, session.id):
+                add_user_query_to_history(
+                    session_service, APP_NAME, USER_ID, session.id, query
+                )
+                await call_agent_async(runner, USER_ID, session.id, query)
+        elapsed = time.perf_counter() - turn_started
+        model = stub_stats.seconds - model_before
+        latencies.append(elapsed)
+        model_times.append(model)
+        own_times.append(elapsed - model)
+    total = time.perf_counter() - started
+
+    return {
+        "history_size": history_size,
+        "turns": turns,
+        "turns_per_sec": turns / total if total else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "own_ms_per_turn": sum(own_times) / turns * 1000,
+        "model_ms_per_turn": sum(model_times) / turns * 1000,
+    }
+
+
+def print_report(results):
+    header = (
+        f"{'history':>8} {'turns/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+        f"{'p99 ms':>9} {'own ms':>9} {'model ms':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['history_size']:>8} {r['turns_per_sec']:>9.1f} {r['p50_ms']:>9.2f} "
+            f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['own_ms_per_turn']:>9.2f} "
+            f"{r['model_ms_per_turn']:>9.2f}"
+        )
+
+
+async def main_async(args):
+    set_display_level(args.display_level)
+    stub_stats = install_stub_models(customer_service_agent, latency=args.latency_ms / 1000)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        runner = Runner(
+            agent=customer_service_agent,
+            app_name=APP_NAME,
+            session_service=make_session_service(
+                args.backend, os.path.join(tmp, "bench.db")
+            ),
+        )
+        results = []
+        for history_size in args.history_sizes:
+            results.append(
+                await run_history_size(runner, stub_stats, history_size, args.turns)
+            )
+
+    print_report(results)
+    stats = fast_router.stats
+    print(
+        f"\nFast-path router: {stats.hits}/{stats.queries} queries routed locally "
+        f"({stats.hit_rate:.0%}), ~{stats.saved_seconds * 1000:.1f} ms of model time saved"
+    )
+    cache = policy_cache.stats
+    print(
+        f"Policy response cache: {cache.hits} hits, {cache.misses} misses "
+        f"({cache.hit_rate:.0%})"
+    )
+    print("Instruction tokens per agent (last call, sliced vs raw state):")
+    for agent_name, row in state_slicer.report().items():
+        print(
+            f"  {agent_name:<22} {row['tokens']:>7} vs {row['raw_tokens']:>7} "
+            f"({row['calls']} calls, {row['saved_tokens']} tokens saved in total)"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=50, help="turns per history size")
+    parser.add_argument(
+        "--history-sizes",
+        type=lambda s: [int(x) for x in s.split(",")],
+        default=[0, 100, 1000, 5000],
+        help="comma-separated starting history lengths",
+    )
+    parser.add_argument(
+        "--latency-ms", type=float, default=0.0, help="simulated model latency per call"
+    )
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument(
+        "--display-level",
+        choices=["off", "summary", "diff", "full"],
+        default="full",
+        help="display_state verbosity during the run",
+    )
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    asyncio.run(main_async(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""Microbenchmarks for the functions that run on every turn.
+
+Times update_interaction_history, display_state, process_agent_response,
+purchase_course and refund_course at several history lengths and
+owned-course counts, plus building the course catalog (which renders every
+instruction fragment), and saves the results as a JSON baseline.
+The compare command flags benchmarks that got slower than a threshold.
+
+Usage:
+    python -m benchmarks.bench_micro run --output baseline.json
+    python -m benchmarks.bench_micro compare baseline.json            # runs now
+    python -m benchmarks.bench_micro compare baseline.json current.json
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from benchmarks.common import percentile, quiet, synthetic_history, synthetic_purchases
+
+from customer_service_agent.catalog import CourseCatalog, catalog
+from customer_service_agent.owned_courses import owned_index
+from customer_service_agent.sub_agents.order_agent.agent import refund_course
+from customer_service_agent.sub_agents.sales_agent.agent import purchase_course
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService
+from google.adk.sessions.state import State
+from google.genai import types
+from interaction_log import get_interaction_log
+from utils import (
+    DISPLAY_DIFF,
+    DISPLAY_FULL,
+    display_state,
+    process_agent_response,
+    set_display_level,
+    state_renderer,
+    update_interaction_history,
+)
+
+APP_NAME = "Customer Support Microbenchmark"
+USER_ID = "bench_user"
+
+# Course the tool benchmarks buy and refund; never part of synthetic_purchases
+TOOL_COURSE_ID = "ai_chatbot_mastery"
+
+
+def measure(fn, repeat, setup=None):
+    """Time ``repeat`` calls of ``fn``; ``setup`` runs untimed before each."""
+    timings = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return {
+        "runs": repeat,
+        "median_us": percentile(timings, 50) * 1e6,
+        "p95_us": percentile(timings, 95) * 1e6,
+        "min_us": min(timings) * 1e6,
+    }
+
+
+def run_coroutine(coro):
+    """Drive a coroutine that never actually suspends, without an event loop."""
+    try:
+        coro.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("coroutine suspended")
+
+
+def make_session(history_size, owned_courses):
+    """Create a session with its interaction log attached, as after turn one."""
+    session_service = InMemorySessionService()
+    session = session_service.create_session(
+        app_name=APP_NAME,
+        user_id=USER_ID,
+        state={
+            "user_name": "Benchmark User",
+            "purchased_courses": synthetic_purchases(owned_courses),
+            "interaction_history": synthetic_history(history_size),
+        },
+    )
+    get_interaction_log(session_service, APP_NAME, USER_ID, session.id)
+    return session_service, session.id
+
+
+def tool_context_for(session_service, session_id, purchased):
+    """A minimal stand-in for ToolContext: the tools only use ``.state``."""
+    session = session_service.get_session(
+        app_name=APP_NAME, user_id=USER_ID, session_id=session_id
+    )
+    session.state["purchased_courses"] = purchased
+    state = State(session.state, {})
+    # Build the owned-course index up front, as it is after the first tool call
+    owned_index(state)
+    return SimpleNamespace(state=state)
+
+
+def bench_update_interaction_history(history_size, owned_courses, repeat):
+    session_service, session_id = make_session(history_size, owned_courses)
+    return measure(
+        lambda: update_interaction_history(
+            session_service,
+            APP_NAME,
+            USER_ID,
+            session_id,
+            {"action": "user_query", "query": "How do I get a refund?"},
+        ),
+        repeat,
+    )
+
+
+def bench_display_state(level, history_size, owned_courses, repeat):
+    session_service, session_id = make_session(history_size, owned_courses)
+    log = get_interaction_log(session_service, APP_NAME, USER_ID, session_id)
+    set_display_level(level)
+    state_renderer.forget(APP_NAME, USER_ID, session_id)
+
+    def call():
+        with quiet():
+            display_state(session_service, APP_NAME, USER_ID, session_id)
+
+    def add_entry():
+        # Each diff render sees one new entry, as it would after a turn
+        log.append({"action": "user_query", "query": "next"})
+        return ()
+
+    call()
+    return measure(call, repeat, add_entry if level == DISPLAY_DIFF else None)
+
+
+def bench_process_agent_response(repeat):
+    event = Event(
+        author="sales_agent",
+        content=types.Content(
+            role="model",
+            parts=[types.Part(text="Successfully purchased AI Chatbot Mastery!")],
+        ),
+    )
+
+    # Output is written by the event log's writer thread, which keeps
+    # running between calls; quiet() flushes it when the run is over
+    with quiet():
+        return measure(lambda: run_coroutine(process_agent_response(event)), repeat)
+
+
+def bench_purchase_course(history_size, owned_courses, repeat):
+    session_service, session_id = make_session(history_size, owned_courses)
+    purchases = synthetic_purchases(owned_courses)
+    return measure(
+        lambda tool_context: purchase_course(tool_context, TOOL_COURSE_ID),
+        repeat,
+        setup=lambda: (tool_context_for(session_service, session_id, list(purchases)),),
+    )
+
+
+def bench_refund_course(history_size, owned_courses, repeat):
+    session_service, session_id = make_session(history_size, owned_courses)
+    purchases = synthetic_purchases(owned_courses)
+    # Put the refunded course last (the worst case for a linear scan)
+    purchases.append(
+        {"id": TOOL_COURSE_ID, "purchase_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")}
+    )
+    return measure(
+        lambda tool_context: refund_course(tool_context, TOOL_COURSE_ID),
+        repeat,
+        setup=lambda: (tool_context_for(session_service, session_id, list(purchases)),),
+    )
+
+
+def run_suite(history_sizes, course_counts, repeat):
+    """Run every benchmark and return ``{name: result}``."""
+    results = {}
+    owned_default = course_counts[0]
+    history_default = history_sizes[0]
+
+    for history_size in history_sizes:
+        suffix = f"[history={history_size}]"
+        results["update_interaction_history" + suffix] = bench_update_interaction_history(
+            history_size, owned_default, repeat
+        )
+        results["display_state_full" + suffix] = bench_display_state(
+            DISPLAY_FULL, history_size, owned_default, repeat
+        )
+        results["display_state_diff" + suffix] = bench_display_state(
+            DISPLAY_DIFF, history_size, owned_default, repeat
+        )
+
+    for owned_courses in course_counts:
+        suffix = f"[owned={owned_courses}]"
+        results["purchase_course" + suffix] = bench_purchase_course(
+            history_default, owned_courses, repeat
+        )
+        results["refund_course" + suffix] = bench_refund_course(
+            history_default, owned_courses, repeat
+        )
+
+    results["process_agent_response"] = bench_process_agent_response(repeat)
+    # format_course_list only returns the fragment rendered here
+    courses = list(catalog.courses.values())
+    results["course_catalog_render"] = measure(lambda: CourseCatalog(courses), repeat)
+    return results
+
+
+def compare(baseline, current, threshold):
+    """Print a comparison table and return the names that regressed."""
+    regressions = []
+    print(f"{'benchmark':<44} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    print("-" * 79)
+    for name, base in baseline["results"].items():
+        now = current["results"].get(name)
+        if now is None:
+            print(f"{name:<44} {base['median_us']:>12.2f} {'missing':>12}")
+            continue
+        change = now["median_us"] / base["median_us"] - 1 if base["median_us"] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(
+            f"{name:<44} {base['median_us']:>12.2f} {now['median_us']:>12.2f} "
+            f"{change:>+8.1%}{flag}"
+        )
+    return regressions
+
+
+def collect(args):
+    set_display_level(DISPLAY_FULL)
+    return {
+        "meta": {
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": run_suite(args.history_sizes, args.course_counts, args.repeat),
+    }
+
+
+def print_results(report):
+    print(f"{'benchmark':<44} {'median us':>12} {'p95 us':>12}")
+    print("-" * 70)
+    for name, result in report["results"].items():
+        print(f"{name:<44} {result['median_us']:>12.2f} {result['p95_us']:>12.2f}")
+
+
+def int_list(value):
+    return [int(x) for x in value.split(",")]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_suite_options(p):
+        p.add_argument("--history-sizes", type=int_list, default=[0, 100, 1000, 10000])
+        p.add_argument("--course-counts", type=int_list, default=[0, 10, 100, 1000])
+        p.add_argument("--repeat", type=int, default=200, help="timed calls per benchmark")
+
+    run = commands.add_parser("run", help="run the suite and save a baseline")
+    add_suite_options(run)
+    run.add_argument("--output", default="microbench_baseline.json")
+
+    cmp = commands.add_parser("compare", help="compare results against a baseline")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current", nargs="?", help="results file (default: run now)")
+    cmp.add_argument(
+        "--threshold", type=float, default=0.20, help="allowed slowdown, e.g. 0.2 = 20%%"
+    )
+    add_suite_options(cmp)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == "run":
+        report = collect(args)
+        print_results(report)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.output}")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = collect(args)
+
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""Snapshot / warm-restart benchmark for SnapshotSessionService.
+
+Creates ``--sessions`` sessions (each with a short history and a few events),
+then times:
+
+- a full snapshot (every session encoded),
+- restarting from it (reading the index only),
+- paging individual sessions in on first access,
+- an incremental snapshot after a few sessions changed (the rest are
+  copied over as raw bytes).
+
+Restored sessions are checked against the originals; exits with status 1 on
+a mismatch.
+
+Usage:
+    python -m benchmarks.bench_snapshot --sessions 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import benchmarks.common  # noqa: F401  (puts the app modules on sys.path)
+
+from benchmarks.common import percentile, synthetic_history, synthetic_purchases
+from customer_service_agent.records import HistoryEntry
+from google.adk.events import Event
+from google.genai import types
+from interaction_log import InteractionHistoryView, InteractionLog, history_as_list
+from session_snapshot import SnapshotSessionService
+
+APP_NAME = "Customer Support Snapshot Benchmark"
+
+
+def populate(service, sessions, history_length, events):
+    history = [HistoryEntry.from_dict(entry) for entry in synthetic_history(history_length)]
+    purchases = synthetic_purchases(2)
+    session_ids = []
+    for n in range(sessions):
+        session = service.create_session(
+            app_name=APP_NAME,
+            user_id=f"user_{n % 1000}",
+            state={
+                "user_name": f"User {n}",
+                "purchased_courses": list(purchases),
+                "interaction_history": InteractionHistoryView(InteractionLog(history)),
+            },
+        )
+        for i in range(events):
+            service.append_event(
+                session,
+                Event(
+                    author="user" if i % 2 == 0 else "customer_service",
+                    content=types.Content(role="user", parts=[types.Part(text=f"Message {i}")]),
+                ),
+            )
+        session_ids.append((session.user_id, session.id))
+    return session_ids
+
+
+def check(original, restored):
+    problems = []
+    if restored is None:
+        return ["missing"]
+    if restored.state["user_name"] != original.state["user_name"]:
+        problems.append("user_name differs")
+    if history_as_list(restored.state["interaction_history"]) != history_as_list(
+        original.state["interaction_history"]
+    ):
+        problems.append("history differs")
+    if [e.content for e in restored.events] != [e.content for e in original.events]:
+        problems.append("events differ")
+    return problems
+
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - started
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sessions.snapshot")
+        service = SnapshotSessionService(path)
+        session_ids, populate_seconds = timed(
+            lambda: populate(service, args.sessions, args.history, args.events)
+        )
+        _, full_seconds = timed(service.snapshot)
+        size = os.path.getsize(path)
+        sample = random.sample(session_ids, min(args.sample, len(session_ids)))
+        originals = {
+            key: service.get_session(app_name=APP_NAME, user_id=key[0], session_id=key[1])
+            for key in sample
+        }
+        service.close()
+
+        restarted, restart_seconds = timed(lambda: SnapshotSessionService(path))
+        page_in = []
+        problems = 0
+        for user_id, session_id in sample:
+            restored, seconds = timed(
+                lambda: restarted.get_session(
+                    app_name=APP_NAME, user_id=user_id, session_id=session_id
+                )
+            )
+            page_in.append(seconds)
+            for problem in check(originals[(user_id, session_id)], restored):
+                problems += 1
+                print(f"MISMATCH in {session_id}: {problem}")
+
+        for user_id, session_id in sample[: args.changed]:
+            session = restarted.get_session(
+                app_name=APP_NAME, user_id=user_id, session_id=session_id
+            )
+            restarted.append_event(session, Event(author="user"))
+        _, incremental_seconds = timed(restarted.snapshot)
+        restarted.close()
+
+    print(
+        f"Sessions:             {args.sessions} ({args.history} history entries, "
+        f"{args.events} events each; created in {populate_seconds:.1f}s)"
+    )
+    print(f"Snapshot size:        {size / 1024 / 1024:.1f} MB")
+    print(f"Full snapshot:        {full_seconds * 1000:.0f} ms")
+    print(f"Restart:              {restart_seconds * 1000:.0f} ms")
+    print(
+        f"First access:         p50 {percentile(page_in, 50) * 1000:.2f} ms, "
+        f"p99 {percentile(page_in, 99) * 1000:.2f} ms ({len(page_in)} sessions)"
+    )
+    print(
+        f"Incremental snapshot: {incremental_seconds * 1000:.0f} ms "
+        f"({min(args.changed, len(sample))} changed)"
+    )
+    if problems:
+        print("\nFAILED")
+        return 1
+    print("\nOK: restored sessions match")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100000)
+    parser.add_argument("--history", type=int, default=10, help="history entries per session")
+    parser.add_argument("--events", type=int, default=2, help="events per session")
+    parser.add_argument("--sample", type=int, default=1000, help="sessions to page in and check")
+    parser.add_argument(
+        "--changed", type=int, default=100, help="sessions changed before the incremental snapshot"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
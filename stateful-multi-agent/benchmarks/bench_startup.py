@@ -0,0 +1,177 @@
+"""Startup-time report: import costs and worker pool cold starts.
+
+Imports each entry point in a fresh interpreter under ``python -X importtime``
+and reports where the time goes, grouped by package (``google.adk``,
+``google.cloud``, ``streamlit``, ...), with our own modules listed one by
+one. Then times how long a WorkerPool takes until every worker answers, and
+how long a killed worker takes to serve again, for each start method.
+
+Exits with status 1 if importing our own modules for a worker takes more
+than ``--budget-ms`` (third-party imports are reported, not budgeted).
+
+Usage:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --workers 4 --top 15 --budget-ms 50
+"""
+
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from benchmarks.common import APP_DIR
+
+from worker_pool import WorkerPool, worker_index
+
+# What each kind of process imports before it can serve
+IMPORT_TARGETS = {
+    "agent tree": "import customer_service_agent.agent",
+    "worker": "import worker_pool",
+    "app": "import streamlit, dotenv, session_snapshot, worker_pool",
+}
+
+
+# ----------------------------------------------------
+# Import times
+# ----------------------------------------------------
+def is_own_module(name):
+    root = name.split(".")[0]
+    return os.path.exists(os.path.join(APP_DIR, root + ".py")) or os.path.isdir(
+        os.path.join(APP_DIR, root)
+    )
+
+
+def group_of(name):
+    if is_own_module(name):
+        return name
+    parts = name.split(".")
+    # google.* is many unrelated distributions
+    return ".".join(parts[:2]) if parts[0] == "google" and len(parts) > 1 else parts[0]
+
+
+def import_times(statement):
+    """Self time in seconds of every module ``statement`` imports, by module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode:
+        raise RuntimeError(f"{statement!r} failed:\n{result.stderr[-2000:]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(self_us) / 1e6
+    return times
+
+
+def import_report(statement, repeat):
+    """Best of ``repeat`` runs: (total seconds, {group: seconds})."""
+    best = None
+    for _ in range(repeat):
+        times = import_times(statement)
+        if best is None or sum(times.values()) < sum(best.values()):
+            best = times
+    groups = defaultdict(float)
+    for name, seconds in best.items():
+        groups[group_of(name)] += seconds
+    return sum(best.values()), groups
+
+
+def print_import_report(label, statement, total, groups, top):
+    own = {name: seconds for name, seconds in groups.items() if is_own_module(name)}
+    third_party = {name: seconds for name, seconds in groups.items() if name not in own}
+    print(f"\n{label}: {statement}")
+    print(f"  total {total * 1000:8.0f} ms, our modules {sum(own.values()) * 1000:.1f} ms")
+    for name, seconds in sorted(third_party.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {seconds * 1000:8.0f} ms  {name}")
+    for name, seconds in sorted(own.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {seconds * 1000:8.1f} ms  {name}")
+    return sum(own.values())
+
+
+# ----------------------------------------------------
+# Worker pool cold starts
+# ----------------------------------------------------
+def probe_keys(workers):
+    """One user id routed to each worker."""
+    keys = {}
+    n = 0
+    while len(keys) < workers:
+        keys.setdefault(worker_index(f"probe_{n}", workers), f"probe_{n}")
+        n += 1
+    return [keys[index] for index in range(workers)]
+
+
+def pool_startup(start_method, workers, db_path):
+    """Seconds until every worker answered, and until a killed worker answers again."""
+    keys = probe_keys(workers)
+    started = time.perf_counter()
+    pool = WorkerPool(workers, db_path, start_method=start_method)
+    try:
+        for future in [pool.latest_session(key) for key in keys]:
+            future.result(timeout=300)
+        ready = time.perf_counter() - started
+
+        restarts = pool.restarts
+        started = time.perf_counter()
+        pool._processes[0].kill()
+        while pool.restarts == restarts:
+            time.sleep(0.01)
+        pool.latest_session(keys[0]).result(timeout=300)
+        restart = time.perf_counter() - started
+    finally:
+        pool.close()
+    return ready, restart
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    own_seconds = 0.0
+    for label, statement in IMPORT_TARGETS.items():
+        total, groups = import_report(statement, args.repeat)
+        own = print_import_report(label, statement, total, groups, args.top)
+        if label == "worker":
+            own_seconds = own
+
+    if args.workers:
+        print(f"\nWorker pool ({args.workers} workers):")
+        methods = [m for m in ("spawn", "forkserver") if m in multiprocessing.get_all_start_methods()]
+        with tempfile.TemporaryDirectory() as tmp:
+            for method in methods:
+                ready, restart = pool_startup(
+                    method, args.workers, os.path.join(tmp, f"{method}.db")
+                )
+                print(
+                    f"  {method:10s}  all workers ready {ready * 1000:6.0f} ms, "
+                    f"restart after a crash {restart * 1000:6.0f} ms"
+                )
+
+    print(f"\nOur modules in a worker: {own_seconds * 1000:.1f} ms (budget {args.budget_ms} ms)")
+    if own_seconds * 1000 > args.budget_ms:
+        print("FAILED: over budget")
+        return 1
+    print("OK")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="import runs per target (best is used)")
+    parser.add_argument("--top", type=int, default=10, help="packages and modules listed per target")
+    parser.add_argument("--workers", type=int, default=2, help="pool size (0 skips the pool)")
+    parser.add_argument(
+        "--budget-ms", type=float, default=50, help="import budget for our own modules"
+    )
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
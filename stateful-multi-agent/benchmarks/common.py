@@ -0,0 +1,80 @@
+"""Helpers shared by the benchmark scripts."""
+
+import contextlib
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Let the benchmarks import the app modules when run from any directory
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+# Scripted conversation cycled through by the end-to-end and load benchmarks
+SCRIPTED_TURNS = (
+    "What courses do you offer?",
+    "I want to buy ai_chatbot_mastery",
+    "What is in section 4 of ai_chatbot_mastery?",
+    "What is the refund policy?",
+    "Please refund ai_chatbot_mastery",
+)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values`` (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(int(round(pct / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def synthetic_history(length):
+    """Build ``length`` interaction history entries shaped like real ones."""
+    start = datetime(2025, 1, 1)
+    history = []
+    for i in range(length):
+        timestamp = (start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S")
+        if i % 2 == 0:
+            history.append(
+                {"action": "user_query", "query": f"Question number {i}", "timestamp": timestamp}
+            )
+        else:
+            history.append(
+                {
+                    "action": "agent_response",
+                    "agent": "sales_agent",
+                    "response": f"Answer number {i} with a little more text in it.",
+                    "timestamp": timestamp,
+                }
+            )
+    return history
+
+
+def synthetic_purchases(count):
+    """Build ``count`` purchased course records."""
+    now = datetime.now()
+    return [
+        {
+            "id": f"course_{i}",
+            "purchase_date": (now - timedelta(days=i)).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        for i in range(count)
+    ]
+
+
+@contextlib.contextmanager
+def quiet():
+    """Send stdout to /dev/null so terminal I/O doesn't distort the timings.
+
+    The agent trace is still formatted (by the event log's writer thread),
+    just not shown.
+    """
+    from event_log import TerminalSink, event_log
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        previous = event_log.configure(TerminalSink(devnull))
+        try:
+            yield
+        finally:
+            event_log.configure(previous)
@@ -0,0 +1,265 @@
+"""Concurrent multi-session load generator.
+
+Creates many sessions on one session service and drives scripted
+conversations for all of them through a single shared Runner, with at most
+``--concurrency`` conversations in flight. Every agent uses the stub model,
+so the numbers describe our own architecture rather than Gemini.
+
+Reports throughput, turn latency percentiles, event-loop lag and memory
+growth per session. Raise ``--concurrency`` until throughput stops growing
+or lag climbs to find the ceiling.
+
+With ``--workers N`` the turns are served by a WorkerPool of N processes
+sharing a SQLite store instead; loop lag and memory are then the parent's.
+
+Usage:
+    python -m benchmarks.load_generator --sessions 2000 --concurrency 200
+    python -m benchmarks.load_generator --sessions 2000 --concurrency 200 --workers 4
+"""
+
+import argparse
+import asyncio
+import functools
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.common import SCRIPTED_TURNS, percentile, quiet
+from benchmarks.stub_model import install_stub_models
+
+from customer_service_agent.agent import customer_service_agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from sqlite_session_service import SqliteSessionService
+from state_transaction import TransactionalSessionService, session_turn
+from utils import add_user_query_to_history, call_agent_async, set_display_level
+from worker_pool import WorkerPool
+
+APP_NAME = "Customer Support Load Test"
+
+
+def rss_bytes():
+    """Current resident set size (falls back to the peak where unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a sleeping task."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lags = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(time.perf_counter() - started - self.interval, 0.0))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+def in_process_turns(runner):
+    """Run turns on ``runner`` in this process."""
+    session_service = runner.session_service
+
+    async def run_turn(user_id, session_id, query):
+        async with session_turn(session_service, APP_NAME, user_id, session_id):
+            add_user_query_to_history(session_service, APP_NAME, user_id, session_id, query)
+            return await call_agent_async(runner, user_id, session_id, query)
+
+    return run_turn
+
+
+def pool_turns(pool):
+    """Run turns on the session's worker process."""
+
+    async def run_turn(user_id, session_id, query):
+        return await asyncio.wrap_future(pool.run_turn(user_id, session_id, query))
+
+    return run_turn
+
+
+async def run_conversation(run_turn, semaphore, user_id, session_id, turns, latencies, errors):
+    """Run one session's scripted conversation once a slot is free."""
+    async with semaphore:
+        for turn in range(turns):
+            query = SCRIPTED_TURNS[turn % len(SCRIPTED_TURNS)]
+            started = time.perf_counter()
+            try:
+                response = await run_turn(user_id, session_id, query)
+                if response is None:
+                    errors.append(session_id)
+            except Exception:
+                errors.append(session_id)
+            latencies.append(time.perf_counter() - started)
+
+
+async def main_async(args):
+    set_display_level(args.display_level)
+    stub_stats = install_stub_models(customer_service_agent, latency=args.latency_ms / 1000)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "load.db")
+        pool = None
+        if args.workers:
+            pool = WorkerPool(
+                args.workers,
+                db_path,
+                app_name=APP_NAME,
+                initializer=functools.partial(
+                    install_stub_models, latency=args.latency_ms / 1000
+                ),
+            )
+            run_turn = pool_turns(pool)
+        else:
+            if args.backend == "sqlite":
+                inner = SqliteSessionService(db_path)
+            else:
+                inner = InMemorySessionService()
+            session_service = TransactionalSessionService(inner)
+            runner = Runner(
+                agent=customer_service_agent,
+                app_name=APP_NAME,
+                session_service=session_service,
+            )
+            run_turn = in_process_turns(runner)
+
+        rss_start = rss_bytes()
+        sessions = []
+        for i in range(args.sessions):
+            user_id = f"load_user_{i}"
+            state = {
+                "user_name": f"Load User {i}",
+                "purchased_courses": [],
+                "interaction_history": [],
+            }
+            if pool:
+                session_id = await asyncio.wrap_future(pool.create_session(user_id, state))
+            else:
+                session_id = session_service.create_session(
+                    app_name=APP_NAME, user_id=user_id, state=state
+                ).id
+            sessions.append((user_id, session_id))
+        rss_created = rss_bytes()
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies, errors = [], []
+        monitor = LoopLagMonitor(args.lag_interval_ms / 1000)
+        monitor.start()
+        started = time.perf_counter()
+        with quiet():
+            await asyncio.gather(
+                *(
+                    run_conversation(
+                        run_turn, semaphore, user_id, session_id, args.turns, latencies, errors
+                    )
+                    for user_id, session_id in sessions
+                )
+            )
+        elapsed = time.perf_counter() - started
+        await monitor.stop()
+        rss_end = rss_bytes()
+        if pool:
+            pool.close()
+
+    turns = len(latencies)
+    report = {
+        "sessions": args.sessions,
+        "turns": turns,
+        "concurrency": args.concurrency,
+        "backend": "sqlite" if args.workers else args.backend,
+        "workers": args.workers,
+        "model_latency_ms": args.latency_ms,
+        "elapsed_s": elapsed,
+        "turns_per_sec": turns / elapsed if elapsed else 0.0,
+        "errors": len(errors),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+        "loop_lag_p50_ms": percentile(monitor.lags, 50) * 1000,
+        "loop_lag_p99_ms": percentile(monitor.lags, 99) * 1000,
+        "loop_lag_max_ms": max(monitor.lags, default=0.0) * 1000,
+        # Counted in the worker processes when there are any
+        "model_calls": None if args.workers else stub_stats.calls,
+        "rss_start_mb": rss_start / 2**20,
+        "rss_end_mb": rss_end / 2**20,
+        "kb_per_session_created": (rss_created - rss_start) / args.sessions / 1024,
+        "kb_per_session_after_run": (rss_end - rss_start) / args.sessions / 1024,
+    }
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+def print_report(report):
+    print(
+        f"{report['sessions']} sessions x {report['turns'] // max(report['sessions'], 1)} turns, "
+        f"concurrency {report['concurrency']}, backend {report['backend']}, "
+        f"workers {report['workers'] or 'none'}, "
+        f"model latency {report['model_latency_ms']:.0f} ms"
+    )
+    print(f"  throughput      {report['turns_per_sec']:10.1f} turns/s ({report['elapsed_s']:.1f} s)")
+    print(
+        f"  turn latency    p50 {report['p50_ms']:.1f} ms, p95 {report['p95_ms']:.1f} ms, "
+        f"p99 {report['p99_ms']:.1f} ms, max {report['max_ms']:.1f} ms"
+    )
+    print(
+        f"  event-loop lag  p50 {report['loop_lag_p50_ms']:.2f} ms, "
+        f"p99 {report['loop_lag_p99_ms']:.2f} ms, max {report['loop_lag_max_ms']:.2f} ms"
+    )
+    print(
+        f"  memory          {report['rss_start_mb']:.1f} -> {report['rss_end_mb']:.1f} MB, "
+        f"{report['kb_per_session_created']:.1f} KB/session created, "
+        f"{report['kb_per_session_after_run']:.1f} KB/session after run"
+    )
+    print(f"  errors          {report['errors']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=len(SCRIPTED_TURNS), help="turns per session")
+    parser.add_argument("--concurrency", type=int, default=100, help="conversations in flight")
+    parser.add_argument(
+        "--latency-ms", type=float, default=50.0, help="simulated model latency per call"
+    )
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    parser.add_argument(
+        "--workers", type=int, default=0, help="serve turns from N processes (implies sqlite)"
+    )
+    parser.add_argument("--lag-interval-ms", type=float, default=10.0)
+    parser.add_argument(
+        "--display-level", choices=["off", "summary", "diff", "full"], default="off"
+    )
+    parser.add_argument("--json", help="also write the report to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    asyncio.run(main_async(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Concurrent-write stress test for per-session turn ordering.
+
+Fires ``--writes`` overlapping turns at a few sessions on one SQLite-backed
+TransactionalSessionService. Each turn does what a real turn does: it reads
+the session, awaits (standing in for the model call), then appends an
+interaction history entry and writes a read-modify-write state delta (a
+counter and the purchased course list). Every ``--fail-every``-th turn raises
+after writing and must roll back without touching any other turn.
+
+Afterwards the database is reopened with a fresh service and every session
+is checked: no committed write may be missing and no rolled-back one present.
+Exits with status 1 on any lost or phantom update. ``--unlocked`` runs the
+same turns without session_turn's lock to show the updates it prevents losing.
+
+Usage:
+    python -m benchmarks.stress_sessions --writes 1000 --sessions 4
+    python -m benchmarks.stress_sessions --unlocked     # expected to fail
+
+tests/test_stress.py runs a smaller version of both under pytest.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+import benchmarks.common  # noqa: F401  (puts the app modules on sys.path)
+
+from google.adk.events import Event
+from google.adk.events.event_actions import EventActions
+from interaction_log import history_as_list
+from sqlite_session_service import SqliteSessionService
+from state_transaction import (
+    TransactionalSessionService,
+    session_locks,
+    session_turn,
+    turn_transaction,
+)
+from utils import update_interaction_history
+
+APP_NAME = "Customer Support Stress Test"
+USER_ID = "stress_user"
+
+
+class TurnFailed(Exception):
+    """Raised by the turns that are meant to roll back."""
+
+
+@dataclass
+class StressResult:
+    """Outcome of one stress run."""
+
+    rolled_back: int = 0
+    elapsed: float = 0.0
+    # Exceptions other than TurnFailed
+    unexpected: list = field(default_factory=list)
+    # Session id -> lost or phantom updates found after reloading it
+    problems: dict = field(default_factory=dict)
+    lock_waits: int = 0
+    lock_acquisitions: int = 0
+    locks_left: int = 0
+
+
+@asynccontextmanager
+async def unlocked_turn(session_service, app_name, user_id, session_id):
+    """session_turn without the per-session lock."""
+    with turn_transaction(session_service, app_name, user_id, session_id) as transaction:
+        yield transaction
+
+
+async def write_once(session_service, session_id, n, turn, max_hold, fail):
+    """One turn: read state, 'call the model', then write back."""
+    async with turn(session_service, APP_NAME, USER_ID, session_id):
+        session = session_service.get_session(
+            app_name=APP_NAME, user_id=USER_ID, session_id=session_id
+        )
+        counter = session.state.get("counter", 0)
+        purchases = list(session.state.get("purchased_courses", []))
+        await asyncio.sleep(random.uniform(0, max_hold))
+
+        purchases.append({"id": f"course_{n}", "purchase_date": "2025-01-01 00:00:00"})
+        session_service.append_event(
+            session,
+            Event(
+                author="stress",
+                actions=EventActions(
+                    state_delta={"counter": counter + 1, "purchased_courses": purchases}
+                ),
+            ),
+        )
+        update_interaction_history(
+            session_service, APP_NAME, USER_ID, session_id, {"action": "stress_write", "n": n}
+        )
+        if fail:
+            raise TurnFailed(n)
+
+
+def check_session(session, expected):
+    """Return a list of problems with one reloaded session."""
+    problems = []
+    state = session.state
+    counter = state.get("counter", 0)
+    if counter != len(expected):
+        problems.append(f"counter is {counter}, expected {len(expected)}")
+
+    purchased = sorted(int(c["id"].split("_")[1]) for c in state.get("purchased_courses", []))
+    if purchased != sorted(expected):
+        missing = len(set(expected) - set(purchased))
+        phantom = len(set(purchased) - set(expected))
+        problems.append(f"purchases: {missing} missing, {phantom} rolled back but present")
+
+    written = sorted(
+        entry["n"]
+        for entry in history_as_list(state.get("interaction_history"))
+        if entry.get("action") == "stress_write"
+    )
+    if written != sorted(expected):
+        missing = len(set(expected) - set(written))
+        phantom = len(written) - len(set(written) & set(expected))
+        problems.append(f"history: {missing} missing, {phantom} rolled back or duplicated")
+    return problems
+
+
+async def stress(db_path, writes, sessions, turn=session_turn, max_hold=0.002, fail_every=10):
+    """Run ``writes`` overlapping turns over ``sessions`` sessions stored at ``db_path``.
+
+    Every ``fail_every``-th turn rolls back (0 = none). The database is then
+    reopened and every session checked against the turns that committed.
+    """
+    session_service = TransactionalSessionService(SqliteSessionService(db_path))
+    session_ids = [
+        session_service.create_session(
+            app_name=APP_NAME,
+            user_id=USER_ID,
+            state={"purchased_courses": [], "interaction_history": []},
+        ).id
+        for _ in range(sessions)
+    ]
+
+    expected = {session_id: [] for session_id in session_ids}
+    turns = []
+    for n in range(writes):
+        session_id = session_ids[n % sessions]
+        fail = fail_every > 0 and n % fail_every == fail_every - 1
+        if not fail:
+            expected[session_id].append(n)
+        turns.append(write_once(session_service, session_id, n, turn, max_hold, fail))
+
+    result = StressResult()
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*turns, return_exceptions=True)
+    result.elapsed = time.perf_counter() - started
+    result.unexpected = [
+        r for r in outcomes if isinstance(r, Exception) and not isinstance(r, TurnFailed)
+    ]
+    result.rolled_back = sum(isinstance(r, TurnFailed) for r in outcomes)
+    locks = session_locks(session_service)
+    result.lock_waits, result.lock_acquisitions = locks.contended, locks.acquired
+    result.locks_left = len(locks)
+    session_service.close()
+
+    # Read everything back from disk with a fresh service
+    reloaded = SqliteSessionService(db_path)
+    for session_id in session_ids:
+        session = reloaded.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+        session_problems = check_session(session, expected[session_id])
+        if session_problems:
+            result.problems[session_id] = session_problems
+    reloaded.close()
+    return result
+
+
+async def main_async(args):
+    random.seed(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        result = await stress(
+            os.path.join(tmp, "stress.db"),
+            args.writes,
+            args.sessions,
+            turn=unlocked_turn if args.unlocked else session_turn,
+            max_hold=args.max_hold_ms / 1000,
+            fail_every=args.fail_every,
+        )
+
+    mode = "no lock" if args.unlocked else "session_turn"
+    print(f"Writes:        {args.writes} over {args.sessions} session(s), {mode}")
+    print(f"Committed:     {args.writes - result.rolled_back}, rolled back: {result.rolled_back}")
+    print(f"Elapsed:       {result.elapsed:.2f}s ({args.writes / result.elapsed:.0f} writes/s)")
+    if not args.unlocked:
+        print(
+            f"Lock waits:    {result.lock_waits} of {result.lock_acquisitions} turns waited "
+            f"for their session; {result.locks_left} lock(s) left"
+        )
+    for error in result.unexpected[:5]:
+        print(f"Unexpected error: {error!r}")
+    for session_id, session_problems in result.problems.items():
+        for problem in session_problems:
+            print(f"LOST UPDATE in {session_id}: {problem}")
+    if result.problems or result.unexpected:
+        print("\nFAILED")
+        return 1
+    print("\nOK: no lost or phantom updates")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writes", type=int, default=1000, help="concurrent turns to run")
+    parser.add_argument(
+        "--sessions", type=int, default=4, help="sessions the turns are spread over"
+    )
+    parser.add_argument(
+        "--max-hold-ms", type=float, default=2.0, help="max simulated model time per turn"
+    )
+    parser.add_argument(
+        "--fail-every", type=int, default=10, help="make every Nth turn roll back (0 = never)"
+    )
+    parser.add_argument("--unlocked", action="store_true", help="skip the per-session lock")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    return asyncio.run(main_async(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
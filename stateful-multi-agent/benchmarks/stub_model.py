@@ -0,0 +1,132 @@
+"""Deterministic stand-in for gemini-2.0-flash used by the benchmarks.
+
+Every agent in the tree gets its own StubLlm. The stub picks a target agent
+from keywords in the latest user query and then replays what the real model
+would do: transfer to the right agent, call that agent's tool
+(purchase_course / refund_course) and finish with a short text answer.
+"""
+
+import asyncio
+import re
+import time
+from dataclasses import dataclass
+
+from customer_service_agent.catalog import catalog
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+# Keyword -> agent routing used by the scripted conversations (first match wins)
+ROUTES = (
+    (re.compile(r"\b(refund policy|policy|guideline)\b", re.I), "policy_agent"),
+    (re.compile(r"\b(refund|money back|my courses|order)\b", re.I), "order_agent"),
+    (re.compile(r"\b(buy|purchase|price)\b", re.I), "sales_agent"),
+    (re.compile(r"\b(section|module|lesson)\b", re.I), "course_support_agent"),
+)
+
+# Tool each agent calls when it handles a query
+AGENT_TOOLS = {
+    "sales_agent": "purchase_course",
+    "order_agent": "refund_course",
+}
+
+COURSE_ID_PATTERN = re.compile(
+    r"\b(" + "|".join(map(re.escape, catalog.ids())) + r")\b"
+)
+DEFAULT_COURSE_ID = "ai_chatbot_mastery"
+ROOT_AGENT_NAME = "customer_service"
+
+
+@dataclass
+class StubStats:
+    """Time spent inside the stub model, shared by every stub in a tree."""
+
+    calls: int = 0
+    seconds: float = 0.0
+
+
+def route_for(query):
+    """Return the agent name a query should be handled by."""
+    for pattern, agent_name in ROUTES:
+        if pattern.search(query):
+            return agent_name
+    return ROOT_AGENT_NAME
+
+
+def _latest_user_query(contents):
+    for content in reversed(contents):
+        if content.role != "user" or not content.parts:
+            continue
+        text = content.parts[0].text
+        if text and text != "For context:":
+            return text
+    return ""
+
+
+def _text(text):
+    return LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]))
+
+
+def _call(name, **args):
+    return LlmResponse(
+        content=types.Content(
+            role="model",
+            parts=[types.Part(function_call=types.FunctionCall(name=name, args=args))],
+        )
+    )
+
+
+class StubLlm(BaseLlm):
+    """Scripted model for one agent with a fixed per-call latency."""
+
+    agent_name: str
+    latency: float = 0.0
+    stats: StubStats
+
+    async def generate_content_async(self, llm_request, stream=False):
+        started = time.perf_counter()
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        response = self._respond(llm_request)
+        self.stats.calls += 1
+        self.stats.seconds += time.perf_counter() - started
+        text = response.content.parts[0].text
+        if stream and text:
+            # Stream word by word, then the aggregated response, like SSE mode
+            for word in re.findall(r"\S+\s*", text):
+                yield LlmResponse(
+                    content=types.Content(role="model", parts=[types.Part(text=word)]),
+                    partial=True,
+                )
+        yield response
+
+    def _respond(self, llm_request):
+        contents = llm_request.contents
+        last_parts = contents[-1].parts if contents and contents[-1].parts else []
+        if any(part.function_response for part in last_parts):
+            return _text(f"[{self.agent_name}] Done.")
+
+        query = _latest_user_query(contents)
+        target = route_for(query)
+        if target != self.agent_name and "transfer_to_agent" in llm_request.tools_dict:
+            return _call("transfer_to_agent", agent_name=target)
+
+        tool = AGENT_TOOLS.get(self.agent_name)
+        if tool and tool in llm_request.tools_dict:
+            match = COURSE_ID_PATTERN.search(query)
+            return _call(tool, course_id=match.group(1) if match else DEFAULT_COURSE_ID)
+        return _text(f"[{self.agent_name}] Here is what I can tell you about: {query}")
+
+
+def install_stub_models(agent, latency=0.0, stats=None):
+    """Replace the model of ``agent`` and all its sub-agents with stubs.
+
+    Returns the StubStats shared by every installed stub.
+    """
+    stats = stats or StubStats()
+    agent.model = StubLlm(
+        model=f"stub-{agent.name}", agent_name=agent.name, latency=latency, stats=stats
+    )
+    for sub_agent in agent.sub_agents:
+        install_stub_models(sub_agent, latency, stats)
+    return stats
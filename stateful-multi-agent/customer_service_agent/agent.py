@@ -1,5 +1,8 @@
 from google.adk.agents import Agent
 
+from .history_archive import search_past_interactions
+from .router import fast_router
+from .state_slices import sliced_instruction
 from .sub_agents.course_support_agent.agent import course_support_agent
 from .sub_agents.order_agent.agent import order_agent
 from .sub_agents.policy_agent.agent import policy_agent
@@ -10,7 +13,9 @@ customer_service_agent = Agent(
     name="customer_service",
     model="gemini-2.0-flash",
     description="Customer service agent for AI Developer Accelerator community",
-    instruction="""
+    instruction=sliced_instruction(
+        "customer_service",
+        """
     You are the primary customer service agent for the AI Developer Accelerator community.
     Your role is to help users with their questions and direct them to the appropriate specialized agent.
 
@@ -24,7 +29,7 @@ customer_service_agent = Agent(
     2. State Management
        - Track user interactions in state['interaction_history']
        - Monitor user's purchased courses in state['purchased_courses']
-         - Course information is stored as objects with "id" and "purchase_date" properties
+         - Purchased courses are listed by course ID
        - Use state to provide personalized responses
 
     **User Information:**
@@ -64,6 +69,9 @@ customer_service_agent = Agent(
        - Can process course refunds (30-day money-back guarantee)
        - References the purchased courses information
 
+    Older interactions may have been archived and only summarized above. If the user asks about
+    something that isn't in the interaction history, use the search_past_interactions tool to look it up.
+
     Tailor your responses based on the user's purchase history and previous interactions.
     When the user hasn't purchased any courses yet, encourage them to explore the AI Marketing Platform.
     When the user has purchased courses, offer support for those specific courses.
@@ -74,7 +82,11 @@ customer_service_agent = Agent(
 
     Always maintain a helpful and professional tone. If you're unsure which agent to delegate to,
     ask clarifying questions to better understand the user's needs.
-    """,
+    """
+    ),
     sub_agents=[policy_agent, sales_agent, course_support_agent, order_agent],
-    tools=[],
+    tools=[search_past_interactions],
+    # Route clear-cut queries locally and skip the routing model call
+    before_model_callback=fast_router.before_model_callback,
+    after_model_callback=fast_router.after_model_callback,
 )
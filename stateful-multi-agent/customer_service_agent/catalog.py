@@ -0,0 +1,150 @@
+import difflib
+import json
+import os
+import re
+
+# Data file the catalog is loaded from (override with COURSE_CATALOG_PATH)
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(__file__), "courses.json")
+
+# Minimum similarity for fuzzy name-to-id resolution
+FUZZY_CUTOFF = 0.6
+
+
+def _normalize(text):
+    """Lower-case, spell out '&' and collapse punctuation to single spaces."""
+    text = text.lower().replace("&", " and ")
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+class CourseCatalog:
+    """Read-only course catalog shared by every agent.
+
+    Built once from the data file. Lookups by id and by display name are
+    dictionary hits, and the instruction fragments each agent embeds are
+    rendered up front.
+    """
+
+    def __init__(self, courses):
+        self.courses = {}
+        self._names = {}
+        for course in courses:
+            self.courses[course["id"]] = course
+            self._names[course["name"]] = course["id"]
+
+        # Normalized ids and names, for resolving what users and models type
+        self._keys = {}
+        for course_id, course in self.courses.items():
+            self._keys[_normalize(course_id)] = course_id
+            self._keys[_normalize(course["name"])] = course_id
+
+        self.sections = {
+            course_id: "\n".join(
+                f"{i}. {title}" for i, title in enumerate(course.get("sections", []), 1)
+            )
+            for course_id, course in self.courses.items()
+        }
+
+        # Pre-rendered instruction fragments
+        self.sales_fragment = "".join(
+            f"""
+- Name: {course['name']}
+  ID: {course_id}
+  Price: ${course['price']}
+  Value Proposition: {course['value_proposition']}
+  Includes: {course['includes']}
+"""
+            for course_id, course in self.courses.items()
+        )
+        self.policy_fragment = "".join(
+            f"\n- {course['name']}: {course['policy_summary']}" for course in self.courses.values()
+        ) + "\n"
+        self.sections_fragment = "\n\n".join(
+            f"{course['name']} (ID: {course_id}):\n{self.sections[course_id]}"
+            for course_id, course in self.courses.items()
+        )
+        # One line per course for token-constrained prompts
+        self.compact_fragment = "\n".join(
+            f"- {course_id}: {course['name']} (${course['price']})"
+            for course_id, course in self.courses.items()
+        )
+
+    def __contains__(self, course_id):
+        return course_id in self.courses
+
+    def __iter__(self):
+        return iter(self.courses)
+
+    def __len__(self):
+        return len(self.courses)
+
+    def ids(self):
+        return list(self.courses)
+
+    def get(self, course_id):
+        """Return the course record for an id, or None."""
+        return self.courses.get(course_id)
+
+    def by_name(self, name):
+        """Return the course record with this exact display name, or None."""
+        course_id = self._names.get(name)
+        return self.courses[course_id] if course_id else None
+
+    def exact(self, text):
+        """Map an exact id or display name (any case) to a course id, or None.
+
+        Used where a wrong guess would cost money (purchase, refund).
+        """
+        if not text:
+            return None
+        if text in self.courses:
+            return text
+        return self._keys.get(_normalize(text))
+
+    def suggest(self, text, limit=3):
+        """Course ids that ``text`` may have meant, best first."""
+        key = _normalize(text or "")
+        if not key:
+            return []
+        # A full id or name mentioned inside a longer phrase
+        ids = [
+            course_id
+            for candidate, course_id in self._keys.items()
+            if f" {candidate} " in f" {key} "
+        ]
+        for match in difflib.get_close_matches(key, self._keys, n=limit, cutoff=FUZZY_CUTOFF):
+            ids.append(self._keys[match])
+        return list(dict.fromkeys(ids))[:limit]
+
+    def resolve(self, text):
+        """Map an id, a display name or a close misspelling to a course id.
+
+        Returns None when nothing matches well enough. Only for spotting a
+        course in free text; tools that act on a course use exact().
+        """
+        course_id = self.exact(text)
+        if course_id:
+            return course_id
+        suggestions = self.suggest(text, limit=1)
+        return suggestions[0] if suggestions else None
+
+    def unknown_course(self, text):
+        """Tool error for an id that isn't exact, with what it may have meant."""
+        suggestions = [
+            {"id": course_id, "name": self.courses[course_id]["name"]}
+            for course_id in self.suggest(text)
+        ]
+        message = f"Course ID '{text}' does not exist."
+        if suggestions:
+            message += " Ask the user which course they mean, then call again with its exact ID."
+        return {"status": "error", "message": message, "suggestions": suggestions}
+
+
+def load_catalog(path=None):
+    """Load a CourseCatalog from a JSON list of course records."""
+    path = path or os.environ.get("COURSE_CATALOG_PATH", DEFAULT_CATALOG_PATH)
+    with open(path, encoding="utf-8") as f:
+        return CourseCatalog(json.load(f))
+
+
+# The single in-memory catalog every agent uses
+catalog = load_catalog()
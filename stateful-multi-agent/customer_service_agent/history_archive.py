@@ -0,0 +1,213 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from collections import OrderedDict
+
+from google.adk.events import Event
+from google.adk.events.event_actions import EventActions
+from google.adk.tools.tool_context import ToolContext
+
+from .history_compaction import _sanitize, _Summary
+from .records import ARCHIVE_KEY, DICT_TYPES, HISTORY_KEY, json_default
+
+ARCHIVE_DIR = os.environ.get("HISTORY_ARCHIVE_DIR", "history_archive")
+# Archive once more than ARCHIVE_AFTER entries are in memory, keeping the
+# newest ARCHIVE_KEEP (0 disables archiving)
+ARCHIVE_AFTER = int(os.environ.get("HISTORY_ARCHIVE_AFTER", "2048"))
+ARCHIVE_KEEP = int(os.environ.get("HISTORY_ARCHIVE_KEEP", "512"))
+
+SEARCH_PAGE_SIZE = 10
+# Longest value shown in a search result
+SEARCH_VALUE_CHARS = 200
+
+
+class HistoryArchive:
+    """Cold storage for interaction history that no longer fits in memory.
+
+    Old entries are written as gzip'd JSON lines, one file per log segment,
+    under ``root/<session hash>/<first position>.jsonl.gz``. The session
+    keeps only a pointer and a running summary in ARCHIVE_KEY; the segments
+    are read back, a few at a time, when search_past_interactions needs them.
+    """
+
+    def __init__(
+        self, root=ARCHIVE_DIR, archive_after=ARCHIVE_AFTER, keep=ARCHIVE_KEEP, cache_segments=8
+    ):
+        self.root = root
+        self.archive_after = archive_after
+        self.keep = keep
+        self.cache_segments = cache_segments
+        self._cache = OrderedDict()
+
+    def location(self, app_name, user_id, session_id):
+        """Directory name for a session's segments (ids are not path-safe)."""
+        key = json.dumps([app_name, user_id, session_id])
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+    def _path(self, location, first):
+        return os.path.join(self.root, location, f"{first:012d}.jsonl.gz")
+
+    def write_segment(self, location, first, entries):
+        path = self._path(location, first)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so a crash never leaves a partial segment
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, default=json_default) + "\n")
+        os.replace(tmp_path, path)
+
+    def delete(self, app_name, user_id, session_id):
+        """Remove a session's archived segments, if it has any."""
+        location = self.location(app_name, user_id, session_id)
+        shutil.rmtree(os.path.join(self.root, location), ignore_errors=True)
+        for key in [key for key in self._cache if key[0] == location]:
+            del self._cache[key]
+
+    def segments(self, location):
+        """First positions of a session's archived segments, oldest first."""
+        try:
+            names = os.listdir(os.path.join(self.root, location))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name.split(".")[0]) for name in names if name.endswith(".jsonl.gz"))
+
+    def read_segment(self, location, first):
+        """A segment's entries, from a small LRU cache of recently read ones."""
+        key = (location, first)
+        entries = self._cache.get(key)
+        if entries is not None:
+            self._cache.move_to_end(key)
+            return entries
+        with gzip.open(self._path(location, first), "rt", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        self._cache[key] = entries
+        while len(self._cache) > self.cache_segments:
+            self._cache.popitem(last=False)
+        return entries
+
+    def maybe_archive(self, session_service, app_name, user_id, session_id):
+        """Move the oldest entries to disk once the history outgrows memory.
+
+        Returns the number of entries archived. Segment files are written
+        straight away and a rollback cannot remove them, so call this once
+        the turn has committed (see TurnTransaction.after_commit). The
+        pointer and the shrunk history are then written with one state event.
+        """
+        if not self.archive_after:
+            return 0
+        session = session_service.get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+        history = session.state.get(HISTORY_KEY) if session else None
+        log = getattr(history, "log", None)
+        if log is None or log.live_length <= self.archive_after:
+            return 0
+
+        pointer = session.state.get(ARCHIVE_KEY) or {}
+        location = pointer.get("location") or self.location(app_name, user_id, session_id)
+        summary = _Summary.from_dict(pointer.get("summary"))
+
+        def store(first, entries):
+            self.write_segment(location, first, entries)
+            for entry in entries:
+                summary.fold(entry)
+
+        archived_from = log.offset
+        try:
+            log.archive(len(log) - self.keep, store)
+        except OSError as e:
+            print(f"Error archiving interaction history: {e}")
+            return 0
+        if log.offset == archived_from:
+            return 0
+
+        pointer = {
+            "location": location,
+            "entries": log.offset,
+            "summary": summary.to_dict(),
+            "text": summary.render(),
+        }
+        session_service.append_event(
+            session,
+            Event(
+                author="user",
+                actions=EventActions(state_delta={ARCHIVE_KEY: pointer, HISTORY_KEY: history}),
+            ),
+        )
+        return log.offset - archived_from
+
+    def search(self, history, pointer, query, page):
+        """Entries matching every word of ``query``, newest first, one page at a time.
+
+        Archived segments are only read until the page is filled.
+        """
+        terms = query.lower().split()
+        skip = (max(page, 1) - 1) * SEARCH_PAGE_SIZE
+        matches = []
+
+        def candidates():
+            live = history or []
+            offset = getattr(getattr(live, "log", None), "offset", 0)
+            for index in range(len(live) - 1, -1, -1):
+                yield offset + index, live[index]
+            location = (pointer or {}).get("location")
+            if location:
+                for first in reversed(self.segments(location)):
+                    entries = self.read_segment(location, first)
+                    for index in range(len(entries) - 1, -1, -1):
+                        yield first + index, entries[index]
+
+        for position, entry in candidates():
+            text = json.dumps(entry, default=json_default).lower()
+            if not all(term in text for term in terms):
+                continue
+            if skip:
+                skip -= 1
+                continue
+            if len(matches) == SEARCH_PAGE_SIZE:
+                return matches, True
+            matches.append((position, entry))
+        return matches, False
+
+
+history_archive = HistoryArchive()
+
+
+def _shorten(entry):
+    if not isinstance(entry, DICT_TYPES):
+        return {"note": _sanitize(str(entry))[:SEARCH_VALUE_CHARS]}
+    return {
+        k: v[:SEARCH_VALUE_CHARS] if isinstance(v, str) else v for k, v in _sanitize(entry).items()
+    }
+
+
+def search_past_interactions(query: str, page: int, tool_context: ToolContext) -> dict:
+    """
+    Searches all of the user's past interactions, including ones too old to be
+    shown in the interaction history, for entries containing every word of the query.
+
+    Args:
+        query: Words to look for, e.g. a course id, "refund", or a date like "2025-03"
+        page: 1 for the most recent matches, 2 for the next older ones, and so on
+
+    Returns:
+        Matching interactions, newest first, and whether there are more pages.
+    """
+    try:
+        matches, more = history_archive.search(
+            tool_context.state.get(HISTORY_KEY),
+            tool_context.state.get(ARCHIVE_KEY),
+            query,
+            page,
+        )
+    except (OSError, ValueError) as e:
+        return {"status": "error", "message": f"Past interactions are unavailable: {e}"}
+    return {
+        "status": "success",
+        "page": page,
+        "matches": [{"position": position, **_shorten(entry)} for position, entry in matches],
+        "more": more,
+    }
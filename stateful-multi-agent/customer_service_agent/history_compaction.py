@@ -0,0 +1,217 @@
+import os
+import weakref
+from collections import Counter
+from dataclasses import dataclass, field
+
+from .records import DICT_TYPES
+
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "1000"))
+DEFAULT_KEEP_LAST = int(os.environ.get("HISTORY_KEEP_LAST", "10"))
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def _sanitize(value):
+    """Neutralize braces in user-provided text.
+
+    The rendered history is part of the instruction template, so a literal
+    ``{name}`` typed by a user must not be treated as a state placeholder.
+    """
+    if isinstance(value, str):
+        return value.replace("{", "(").replace("}", ")")
+    if isinstance(value, DICT_TYPES):
+        return {k: _sanitize(v) for k, v in value.items()}
+    return value
+
+
+@dataclass
+class _Summary:
+    """Running summary of entries folded out of the verbatim window."""
+
+    count: int = 0
+    user_queries: int = 0
+    responses: Counter = field(default_factory=Counter)
+    purchased: list = field(default_factory=list)
+    refunded: list = field(default_factory=list)
+    other: Counter = field(default_factory=Counter)
+    first_timestamp: str = None
+    last_timestamp: str = None
+
+    def fold(self, entry):
+        self.count += 1
+        if not isinstance(entry, DICT_TYPES):
+            self.other["note"] += 1
+            return
+        action = entry.get("action", "interaction")
+        if action == "user_query":
+            self.user_queries += 1
+        elif action == "agent_response":
+            self.responses[entry.get("agent", "unknown")] += 1
+        elif action == "purchase_course":
+            self.purchased.append(entry.get("course_id"))
+        elif action == "refund_course":
+            self.refunded.append(entry.get("course_id"))
+        else:
+            self.other[action] += 1
+        timestamp = entry.get("timestamp")
+        if timestamp:
+            self.first_timestamp = self.first_timestamp or timestamp
+            self.last_timestamp = timestamp
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "user_queries": self.user_queries,
+            "responses": dict(self.responses),
+            "purchased": list(self.purchased),
+            "refunded": list(self.refunded),
+            "other": dict(self.other),
+            "first_timestamp": self.first_timestamp,
+            "last_timestamp": self.last_timestamp,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data or {})
+        data["responses"] = Counter(data.get("responses") or {})
+        data["other"] = Counter(data.get("other") or {})
+        return cls(**data)
+
+    def render(self):
+        parts = [f"{self.user_queries} user queries"]
+        if self.responses:
+            agents = ", ".join(f"{a} ({n})" for a, n in self.responses.items())
+            parts.append(f"responses from {agents}")
+        if self.purchased:
+            parts.append(f"purchased: {', '.join(map(str, self.purchased))}")
+        if self.refunded:
+            parts.append(f"refunded: {', '.join(map(str, self.refunded))}")
+        if self.other:
+            parts.append(", ".join(f"{a} ({n})" for a, n in self.other.items()))
+        span = ""
+        if self.first_timestamp:
+            span = f" between {self.first_timestamp} and {self.last_timestamp}"
+        return (
+            f"Summary of {self.count} earlier interactions{span}: "
+            + "; ".join(parts)
+            + "."
+        )
+
+
+@dataclass
+class CompactionStats:
+    """Token accounting for one session's history rendering."""
+
+    full_tokens: int = 0
+    compact_tokens: int = 0
+    saved_since_reset: int = 0
+
+    @property
+    def saved_tokens(self):
+        return max(self.full_tokens - self.compact_tokens, 0)
+
+
+class _SessionCompaction:
+    """Cached compaction state for one interaction log."""
+
+    def __init__(self, generation=0):
+        self.generation = generation
+        self.folded = 0
+        self.measured = 0
+        self.summary = _Summary()
+        self.rendered_length = -1
+        self.rendered = ""
+        self.stats = CompactionStats()
+
+
+class HistoryCompactor:
+    """Keeps the injected interaction history within a token budget.
+
+    The last ``keep_last`` entries are rendered verbatim (fewer if they alone
+    exceed the budget) and everything older is folded into a running summary.
+    Work is cached per session and only redone when new entries arrive.
+    """
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, keep_last=DEFAULT_KEEP_LAST):
+        self.token_budget = token_budget
+        self.keep_last = keep_last
+        self._sessions = weakref.WeakKeyDictionary()
+
+    def _state_for(self, history):
+        log = getattr(history, "log", None)
+        if log is None:
+            # Plain lists can't be tracked between turns; compute from scratch
+            return _SessionCompaction()
+        state = self._sessions.get(log)
+        if state is None or state.generation != log.generation:
+            # New log, or entries were rolled back: start over
+            stats = state.stats if state is not None else CompactionStats()
+            state = self._sessions[log] = _SessionCompaction(log.generation)
+            state.stats.saved_since_reset = stats.saved_since_reset
+        return state
+
+    def render(self, history, archive=None):
+        """Return the compacted history text for an instruction.
+
+        ``archive`` is the session's archive pointer (see history_archive),
+        whose summary is put in front of the entries still in memory.
+        """
+        rendered = self._render(history)
+        if archive and archive.get("text"):
+            return (
+                f"Archived: {archive['text']} "
+                "(use search_past_interactions for details)\n" + rendered
+            )
+        return rendered
+
+    def _render(self, history):
+        history = history if history is not None else []
+        state = self._state_for(history)
+        length = len(history)
+        if state.rendered_length == length:
+            state.stats.saved_since_reset += state.stats.saved_tokens
+            return state.rendered
+
+        # Account for what the full list would have cost, incrementally
+        for entry in history[state.measured:length]:
+            state.stats.full_tokens += estimate_tokens(repr(entry)) + 1
+        state.measured = length
+
+        # Pick the verbatim window, shrinking it to fit the budget
+        start = max(length - self.keep_last, state.folded)
+        window = [_sanitize(entry) for entry in history[start:length]]
+        while len(window) > 1 and estimate_tokens(repr(window)) > self.token_budget:
+            window.pop(0)
+            start += 1
+
+        # Fold everything before the window into the summary
+        for entry in history[state.folded:start]:
+            state.summary.fold(entry)
+        state.folded = start
+
+        if state.summary.count:
+            rendered = f"{state.summary.render()}\nRecent interactions: {window!r}"
+        else:
+            rendered = repr(window)
+
+        state.rendered = rendered
+        state.rendered_length = length
+        state.stats.compact_tokens = estimate_tokens(rendered)
+        state.stats.saved_since_reset += state.stats.saved_tokens
+        return rendered
+
+    def stats(self, history):
+        """Return the CompactionStats for a session's history."""
+        return self._state_for(history).stats
+
+    def pop_saved_tokens(self, history):
+        """Return the prompt tokens saved since the last call and reset."""
+        stats = self._state_for(history).stats
+        saved, stats.saved_since_reset = stats.saved_since_reset, 0
+        return saved
+
+
+default_compactor = HistoryCompactor()
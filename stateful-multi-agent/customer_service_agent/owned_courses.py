@@ -0,0 +1,99 @@
+import time
+
+from .records import DICT_TYPES, PurchaseRecord
+
+# State keys: the list shown to agents and the index the tools look up
+PURCHASED_KEY = "purchased_courses"
+OWNED_KEY = "owned_courses"
+
+# Refunds are allowed for this long after purchase
+REFUND_WINDOW_SECONDS = 30 * 24 * 60 * 60
+
+
+def _build_index(purchased_courses):
+    index = {}
+    for course in purchased_courses or []:
+        # Old string-only entries become records with no known purchase date
+        record = PurchaseRecord.from_value(course)
+        if record is not None:
+            index[record.id] = record
+    return index
+
+
+def _course_id(course):
+    if isinstance(course, DICT_TYPES):
+        return course.get("id")
+    return course
+
+
+def _indexes(index, purchased):
+    """True if ``index`` holds exactly the course ids of ``purchased``, in order."""
+    return index is not None and tuple(index) == tuple(map(_course_id, purchased))
+
+
+def _is_current(index, purchased):
+    """True if ``index`` is an up-to-date index of PurchaseRecords.
+
+    Any edit to ``purchased`` that changes its course ids makes it stale. An
+    index loaded back from JSON holds plain dicts and is rebuilt once.
+    """
+    if not _indexes(index, purchased):
+        return False
+    return not index or isinstance(next(iter(index.values())), PurchaseRecord)
+
+
+def owned_index(state):
+    """Return ``{course_id: PurchaseRecord}`` for the courses the user owns.
+
+    Sessions created before the index existed, or whose list was edited
+    directly, are re-indexed from ``purchased_courses``.
+    """
+    index = state.get(OWNED_KEY)
+    purchased = state.get(PURCHASED_KEY) or []
+    if not _is_current(index, purchased):
+        index = _build_index(purchased)
+        state[OWNED_KEY] = index
+    return index
+
+
+def owned_course_ids(state):
+    """Ids of the owned courses, without writing to state (safe for read-only views)."""
+    index = state.get(OWNED_KEY)
+    purchased = state.get(PURCHASED_KEY) or []
+    if not _indexes(index, purchased):
+        index = _build_index(purchased)
+    return list(index)
+
+
+def add_owned_course(state, course_id, purchased_at):
+    """Record a purchase (epoch seconds) in both the index and the purchased_courses list.
+
+    Both hold the same PurchaseRecord.
+    """
+    index = owned_index(state)
+    record = index[course_id] = PurchaseRecord(course_id, purchased_at)
+    purchased = state.get(PURCHASED_KEY) or []
+    purchased.append(record)
+    # Re-assign so the change is recorded in the state delta
+    state[PURCHASED_KEY] = purchased
+    state[OWNED_KEY] = index
+
+
+def remove_owned_course(state, course_id):
+    """Remove a course from both the index and the purchased_courses list."""
+    index = owned_index(state)
+    index.pop(course_id, None)
+    state[PURCHASED_KEY] = [
+        c
+        for c in state.get(PURCHASED_KEY) or []
+        if not (isinstance(c, DICT_TYPES) and c.get("id") == course_id) and c != course_id
+    ]
+    state[OWNED_KEY] = index
+
+
+def within_refund_window(record, now=None):
+    """True if an owned-course PurchaseRecord is still eligible for a refund."""
+    if record.purchased_at is None:
+        return False
+    now = now if now is not None else time.time()
+    return now - record.purchased_at <= REFUND_WINDOW_SECONDS
@@ -0,0 +1,267 @@
+import sys
+from collections.abc import Mapping
+from datetime import datetime
+from pydantic_core import SchemaSerializer, core_schema
+
+# State key the agents read the interaction history from
+HISTORY_KEY = "interaction_history"
+# Pointer to a session's archived history: {"location", "entries", "summary", "text"}
+ARCHIVE_KEY = "interaction_archive"
+
+# Timestamps are "YYYY-MM-DD HH:MM:SS" local time. UTC offsets are whole
+# minutes, so both directions are cached per minute and only the seconds
+# are converted per call: epoch minute -> "YYYY-MM-DD HH:MM:" and back.
+_MINUTE_PREFIXES = {}
+_MINUTE_EPOCHS = {}
+_MINUTE_CACHE_MAX = 16384
+_SECONDS = [f"{second:02d}" for second in range(60)]
+_SECONDS_BY_TEXT = {text: second for second, text in enumerate(_SECONDS)}
+
+
+def _minute_prefix(minute):
+    if len(_MINUTE_PREFIXES) >= _MINUTE_CACHE_MAX:
+        _MINUTE_PREFIXES.clear()
+    prefix = _MINUTE_PREFIXES[minute] = datetime.fromtimestamp(minute * 60).isoformat(" ")[:17]
+    return prefix
+
+
+def _minute_epoch(prefix):
+    if len(_MINUTE_EPOCHS) >= _MINUTE_CACHE_MAX:
+        _MINUTE_EPOCHS.clear()
+    try:
+        epoch = int(datetime.fromisoformat(prefix + "00").timestamp())
+    except ValueError:
+        epoch = None
+    _MINUTE_EPOCHS[prefix] = epoch
+    return epoch
+
+
+def to_epoch(text):
+    """Parse a timestamp into integer epoch seconds (None if it isn't one)."""
+    if not (isinstance(text, str) and len(text) == 19 and text[10] == " "):
+        return None
+    second = _SECONDS_BY_TEXT.get(text[17:])
+    if second is None or text[16] != ":":
+        return None
+    prefix = text[:17]
+    minute = _MINUTE_EPOCHS[prefix] if prefix in _MINUTE_EPOCHS else _minute_epoch(prefix)
+    return None if minute is None else minute + second
+
+
+def format_epoch(seconds):
+    """Inverse of to_epoch."""
+    prefix = _MINUTE_PREFIXES.get(seconds // 60) or _minute_prefix(seconds // 60)
+    return prefix + _SECONDS[seconds % 60]
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class _Record(Mapping):
+    """Read-only, slotted record that still looks like the dict it replaces.
+
+    ``record["key"]``, ``.get()``, iteration, ``==`` with dicts and ``repr``
+    all behave as for the JSON-friendly dict (``to_dict()``), so templating
+    and display code work unchanged. Records are immutable and shared, never
+    copied.
+    """
+
+    __slots__ = ()
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        return {key: self[key] for key in self}
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+# ----------------------------------------------------
+# Interaction history entries
+# ----------------------------------------------------
+# Slots shown under their own key, in the order the dicts used to have them
+_ENTRY_FIELDS = ("action", "agent", "query", "response", "course_id")
+
+
+class HistoryEntry(_Record):
+    """One interaction history entry.
+
+    Action, agent and course names are interned and the timestamp is kept as
+    integer epoch seconds; keys outside the common ones go to ``extra``.
+    """
+
+    __slots__ = _ENTRY_FIELDS + ("timestamp", "extra")
+
+    def __init__(
+        self,
+        action,
+        timestamp=None,
+        agent=None,
+        query=None,
+        response=None,
+        course_id=None,
+        extra=None,
+    ):
+        self.action = _intern(action)
+        self.timestamp = timestamp
+        self.agent = _intern(agent)
+        self.query = query
+        self.response = response
+        self.course_id = _intern(course_id)
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build an entry from its JSON form; anything else is returned unchanged."""
+        if not isinstance(data, dict):
+            return data
+        # Runs for every entry of a session being loaded; skips __init__
+        entry = cls.__new__(cls)
+        entry.action = entry.agent = entry.query = entry.response = entry.course_id = None
+        entry.timestamp = extra = None
+        for key, value in data.items():
+            if key in _ENTRY_FIELD_SET and type(value) is str:
+                setattr(entry, key, value)
+            elif key == "timestamp" and (epoch := to_epoch(value)) is not None:
+                entry.timestamp = epoch
+            else:
+                extra = extra or {}
+                extra[key] = value
+        entry.extra = extra
+        entry.action = _intern(entry.action)
+        entry.agent = _intern(entry.agent)
+        entry.course_id = _intern(entry.course_id)
+        return entry
+
+    def to_dict(self):
+        data = {}
+        for name in _ENTRY_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        if self.timestamp is not None:
+            data["timestamp"] = format_epoch(self.timestamp)
+        return data
+
+    def __iter__(self):
+        for name in _ENTRY_FIELDS:
+            if getattr(self, name) is not None:
+                yield name
+        if self.extra:
+            yield from self.extra
+        if self.timestamp is not None:
+            yield "timestamp"
+
+    def __getitem__(self, key):
+        if key == "timestamp" and self.timestamp is not None:
+            return format_epoch(self.timestamp)
+        if key in _ENTRY_FIELD_SET:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        # Hot path for renderers; avoids raising KeyError for absent keys
+        if key in _ENTRY_FIELD_SET:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif key == "timestamp" and self.timestamp is not None:
+            return format_epoch(self.timestamp)
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+
+_ENTRY_FIELD_SET = frozenset(_ENTRY_FIELDS)
+
+
+# ----------------------------------------------------
+# Purchases
+# ----------------------------------------------------
+class PurchaseRecord(_Record):
+    """One owned course: ``{"id": ..., "purchase_date": ...}`` in JSON form.
+
+    The purchase date is parsed once into ``purchased_at`` (epoch seconds,
+    None if unknown); a date that doesn't parse is kept as given.
+    """
+
+    __slots__ = ("id", "purchased_at", "_date_text")
+
+    def __init__(self, course_id, purchased_at=None):
+        self.id = _intern(course_id)
+        self.purchased_at = purchased_at
+        self._date_text = None
+
+    @classmethod
+    def from_value(cls, value):
+        """Build a record from a JSON dict or an old-style bare course id (None if neither)."""
+        if isinstance(value, PurchaseRecord):
+            return value
+        if isinstance(value, str) and value:
+            return cls(value)
+        if isinstance(value, dict) and value.get("id"):
+            purchase_date = value.get("purchase_date")
+            record = cls(value["id"], to_epoch(purchase_date))
+            if record.purchased_at is None:
+                record._date_text = purchase_date
+            return record
+        return None
+
+    def __iter__(self):
+        yield "id"
+        yield "purchase_date"
+
+    def __len__(self):
+        return 2
+
+    def __getitem__(self, key):
+        if key == "id":
+            return self.id
+        if key == "purchase_date":
+            if self.purchased_at is not None:
+                return format_epoch(self.purchased_at)
+            return self._date_text
+        raise KeyError(key)
+
+
+# For isinstance checks on state values: JSON dicts or records. Concrete
+# classes only; checking against an ABC such as Mapping is several times slower
+DICT_TYPES = (dict, HistoryEntry, PurchaseRecord)
+
+
+def json_default(value):
+    """``json.dumps(default=...)`` hook for records."""
+    if isinstance(value, _Record):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# Let pydantic serialize records (e.g. inside Event.actions.state_delta) as dicts
+_Record.__pydantic_serializer__ = SchemaSerializer(
+    core_schema.any_schema(
+        serialization=core_schema.plain_serializer_function_ser_schema(
+            lambda record: record.to_dict()
+        )
+    )
+)
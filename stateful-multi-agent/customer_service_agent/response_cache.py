@@ -0,0 +1,160 @@
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+DEFAULT_MAX_ENTRIES = int(os.environ.get("RESPONSE_CACHE_SIZE", "256"))
+DEFAULT_TTL_SECONDS = float(os.environ.get("RESPONSE_CACHE_TTL", "3600"))
+# A model call that raises never reaches after_model_callback; its pending
+# key is forgotten once the call has been unanswered this long
+STALE_CALL_SECONDS = 600
+
+def normalize_query(text):
+    """Lower-case and strip punctuation so trivial rewordings share a key."""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ResponseCache:
+    """LRU + TTL cache of final text answers for one agent.
+
+    Keys are the normalized user query plus a hash of the rendered
+    instruction (with the user's name and any other state in it). Questions
+    for which ``standalone(query)`` is false, e.g. a follow-up like "why?",
+    also hash every other message of the conversation, so they are only
+    reused for the same conversation. Without ``standalone`` every question
+    is keyed that way, which in practice only shares fresh sessions' first
+    questions.
+
+    Install ``before_model_callback`` and ``after_model_callback`` on the
+    agent. ``template`` is a callable returning the text the answers are
+    based on (e.g. the catalog fragment); when it changes, every entry is
+    dropped.
+    """
+
+    def __init__(
+        self,
+        template,
+        standalone=None,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        ttl_seconds=DEFAULT_TTL_SECONDS,
+    ):
+        self.template = template
+        self.standalone = standalone
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._template_text = None
+        self._template_hash = None
+
+    def _current_template(self):
+        """Hash the template, dropping every entry if it changed."""
+        text = self.template()
+        if text != self._template_text:
+            if self._template_text is not None and self._entries:
+                self._entries.clear()
+                self.stats.invalidations += 1
+            self._template_text = text
+            self._template_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return self._template_hash
+
+    def _prompt_hash(self, llm_request, query):
+        """Hash of the instruction and, unless the question stands alone, the conversation."""
+        digest = hashlib.sha256(self._current_template().encode("utf-8"))
+        instruction = llm_request.config.system_instruction if llm_request.config else None
+        digest.update(str(instruction or "").encode("utf-8"))
+        if self.standalone and self.standalone(query):
+            return digest.hexdigest()
+        for content in llm_request.contents or []:
+            texts = [part.text for part in content.parts or [] if part.text]
+            if content.role == "user" and " ".join(texts) == query:
+                digest.update(b"\0question")
+                continue
+            digest.update(b"\0" + content.model_dump_json(exclude_none=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.stats.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def _store(self, key, response):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+        self.stats.stores += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def before_model_callback(self, callback_context, llm_request):
+        contents = llm_request.contents
+        if contents and any(part.function_response for part in contents[-1].parts or []):
+            # Mid-turn follow-up after a tool call; not a fresh question
+            return None
+        user_content = callback_context.user_content
+        if not user_content or not user_content.parts:
+            return None
+        query = " ".join(part.text for part in user_content.parts if part.text)
+        if not query:
+            return None
+
+        key = (normalize_query(query), self._prompt_hash(llm_request, query))
+        response = self._lookup(key)
+        if response is not None:
+            self.stats.hits += 1
+            return response.model_copy(deep=True)
+        self.stats.misses += 1
+        now = time.monotonic()
+        stale = [
+            invocation_id
+            for invocation_id, (_, started) in self._pending.items()
+            if now - started > STALE_CALL_SECONDS
+        ]
+        for invocation_id in stale:
+            del self._pending[invocation_id]
+        self._pending[callback_context.invocation_id] = (key, now)
+        return None
+
+    def after_model_callback(self, callback_context, llm_response):
+        if llm_response.partial:
+            return None
+        key, _ = self._pending.pop(callback_context.invocation_id, (None, None))
+        if key is None or llm_response.error_code or not llm_response.content:
+            return None
+        parts = llm_response.content.parts or []
+        # Only plain text answers; never tool calls or transfers
+        if not parts or any(part.function_call for part in parts):
+            return None
+        text = "".join(part.text or "" for part in parts)
+        if not text.strip():
+            return None
+        self._store(key, llm_response.model_copy(deep=True))
+        return None
@@ -0,0 +1,207 @@
+import os
+import re
+import time
+from dataclasses import dataclass, field
+
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from .catalog import catalog
+
+# Set FAST_ROUTER=0 to always let the model route
+FAST_ROUTER_ENABLED = os.environ.get("FAST_ROUTER", "1") != "0"
+
+# A query is routed locally only if the best agent scores at least
+# MIN_SCORE and beats the runner-up by at least MIN_MARGIN
+MIN_SCORE = 2.0
+MIN_MARGIN = 1.5
+
+# ADK has no callback for a model call that raises, so its start time is
+# never popped; calls still unanswered after this long are forgotten
+STALE_CALL_SECONDS = 600
+
+# At most this many invocations are remembered (call start times and the
+# invocations already routed), each for at most STALE_CALL_SECONDS
+MAX_TRACKED_INVOCATIONS = 10_000
+
+# ADK passes other agents' turns to the model as user contents starting with this
+FOREIGN_CONTEXT = "For context:"
+
+
+def _pattern(*phrases):
+    return re.compile(r"\b(" + "|".join(phrases) + r")\b", re.I)
+
+
+# (agent, pattern, weight). Weights add up per agent; phrases that are
+# specific to one agent weigh more than words shared between agents.
+ROUTING_RULES = (
+    ("order_agent", _pattern(r"refund(ed)?", r"money back", r"cancel my"), 2.0),
+    ("order_agent", _pattern(r"my (courses|orders|purchases)", r"purchase history", r"what do i own"), 2.5),
+    ("sales_agent", _pattern(r"buy", r"purchase", r"sign (me )?up", r"enroll"), 2.0),
+    ("sales_agent", _pattern(r"price", r"cost", r"how much", r"discount"), 1.5),
+    ("sales_agent", _pattern(r"what courses", r"which courses", r"courses do you (offer|have)"), 2.0),
+    ("course_support_agent", _pattern(r"section", r"module", r"lesson", r"chapter"), 2.0),
+    ("course_support_agent", _pattern(r"stuck", r"explain", r"how do i (set up|install|deploy)"), 1.0),
+    ("policy_agent", _pattern(r"refund policy", r"policy", r"policies", r"guidelines?"), 2.5),
+    ("policy_agent", _pattern(r"privacy", r"code of conduct", r"terms", r"lifetime access", r"commercial use"), 2.0),
+)
+
+# "refund policy" is a policy question even though it says "refund"
+POLICY_OVERRIDES = _pattern(r"refund policy", r"refund window", r"money-back guarantee")
+
+
+@dataclass
+class RouterStats:
+    """Hit rate and estimated savings of the fast-path router."""
+
+    queries: int = 0
+    hits: int = 0
+    hits_by_agent: dict = field(default_factory=dict)
+    route_seconds: float = 0.0
+    # Timing of the model calls the router did not replace
+    llm_calls: int = 0
+    llm_seconds: float = 0.0
+
+    @property
+    def hit_rate(self):
+        return self.hits / self.queries if self.queries else 0.0
+
+    @property
+    def avg_llm_seconds(self):
+        return self.llm_seconds / self.llm_calls if self.llm_calls else 0.0
+
+    @property
+    def saved_seconds(self):
+        """Estimated model time saved: one average routing call per hit."""
+        return self.hits * self.avg_llm_seconds - self.route_seconds
+
+
+def _user_query(callback_context, llm_request):
+    """The user's message if it is what the model is about to answer.
+
+    Returns None when the request ends with anything else, e.g. a tool result
+    or a sub-agent handing the conversation back, so the model decides those.
+    """
+    contents = llm_request.contents
+    if not contents or contents[-1].role != "user" or not contents[-1].parts:
+        return None
+    parts = contents[-1].parts
+    if parts[0].text == FOREIGN_CONTEXT or any(part.function_response for part in parts):
+        return None
+    user_content = callback_context.user_content
+    if user_content is None or not user_content.parts:
+        return None
+    text = " ".join(part.text for part in user_content.parts if part.text)
+    return text or None
+
+
+def _transfer(agent_name):
+    return LlmResponse(
+        content=types.Content(
+            role="model",
+            parts=[
+                types.Part(
+                    function_call=types.FunctionCall(
+                        name="transfer_to_agent", args={"agent_name": agent_name}
+                    )
+                )
+            ],
+        )
+    )
+
+
+class FastPathRouter:
+    """Keyword/intent matcher that routes clear-cut queries without the model.
+
+    Installed as a before/after model callback pair on the root agent. When a
+    query scores confidently for one sub-agent, the callback answers with a
+    transfer_to_agent call itself and the root model call is skipped; any
+    other query falls through to the model as before. Only the first model
+    call of an invocation is routed: later calls (e.g. after a sub-agent
+    hands the conversation back) are the model's.
+    """
+
+    def __init__(
+        self,
+        rules=ROUTING_RULES,
+        min_score=MIN_SCORE,
+        min_margin=MIN_MARGIN,
+        enabled=FAST_ROUTER_ENABLED,
+    ):
+        self.rules = rules
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.enabled = enabled
+        self.stats = RouterStats()
+        self._llm_started = {}
+        # Invocations whose first model call was seen, with when
+        self._seen = {}
+
+    def scores(self, query):
+        """Return ``{agent_name: score}`` for a query."""
+        scores = {}
+        for agent_name, pattern, weight in self.rules:
+            if pattern.search(query):
+                scores[agent_name] = scores.get(agent_name, 0.0) + weight
+        if POLICY_OVERRIDES.search(query):
+            scores.pop("order_agent", None)
+        # Naming a course makes content questions more likely to be support
+        if "course_support_agent" in scores and catalog.resolve(query):
+            scores["course_support_agent"] += 0.5
+        return scores
+
+    def route(self, query):
+        """Return ``(agent_name, score)``, or ``(None, score)`` when unsure."""
+        ranked = sorted(self.scores(query).items(), key=lambda item: item[1], reverse=True)
+        if not ranked:
+            return None, 0.0
+        best, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if score >= self.min_score and score - runner_up >= self.min_margin:
+            return best, score
+        return None, score
+
+    def before_model_callback(self, callback_context, llm_request):
+        if not self.enabled or "transfer_to_agent" not in llm_request.tools_dict:
+            return None
+        invocation_id = callback_context.invocation_id
+        if invocation_id in self._seen:
+            return None
+        started = time.perf_counter()
+        self._forget_stale_calls(started)
+        self._seen[invocation_id] = started
+        query = _user_query(callback_context, llm_request)
+        if query is None:
+            return None
+
+        agent_name, score = self.route(query)
+        self.stats.queries += 1
+        self.stats.route_seconds += time.perf_counter() - started
+        if agent_name is None:
+            self._llm_started[invocation_id] = time.perf_counter()
+            return None
+
+        self.stats.hits += 1
+        self.stats.hits_by_agent[agent_name] = self.stats.hits_by_agent.get(agent_name, 0) + 1
+        return _transfer(agent_name)
+
+    def _forget_stale_calls(self, now):
+        # Both dicts are in start order, so the stale entries come first
+        for calls in (self._llm_started, self._seen):
+            while calls and (
+                len(calls) >= MAX_TRACKED_INVOCATIONS
+                or now - next(iter(calls.values())) > STALE_CALL_SECONDS
+            ):
+                del calls[next(iter(calls))]
+
+    def after_model_callback(self, callback_context, llm_response):
+        if llm_response.partial:
+            return None
+        started = self._llm_started.pop(callback_context.invocation_id, None)
+        if started is not None:
+            self.stats.llm_calls += 1
+            self.stats.llm_seconds += time.perf_counter() - started
+        return None
+
+
+fast_router = FastPathRouter()
@@ -0,0 +1,127 @@
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from .catalog import catalog
+from .owned_courses import owned_course_ids
+
+# Number of sections injected per question (override with SECTION_TOP_K)
+DEFAULT_TOP_K = int(os.environ.get("SECTION_TOP_K", "5"))
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+_STOPWORDS = frozenset(
+    "a an and are can do does for how i in is it me my of on or the to what where which with you".split()
+)
+
+
+def tokenize(text):
+    return [
+        token
+        for token in re.findall(r"[a-z0-9]+", text.lower())
+        if token not in _STOPWORDS
+    ]
+
+
+@dataclass(frozen=True)
+class Section:
+    course_id: str
+    number: int
+    title: str
+
+
+class SectionIndex:
+    """BM25 index over every course section in the catalog.
+
+    Each section is indexed with its title, its number ("section 4") and its
+    course's id and name, so "section 4 of chatbot mastery" finds the right
+    entry. Built once; searches only score documents sharing a query term.
+    """
+
+    def __init__(self, catalog, k1=K1, b=B):
+        self.k1 = k1
+        self.b = b
+        self.sections = []
+        self._lengths = []
+        self._postings = {}
+        for course_id, course in catalog.courses.items():
+            for number, title in enumerate(course.get("sections", []), 1):
+                doc_id = len(self.sections)
+                self.sections.append(Section(course_id, number, title))
+                terms = Counter(
+                    tokenize(f"{title} section {number} {course_id} {course['name']}")
+                )
+                self._lengths.append(sum(terms.values()))
+                for term, count in terms.items():
+                    self._postings.setdefault(term, []).append((doc_id, count))
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0
+        total = len(self.sections)
+        self._idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def search(self, query, course_ids=None, top_k=DEFAULT_TOP_K):
+        """Return the ``top_k`` best matching Sections, optionally per course."""
+        allowed = set(course_ids) if course_ids is not None else None
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, count in self._postings[term]:
+                if allowed is not None and self.sections[doc_id].course_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / self._avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * count * (self.k1 + 1) / (count + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [self.sections[doc_id] for doc_id, _ in ranked]
+
+
+def render_sections(sections):
+    """Group sections by course, in course and section order."""
+    by_course = {}
+    for section in sorted(sections, key=lambda s: (s.course_id, s.number)):
+        by_course.setdefault(section.course_id, []).append(section)
+    return "\n\n".join(
+        f"{catalog.get(course_id)['name']} (ID: {course_id}):\n"
+        + "\n".join(f"{s.number}. {s.title}" for s in course_sections)
+        for course_id, course_sections in by_course.items()
+    )
+
+
+def relevant_sections_text(query, course_ids, top_k=DEFAULT_TOP_K):
+    """Text for the sections of ``course_ids`` that best match ``query``.
+
+    Falls back to the full outline of those courses when nothing matches
+    (e.g. "what's in my course?").
+    """
+    if not course_ids:
+        return "The user does not own any courses."
+    sections = section_index.search(query, course_ids, top_k) if query else []
+    if not sections:
+        return "\n\n".join(
+            f"{catalog.get(course_id)['name']} (ID: {course_id}):\n{catalog.sections[course_id]}"
+            for course_id in course_ids
+            if course_id in catalog
+        )
+    return render_sections(sections)
+
+
+def inject_relevant_sections(callback_context, llm_request):
+    """before_model_callback: append the relevant owned-course sections."""
+    user_content = callback_context.user_content
+    query = ""
+    if user_content and user_content.parts:
+        query = " ".join(part.text for part in user_content.parts if part.text)
+    text = relevant_sections_text(query, owned_course_ids(callback_context.state))
+    llm_request.append_instructions([f"<course_sections>\n{text}\n</course_sections>"])
+    return None
+
+
+# Built once at import and shared by every session
+section_index = SectionIndex(catalog)
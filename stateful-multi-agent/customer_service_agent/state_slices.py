@@ -0,0 +1,228 @@
+import weakref
+from collections import deque
+from dataclasses import dataclass
+
+from .history_compaction import _sanitize, default_compactor, estimate_tokens
+from .owned_courses import PURCHASED_KEY, owned_course_ids
+from .records import ARCHIVE_KEY, DICT_TYPES, HISTORY_KEY
+
+# History actions that belong to the order agent
+ORDER_ACTIONS = ("purchase_course", "refund_course")
+
+# How many of its own recent actions the order agent sees
+ORDER_ACTIONS_KEEP = 10
+
+
+# ----------------------------------------------------
+# Slice renderers: state -> compact text for one placeholder
+# ----------------------------------------------------
+def _purchase_key(state):
+    return tuple(
+        (c.get("id"), c.get("purchase_date")) if isinstance(c, DICT_TYPES) else (c, None)
+        for c in state.get(PURCHASED_KEY) or []
+    )
+
+
+def render_owned_ids(state):
+    """Owned course ids only, e.g. ``ai_chatbot_mastery, ai_saas_builder``."""
+    ids = owned_course_ids(state)
+    return ", ".join(ids) if ids else "None"
+
+
+def render_purchases(state):
+    """One line per purchase with its date."""
+    lines = [
+        f"- {course_id} (purchased {purchase_date})" if purchase_date else f"- {course_id}"
+        for course_id, purchase_date in _purchase_key(state)
+    ]
+    return "\n".join(lines) if lines else "None"
+
+
+def render_history(state):
+    """The token-budgeted history, as rendered by the default compactor."""
+    return default_compactor.render(state.get(HISTORY_KEY), state.get(ARCHIVE_KEY))
+
+
+class _OrderActions:
+    """Incrementally collected purchase/refund entries of one log."""
+
+    def __init__(self, generation):
+        self.generation = generation
+        self.position = 0
+        self.actions = deque(maxlen=ORDER_ACTIONS_KEEP)
+
+
+_order_actions = weakref.WeakKeyDictionary()
+
+
+def render_order_actions(state):
+    """The most recent purchase and refund entries only."""
+    history = state.get(HISTORY_KEY) or []
+    log = getattr(history, "log", None)
+    if log is None:
+        actions = [
+            e for e in history if isinstance(e, DICT_TYPES) and e.get("action") in ORDER_ACTIONS
+        ]
+        actions = actions[-ORDER_ACTIONS_KEEP:]
+    else:
+        tracked = _order_actions.get(log)
+        if tracked is None or tracked.generation != log.generation:
+            tracked = _order_actions[log] = _OrderActions(log.generation)
+        # Only look at entries appended since the last render
+        for entry in log.entries(tracked.position):
+            if isinstance(entry, DICT_TYPES) and entry.get("action") in ORDER_ACTIONS:
+                tracked.actions.append(entry)
+        tracked.position = len(log)
+        actions = list(tracked.actions)
+    if not actions:
+        return "None"
+    return "\n".join(
+        f"- {e.get('timestamp', 'unknown time')}: {e['action']} {e.get('course_id', '')}".rstrip()
+        for e in map(_sanitize, actions)
+    )
+
+
+# Cheap version keys for the cached renderers; None means "don't cache"
+_VERSION_KEYS = {
+    render_owned_ids: _purchase_key,
+    render_purchases: _purchase_key,
+}
+
+
+# ----------------------------------------------------
+# Declarative per-agent projections
+# ----------------------------------------------------
+# placeholder in the agent's instruction -> renderer for that agent
+AGENT_SLICES = {
+    "customer_service": {
+        "purchased_courses": render_owned_ids,
+        "interaction_history": render_history,
+    },
+    "sales_agent": {
+        "purchased_courses": render_owned_ids,
+        "interaction_history": render_history,
+    },
+    "order_agent": {
+        "purchased_courses": render_purchases,
+        "interaction_history": render_order_actions,
+    },
+    "course_support_agent": {
+        "purchased_courses": render_owned_ids,
+    },
+    "policy_agent": {},
+}
+
+
+@dataclass
+class SliceStats:
+    """Prompt-token accounting for one agent's instructions."""
+
+    calls: int = 0
+    # Last instruction as rendered, and as it would be with raw state reprs
+    tokens: int = 0
+    raw_tokens: int = 0
+    total_tokens: int = 0
+    total_raw_tokens: int = 0
+
+    @property
+    def saved_tokens(self):
+        return max(self.total_raw_tokens - self.total_tokens, 0)
+
+
+class _RawHistoryTokens:
+    """Incremental token estimate of repr(history), as ADK would inject it."""
+
+    def __init__(self):
+        self._logs = weakref.WeakKeyDictionary()
+
+    def __call__(self, history):
+        log = getattr(history, "log", None)
+        if log is None:
+            return estimate_tokens(repr(list(history or [])))
+        generation, measured, tokens = self._logs.get(log, (log.generation, 0, 0))
+        if generation != log.generation:
+            measured, tokens = 0, 0
+        for entry in log.entries(measured):
+            tokens += estimate_tokens(repr(entry)) + 1
+        self._logs[log] = (log.generation, len(log), tokens)
+        return tokens
+
+
+class StateSlicer:
+    """Renders each agent's instruction from only the state slice it needs.
+
+    Renderings are cached per agent and placeholder, keyed on a cheap version
+    of the state they read, so unchanged state is not re-rendered.
+    """
+
+    def __init__(self, agent_slices=AGENT_SLICES):
+        self.agent_slices = agent_slices
+        self.stats = {}
+        self._cache = {}
+        self._raw_history_tokens = _RawHistoryTokens()
+
+    def render_slice(self, agent_name, placeholder, state):
+        renderer = self.agent_slices[agent_name][placeholder]
+        version_key = _VERSION_KEYS.get(renderer)
+        if version_key is None:
+            return renderer(state)
+        key = version_key(state)
+        cached = self._cache.get((agent_name, placeholder))
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        text = renderer(state)
+        self._cache[(agent_name, placeholder)] = (key, text)
+        return text
+
+    def _raw_tokens(self, placeholder, state):
+        if placeholder == HISTORY_KEY:
+            return self._raw_history_tokens(state.get(HISTORY_KEY))
+        return estimate_tokens(repr(state.get(placeholder)))
+
+    def render(self, agent_name, template, state):
+        """Fill this agent's slice placeholders and record token counts."""
+        instruction = template
+        placeholder_tokens = 0
+        raw_tokens = 0
+        for placeholder in self.agent_slices.get(agent_name, {}):
+            text = self.render_slice(agent_name, placeholder, state)
+            instruction = instruction.replace("{" + placeholder + "}", text)
+            placeholder_tokens += estimate_tokens(placeholder) + 1
+            raw_tokens += self._raw_tokens(placeholder, state)
+
+        stats = self.stats.setdefault(agent_name, SliceStats())
+        stats.calls += 1
+        stats.tokens = estimate_tokens(instruction)
+        stats.raw_tokens = estimate_tokens(template) - placeholder_tokens + raw_tokens
+        stats.total_tokens += stats.tokens
+        stats.total_raw_tokens += stats.raw_tokens
+        return instruction
+
+    def report(self):
+        """Per-agent ``{calls, tokens, raw_tokens, saved_tokens}``."""
+        return {
+            agent_name: {
+                "calls": stats.calls,
+                "tokens": stats.tokens,
+                "raw_tokens": stats.raw_tokens,
+                "saved_tokens": stats.saved_tokens,
+            }
+            for agent_name, stats in self.stats.items()
+        }
+
+
+state_slicer = StateSlicer()
+
+
+def sliced_instruction(agent_name, template, slicer=state_slicer):
+    """Wrap an instruction template so it only receives the agent's state slice.
+
+    Returns an ADK instruction provider. Placeholders listed for the agent in
+    AGENT_SLICES are rendered locally; any others (e.g. {user_name}) are
+    still filled in from state by ADK.
+    """
+
+    def provider(context):
+        return slicer.render(agent_name, template, context.state)
+
+    return provider
@@ -1,38 +1,19 @@
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
 
+from ...catalog import catalog
+from ...owned_courses import owned_index, remove_owned_course, within_refund_window
+from ...records import HistoryEntry, format_epoch
+from ...state_slices import sliced_instruction
+
 
 # ----------------------------------------------------
 # Course Catalog
 # ----------------------------------------------------
-COURSE_CATALOG = {
-    "ai_marketing_platform": {
-        "name": "Fullstack AI Marketing Platform",
-        "price": 149,
-    },
-    "ai_automation_engineer": {
-        "name": "AI Automation Engineer Bootcamp",
-        "price": 199,
-    },
-    "ai_chatbot_mastery": {
-        "name": "AI Chatbot Mastery",
-        "price": 129,
-    },
-    "ai_saas_builder": {
-        "name": "AI SaaS Builder Accelerator",
-        "price": 249,
-    },
-    "prompt_engineering_deep_dive": {
-        "name": "Prompt Engineering Deep Dive",
-        "price": 79,
-    },
-    "ds_llm_foundations": {
-        "name": "Data Science & LLM Foundations",
-        "price": 99,
-    },
-}
+COURSE_CATALOG = catalog.courses
 
 
 def get_current_time() -> dict:
@@ -46,57 +27,39 @@ def get_current_time() -> dict:
 def refund_course(tool_context: ToolContext, course_id: str) -> dict:
     """
     Simulates refunding a specific course if owned and within the 30-day policy.
-    Updates state by removing the course from purchased_courses.
+    Updates state by removing the course from purchased_courses and owned_courses.
     """
-    if course_id not in COURSE_CATALOG:
-        return {"status": "error", "message": f"Course ID '{course_id}' does not exist."}
-
-    current_time = datetime.now()
-    course_to_refund = None
-    course_found = False
+    # Exact ids or names only; near-misses come back as suggestions
+    resolved_id = catalog.exact(course_id)
+    if resolved_id is None:
+        return catalog.unknown_course(course_id)
+    course_id = resolved_id
 
-    # Get current purchased courses
-    current_purchased_courses = tool_context.state.get("purchased_courses", [])
+    current_time = int(time.time())
 
-    # Find the course and check ownership
-    for course in current_purchased_courses:
-        if isinstance(course, dict) and course.get("id") == course_id:
-            course_found = True
-            course_to_refund = course
-            break
+    # Find the course and check ownership (index lookup, migrated on first use)
+    course_to_refund = owned_index(tool_context.state).get(course_id)
 
-    if not course_found:
+    if course_to_refund is None:
         return {
             "status": "error",
             "message": "You don't own this course, so it can't be refunded.",
         }
 
     # Check if the purchase is within the 30-day refund window
-    purchase_date = datetime.strptime(
-        course_to_refund["purchase_date"], "%Y-%m-%d %H:%M:%S"
-    )
-    if (current_time - purchase_date) > timedelta(days=30):
+    if not within_refund_window(course_to_refund, current_time):
         return {
             "status": "error",
             "message": "This course was purchased more than 30 days ago and is no longer eligible for a refund.",
         }
 
-    # Create new list without the course to be refunded
-    new_purchased_courses = [
-        c for c in current_purchased_courses if not (isinstance(c, dict) and c.get("id") == course_id)
-    ]
-
-    # Update purchased courses in state
-    tool_context.state["purchased_courses"] = new_purchased_courses
+    # Remove the course from purchased courses and the index
+    remove_owned_course(tool_context.state, course_id)
 
     # Update interaction history
     current_interaction_history = tool_context.state.get("interaction_history", [])
     current_interaction_history.append(
-        {
-            "action": "refund_course",
-            "course_id": course_id,
-            "timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S"),
-        }
+        HistoryEntry("refund_course", current_time, course_id=course_id)
     )
     tool_context.state["interaction_history"] = current_interaction_history
 
@@ -108,7 +71,7 @@ def refund_course(tool_context: ToolContext, course_id: str) -> dict:
         "message": f"""Successfully refunded the {course_name} course!
          Your ${course_price} will be returned to your original payment method within 3-5 business days.""",
         "course_id": course_id,
-        "timestamp": current_time.strftime("%Y-%m-%d %H:%M:%S"),
+        "timestamp": format_epoch(current_time),
     }
 
 # Create the order agent
@@ -116,7 +79,9 @@ order_agent = Agent(
     name="order_agent",
     model="gemini-2.0-flash",
     description="Order agent for viewing purchase history and processing refunds",
-    instruction="""
+    instruction=sliced_instruction(
+        "order_agent",
+        """
     You are the order agent for the AI Developer Accelerator community.
     Your role is to help users view their purchase history, course access, and process refunds for any of our courses.
 
@@ -125,16 +90,17 @@ order_agent = Agent(
     </user_info>
 
     <purchase_info>
-    Purchased Courses: {purchased_courses}
+    Purchased Courses:
+    {purchased_courses}
     </purchase_info>
 
-    <interaction_history>
+    <recent_order_activity>
     {interaction_history}
-    </interaction_history>
+    </recent_order_activity>
 
     When users ask about their purchases:
     1. Check their course list from the purchase info above.
-       - Course information is stored as objects with "id" and "purchase_date" properties.
+       - Each purchase is listed with its course ID and purchase date.
     2. Format the response clearly, showing which courses they own and when they were purchased.
 
     When users request a refund for a specific course:
@@ -153,6 +119,7 @@ order_agent = Agent(
     Remember:
     - Be clear, professional, and helpful.
     - Always mention our 30-day money-back guarantee when relevant.
-    """,
+    """
+    ),
     tools=[refund_course, get_current_time],
 )
\ No newline at end of file
@@ -1,20 +1,14 @@
+import re
+
 from google.adk.agents import Agent
 
-COURSE_CATALOG_INFO = """
-- Fullstack AI Marketing Platform: Includes 6 weeks of group support with weekly coaching calls.
-- AI Automation Engineer Bootcamp: Includes automation templates, project-based training, community support.
-- AI Chatbot Mastery: Includes deployment training + prebuilt bot templates.
-- AI SaaS Builder Accelerator: Includes product planning, payments, auth, billing, and deployment guidance.
-- Prompt Engineering Deep Dive: Includes 100+ prompt patterns and real-world examples.
-- Data Science & LLM Foundations: A beginner-friendly structured curriculum.
-"""
+from ...catalog import catalog
+from ...response_cache import ResponseCache
+from ...state_slices import sliced_instruction
 
-# Create the policy agent
-policy_agent = Agent(
-    name="policy_agent",
-    model="gemini-2.0-flash",
-    description="Policy agent for the AI Developer Accelerator community",
-    instruction=f"""
+COURSE_CATALOG_INFO = catalog.policy_fragment
+
+POLICY_INSTRUCTION = f"""
     You are the policy agent for the AI Developer Accelerator community. Your role is to help users
     understand our community guidelines and policies.
 
@@ -66,6 +60,28 @@ policy_agent = Agent(
     2. Quote relevant policy sections.
     3. If asked about specific course features (like coaching), use the <course_info> to answer accurately.
     4. Direct complex issues or refund requests to the appropriate agent (support or order agent).
-    """,
+    """
+
+# Questions naming a policy topic are answered from the policy text alone,
+# whatever was said earlier in the conversation
+POLICY_TOPICS = re.compile(
+    r"\b(polic(y|ies)|refunds?|money.back|guidelines?|promotions?|self.promotion|"
+    r"privacy|data|lifetime access|code usage|commercial\w*|resell\w*|credit)\b",
+    re.I,
+)
+
+# Policy answers come from static text, so identical questions share an answer
+policy_cache = ResponseCache(
+    template=lambda: catalog.policy_fragment, standalone=POLICY_TOPICS.search
+)
+
+# Create the policy agent
+policy_agent = Agent(
+    name="policy_agent",
+    model="gemini-2.0-flash",
+    description="Policy agent for the AI Developer Accelerator community",
+    instruction=sliced_instruction("policy_agent", POLICY_INSTRUCTION),
     tools=[],
-)
\ No newline at end of file
+    before_model_callback=policy_cache.before_model_callback,
+    after_model_callback=policy_cache.after_model_callback,
+)
@@ -1,51 +1,19 @@
 
-from datetime import datetime
+import time
 
 from google.adk.agents import Agent
 from google.adk.tools.tool_context import ToolContext
 
+from ...catalog import catalog
+from ...owned_courses import add_owned_course, owned_index
+from ...records import HistoryEntry, format_epoch
+from ...state_slices import sliced_instruction
+
 
 # ----------------------------------------------------
-# Course Catalog (Editable)
+# Course Catalog (edit customer_service_agent/courses.json)
 # ----------------------------------------------------
-COURSE_CATALOG = {
-    "ai_marketing_platform": {
-        "name": "Fullstack AI Marketing Platform",
-        "price": 149,
-        "value_proposition": "Learn to build AI-powered marketing automation apps",
-        "includes": "6 weeks of group support with weekly coaching calls",
-    },
-    "ai_automation_engineer": {
-        "name": "AI Automation Engineer Bootcamp",
-        "price": 199,
-        "value_proposition": "Master AI workflow automation for real businesses",
-        "includes": "Automation templates, project-based training, community support",
-    },
-    "ai_chatbot_mastery": {
-        "name": "AI Chatbot Mastery",
-        "price": 129,
-        "value_proposition": "Build advanced LLM chatbots with memory, tools, and actions",
-        "includes": "Deployment training + prebuilt bot templates",
-    },
-    "ai_saas_builder": {
-        "name": "AI SaaS Builder Accelerator",
-        "price": 249,
-        "value_proposition": "Learn to build and launch your own AI SaaS startup",
-        "includes": "Product planning, payments, auth, billing, and deployment",
-    },
-    "prompt_engineering_deep_dive": {
-        "name": "Prompt Engineering Deep Dive",
-        "price": 79,
-        "value_proposition": "Master advanced prompting, agents, and LLM optimization",
-        "includes": "100+ prompt patterns and real-world examples",
-    },
-    "ds_llm_foundations": {
-        "name": "Data Science & LLM Foundations",
-        "price": 99,
-        "value_proposition": "Learn data fundamentals, embeddings, RAG, and LLM internals",
-        "includes": "Beginner-friendly structured curriculum",
-    },
-}
+COURSE_CATALOG = catalog.courses
 
 
 # ----------------------------------------------------
@@ -56,39 +24,31 @@ def purchase_course(tool_context: ToolContext, course_id: str) -> dict:
     Purchases ANY course from the COURSE_CATALOG.
     Updates state with purchase information.
     """
-    if course_id not in COURSE_CATALOG:
-        return {"status": "error", "message": f"Course ID '{course_id}' does not exist."}
-
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # Exact ids or names only; near-misses come back as suggestions
+    resolved_id = catalog.exact(course_id)
+    if resolved_id is None:
+        return catalog.unknown_course(course_id)
+    course_id = resolved_id
 
-    # Retrieve current purchased courses
-    purchased = tool_context.state.get("purchased_courses", [])
-    owned_ids = [c["id"] for c in purchased if isinstance(c, dict)]
+    current_time = int(time.time())
 
-    # Check if user already owns it
-    if course_id in owned_ids:
+    # Check if user already owns it (index lookup, migrated on first use)
+    if course_id in owned_index(tool_context.state):
         return {"status": "error", "message": "You already own this course!"}
 
-    # Add new purchased course
-    purchased.append({"id": course_id, "purchase_date": current_time})
-    tool_context.state["purchased_courses"] = purchased
+    # Add new purchased course to purchased_courses and the index
+    add_owned_course(tool_context.state, course_id, current_time)
 
     # Update interaction history
     history = tool_context.state.get("interaction_history", [])
-    history.append(
-        {
-            "action": "purchase_course",
-            "course_id": course_id,
-            "timestamp": current_time,
-        }
-    )
+    history.append(HistoryEntry("purchase_course", current_time, course_id=course_id))
     tool_context.state["interaction_history"] = history
 
     return {
         "status": "success",
         "message": f"Successfully purchased {COURSE_CATALOG[course_id]['name']}!",
         "course_id": course_id,
-        "timestamp": current_time,
+        "timestamp": format_epoch(current_time),
     }
 
 
@@ -96,16 +56,7 @@ def purchase_course(tool_context: ToolContext, course_id: str) -> dict:
 # Format Course Catalog for Agent Instructions
 # ----------------------------------------------------
 def format_course_list():
-    text = ""
-    for cid, info in COURSE_CATALOG.items():
-        text += f"""
-- Name: {info['name']}
-  ID: {cid}
-  Price: ${info['price']}
-  Value Proposition: {info['value_proposition']}
-  Includes: {info['includes']}
-"""
-    return text
+    return catalog.sales_fragment
 
 
 COURSE_LIST_TEXT = format_course_list()
@@ -118,7 +69,9 @@ sales_agent = Agent(
     name="sales_agent",
     model="gemini-2.0-flash",
     description="Sales agent for the AI Developer Accelerator community.",
-    instruction=f"""
+    instruction=sliced_instruction(
+        "sales_agent",
+        f"""
 You are a sales agent for the AI Developer Accelerator community, handling sales for all courses.
 
 <user_info>
@@ -139,8 +92,7 @@ Available Courses:
 When interacting with users:
 
 1. Always check if the user already owns a course.
-   - Purchased courses are stored as objects with "id" and "purchase_date".
-   - Compare based on the course ID.
+   - Purchased courses are listed by course ID.
 
 2. If the user already owns the course:
    - Remind them they already have access.
@@ -162,6 +114,7 @@ Remember:
 - Be friendly, helpful, and non-pushy.
 - Highlight practical skills and real-world outcomes.
 - Emphasize hands-on learning and real application building.
-""",
+"""
+    ),
     tools=[purchase_course],
 )
\ No newline at end of file
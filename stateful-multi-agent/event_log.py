@@ -0,0 +1,320 @@
+"""Structured agent event log with a background writer.
+
+call_agent_async used to print every event, text part and banner to stdout
+as it went, on the event loop. Under load the terminal then throttles every
+turn. Instead, turns emit small dict records ({"type": "event", ...}) to an
+EventLog. The log only enqueues them, and a writer thread drains the queue
+in batches into the configured sink:
+
+    TerminalSink   the familiar colored console trace (default)
+    JsonLinesSink  one JSON object per line, appended to a file
+    NullSink       nothing (records are not even queued)
+
+Select one with EVENT_SINK=terminal|off|jsonl:<path> or set_event_sink().
+The queue is bounded. When the sink falls behind, new records are dropped
+and counted, and a "dropped" record tells the sink how many were lost; emit
+never waits. Only the CLI prompt and shutdown wait for the writer, and never
+longer than a timeout.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+EVENT_SINK_ENV = "EVENT_SINK"
+
+# Records waiting for the writer before new ones are dropped
+MAX_PENDING = 10000
+# Records written per sink call
+BATCH_SIZE = 256
+# How long the writer lets records collect before writing them
+LINGER_SECONDS = 0.01
+# Longest flush() and close() wait for the writer by default
+FLUSH_TIMEOUT = 5.0
+
+
+# ANSI color codes for terminal output
+class Colors:
+    RESET = "\033[0m"
+    BOLD = "\033[1m"
+    UNDERLINE = "\033[4m"
+    ITALIC = "\033[3m"
+    STRIKETHROUGH = "\033[9m"
+
+
+
+    # Foreground colors
+    BLACK = "\033[30m"
+    RED = "\033[31m"
+    GREEN = "\033[32m"
+    YELLOW = "\033[33m"
+    BLUE = "\033[34m"
+    MAGENTA = "\033[35m"
+    CYAN = "\033[36m"
+    WHITE = "\033[37m"
+
+
+    # Bright foreground colors
+    BRIGHT_BLACK = "\033[90m"
+    BRIGHT_RED = "\033[91m"
+    BRIGHT_GREEN = "\033[92m"
+    BRIGHT_YELLOW = "\033[93m"
+    BRIGHT_BLUE = "\033[94m"
+    BRIGHT_MAGENTA = "\033[95m"
+    BRIGHT_CYAN = "\033[96m"
+    BRIGHT_WHITE = "\033[97m"
+
+    # Background colors
+    BG_BLACK = "\033[40m"
+    BG_RED = "\033[41m"
+    BG_GREEN = "\033[42m"
+    BG_YELLOW = "\033[43m"
+    BG_BLUE = "\033[44m"
+    BG_MAGENTA = "\033[45m"
+    BG_CYAN = "\033[46m"
+    BG_WHITE = "\033[47m"
+
+    # Bright background colors
+    BG_BRIGHT_BLACK = "\033[100m"
+    BG_BRIGHT_RED = "\033[101m"
+    BG_BRIGHT_GREEN = "\033[102m"
+    BG_BRIGHT_YELLOW = "\033[103m"
+    BG_BRIGHT_BLUE = "\033[104m"
+    BG_BRIGHT_MAGENTA = "\033[105m"
+    BG_BRIGHT_CYAN = "\033[106m"
+    BG_BRIGHT_WHITE = "\033[107m"
+
+
+# ----------------------------------------------------
+# Sinks
+# ----------------------------------------------------
+class NullSink:
+    """Discards everything; EventLog skips queueing for it."""
+
+    def write(self, records):
+        pass
+
+    def close(self):
+        pass
+
+
+class TerminalSink:
+    """The colored console trace, written to ``stream`` (stdout by default)."""
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def format(self, record):
+        kind = record["type"]
+        if kind == "query":
+            return (
+                f"\n{Colors.BG_GREEN}{Colors.BLACK}{Colors.BOLD}"
+                f"--- Running Query: {record['query']} ---{Colors.RESET}"
+            )
+        if kind == "event":
+            lines = [f"Event ID: {record['event_id']}, Author: {record['author']}"]
+            lines.extend(f"  Text: '{text}'" for text in record["texts"])
+            return "\n".join(lines)
+        if kind == "response":
+            if record["text"] is None:
+                return (
+                    f"\n{Colors.BG_RED}{Colors.WHITE}{Colors.BOLD} ==> Final Agent Response: "
+                    f"[No text content in final event]{Colors.RESET}\n"
+                )
+            banner = f"{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD} || ----------------- "
+            return (
+                f"\n{banner}AGENT RESPONSE ----------------- || {Colors.RESET}\n"
+                f"{Colors.CYAN}{Colors.BOLD}{record['text']}{Colors.RESET}\n"
+                f"{banner}END OF AGENT RESPONSE ------------- || {Colors.RESET}\n"
+            )
+        if kind == "error":
+            return (
+                f"{Colors.BG_RED}{Colors.WHITE}ERROR during agent run: "
+                f"{record['message']}{Colors.RESET}"
+            )
+        if kind == "state":
+            return record["text"]
+        if kind == "note":
+            return f"{Colors.BRIGHT_BLACK}{record['message']}{Colors.RESET}"
+        if kind == "turn_end":
+            return f"{Colors.YELLOW}{'-' * 30}{Colors.RESET}"
+        if kind == "dropped":
+            return (
+                f"{Colors.BRIGHT_BLACK}[{record['count']} event log records dropped]{Colors.RESET}"
+            )
+        return json.dumps(record, default=str)
+
+    def write(self, records):
+        stream = self.stream or sys.stdout
+        stream.write("\n".join(map(self.format, records)) + "\n")
+        stream.flush()
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    """Appends one JSON object per record to ``path``."""
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, records):
+        self._file.write("".join(json.dumps(record, default=str) + "\n" for record in records))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def make_sink(spec):
+    """A sink from its EVENT_SINK spelling: terminal, off or jsonl:<path>."""
+    if spec in (None, "", "terminal"):
+        return TerminalSink()
+    if spec == "off":
+        return NullSink()
+    if spec.startswith("jsonl:") and len(spec) > len("jsonl:"):
+        return JsonLinesSink(spec[len("jsonl:") :])
+    raise ValueError(f"Unknown event sink '{spec}', expected terminal, off or jsonl:<path>")
+
+
+# ----------------------------------------------------
+# Log
+# ----------------------------------------------------
+class _Flush:
+    """Marker queued by flush(); set once everything before it is written."""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+
+class EventLog:
+    """Bounded queue of records in front of a sink, drained by a writer thread.
+
+    ``emit`` only appends to a deque, so it is safe on the event loop and
+    from any thread. The writer wakes up at most every ``linger`` seconds
+    and writes everything queued since in one batch, so a burst of events
+    costs one sink call, not one each. The writer is started on first use
+    in each process; a forked worker starts its own.
+    """
+
+    def __init__(self, sink=None, max_pending=MAX_PENDING, linger=LINGER_SECONDS):
+        self.sink = sink or TerminalSink()
+        self.max_pending = max_pending
+        self.linger = linger
+        self.dropped = 0
+        self._unreported = 0
+        self._records = deque()
+        self._wake = threading.Event()
+        self._flushing = False
+        self._busy = False
+        self._lock = threading.Lock()
+        self._pid = None
+
+    @property
+    def enabled(self):
+        return not isinstance(self.sink, NullSink)
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Neither the records nor the writer of a parent process survive a fork
+            self._records = deque()
+            self._wake = threading.Event()
+            threading.Thread(target=self._run, name="event-log-writer", daemon=True).start()
+            self._pid = os.getpid()
+
+    def emit(self, kind, **fields):
+        """Queue a ``{"type": kind, "time": ..., **fields}`` record for the sink."""
+        if isinstance(self.sink, NullSink):
+            return
+        if self._pid != os.getpid():
+            self._start()
+        if len(self._records) >= self.max_pending:
+            self.dropped += 1
+            self._unreported += 1
+            return
+        self._records.append({"type": kind, "time": time.time(), **fields})
+        if not self._wake.is_set():
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._busy = True
+            if not self._flushing:
+                # Let a burst of records collect before writing
+                time.sleep(self.linger)
+            self._flushing = False
+            self._wake.clear()
+            records = self._records
+            while records:
+                batch = []
+                flushes = []
+                while records and len(batch) < BATCH_SIZE:
+                    record = records.popleft()
+                    if isinstance(record, _Flush):
+                        flushes.append(record)
+                        break
+                    batch.append(record)
+                if self._unreported:
+                    dropped, self._unreported = self._unreported, 0
+                    batch.append({"type": "dropped", "time": time.time(), "count": dropped})
+                if batch:
+                    try:
+                        self.sink.write(batch)
+                    except Exception as e:
+                        print(f"Error writing event log: {e}", file=sys.stderr)
+                for flush in flushes:
+                    flush.done.set()
+            self._busy = False
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """Wait up to ``timeout`` seconds for every record queued so far to be written.
+
+        Returns False if the writer did not catch up in time. Blocks the
+        calling thread, so it is not for use on a serving event loop.
+        """
+        if self._pid != os.getpid() or not (self._records or self._busy):
+            return True
+        flush = _Flush()
+        self._records.append(flush)
+        self._flushing = True
+        self._wake.set()
+        return flush.done.wait(timeout)
+
+    def configure(self, sink):
+        """Switch to ``sink`` after writing what is queued; returns the previous sink."""
+        self.flush()
+        previous, self.sink = self.sink, sink
+        return previous
+
+    def close(self, timeout=FLUSH_TIMEOUT):
+        """Write what is queued, waiting at most ``timeout`` seconds, and close the sink."""
+        self.flush(timeout)
+        self.sink.close()
+
+
+_sink_spec = os.environ.get(EVENT_SINK_ENV) or "terminal"
+event_log = EventLog(make_sink(_sink_spec))
+atexit.register(event_log.close)
+
+
+def set_event_sink(spec):
+    """Send agent events to a sink by name (terminal, off, jsonl:<path>)."""
+    global _sink_spec
+    # Streamlit calls this on every rerun; keep an open file open
+    if spec == _sink_spec:
+        return
+    previous = event_log.configure(make_sink(spec))
+    _sink_spec = spec
+    previous.close()
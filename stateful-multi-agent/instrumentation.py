@@ -0,0 +1,308 @@
+import atexit
+import json
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from event_log import EventLog
+
+# Set INSTRUMENTATION_DIR to enable tracing; turns.jsonl and metrics.prom
+# are written there (turns.<process>.jsonl and metrics.<process>.prom from
+# worker pool processes)
+INSTRUMENTATION_DIR_ENV = "INSTRUMENTATION_DIR"
+# How often the writer thread appends traces and rewrites the metrics file
+WRITE_INTERVAL_SECONDS = 0.5
+
+
+def _usage(event):
+    """Token usage of an event, if the model reported it."""
+    usage = getattr(event, "usage_metadata", None)
+    if usage is None:
+        return None
+    return {
+        "prompt_tokens": usage.prompt_token_count or 0,
+        "completion_tokens": usage.candidates_token_count or 0,
+        "total_tokens": usage.total_token_count or 0,
+    }
+
+
+class TurnTrace:
+    """Timing of one call_agent_async turn, built from its events.
+
+    Each event's time since the previous event is charged to the agent that
+    authored it, except the gap between a function call and its response,
+    which is charged to the tool.
+    """
+
+    def __init__(self, app_name, user_id, session_id, query):
+        self.app_name = app_name
+        self.user_id = user_id
+        self.session_id = session_id
+        self.query = query
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.events = []
+        self.agent_seconds = defaultdict(float)
+        self.tool_seconds = defaultdict(float)
+        self.tool_calls = defaultdict(int)
+        self.tokens = defaultdict(lambda: defaultdict(int))
+        self._open_calls = {}
+        self.first_token = None
+        self.duration = None
+        self.final_agent = None
+        self.error = None
+
+    def record(self, event):
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+
+        author = event.author or "unknown"
+        if event.partial and self.first_token is None:
+            # Time-to-first-token when streaming
+            self.first_token = now - self.started
+        function_calls = event.get_function_calls() if event.content else []
+        function_responses = event.get_function_responses() if event.content else []
+
+        if function_responses:
+            # The gap since the call was spent running the tool
+            for response in function_responses:
+                started = self._open_calls.pop(response.id or response.name, None)
+                name = response.name
+                if started is not None:
+                    self.tool_seconds[name] += now - started
+                    self.tool_calls[name] += 1
+        else:
+            self.agent_seconds[author] += elapsed
+        for call in function_calls:
+            self._open_calls[call.id or call.name] = now
+
+        usage = _usage(event)
+        if usage:
+            for kind, count in usage.items():
+                self.tokens[author][kind] += count
+
+        self.events.append(
+            {
+                "offset_ms": round((now - self.started) * 1000, 3),
+                "elapsed_ms": round(elapsed * 1000, 3),
+                "author": author,
+                "function_calls": [call.name for call in function_calls],
+                "function_responses": [response.name for response in function_responses],
+                "final": event.is_final_response(),
+                "usage": usage,
+            }
+        )
+
+    def finish(self, final_agent=None, error=None):
+        self.duration = time.perf_counter() - self.started
+        self.final_agent = final_agent
+        self.error = error
+
+    def to_dict(self):
+        return {
+            "timestamp": datetime.fromtimestamp(self.started_at).isoformat(timespec="milliseconds"),
+            "app_name": self.app_name,
+            "user_id": self.user_id,
+            "session_id": self.session_id,
+            "query": self.query,
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "first_token_ms": (
+                round(self.first_token * 1000, 3) if self.first_token is not None else None
+            ),
+            "final_agent": self.final_agent,
+            "error": self.error,
+            "agent_ms": {k: round(v * 1000, 3) for k, v in self.agent_seconds.items()},
+            "tool_ms": {k: round(v * 1000, 3) for k, v in self.tool_seconds.items()},
+            "tokens": {agent: dict(counts) for agent, counts in self.tokens.items()},
+            "events": self.events,
+        }
+
+
+def _labels(**labels):
+    present = [f'{name}="{value}"' for name, value in labels.items() if value is not None]
+    return "{" + ",".join(present) + "}" if present else ""
+
+
+class Metrics:
+    """Cumulative counters exported in Prometheus text format.
+
+    ``process`` labels every sample, so the files of several worker
+    processes can be collected side by side.
+    """
+
+    def __init__(self, process=None):
+        self.process = process
+        self.turns = 0
+        self.dropped = 0
+        self.errors = 0
+        self.turn_seconds = 0.0
+        self.agent_seconds = defaultdict(float)
+        self.tool_seconds = defaultdict(float)
+        self.tool_calls = defaultdict(int)
+        self.tokens = defaultdict(int)
+
+    def add(self, trace):
+        self.turns += 1
+        self.errors += 1 if trace.error else 0
+        self.turn_seconds += trace.duration or 0.0
+        for agent, seconds in trace.agent_seconds.items():
+            self.agent_seconds[agent] += seconds
+        for tool, seconds in trace.tool_seconds.items():
+            self.tool_seconds[tool] += seconds
+            self.tool_calls[tool] += trace.tool_calls[tool]
+        for agent, counts in trace.tokens.items():
+            for kind, count in counts.items():
+                self.tokens[(agent, kind)] += count
+
+    def to_prometheus(self):
+        process = self.process
+        lines = [
+            "# HELP agent_turns_total Turns handled by call_agent_async.",
+            "# TYPE agent_turns_total counter",
+            f"agent_turns_total{_labels(process=process)} {self.turns}",
+            "# HELP agent_turn_errors_total Turns that raised during the agent run.",
+            "# TYPE agent_turn_errors_total counter",
+            f"agent_turn_errors_total{_labels(process=process)} {self.errors}",
+            "# HELP agent_turn_seconds_total Wall time spent in turns.",
+            "# TYPE agent_turn_seconds_total counter",
+            f"agent_turn_seconds_total{_labels(process=process)} {self.turn_seconds:.6f}",
+            "# HELP agent_traces_dropped_total Turn traces dropped because the writer fell behind.",
+            "# TYPE agent_traces_dropped_total counter",
+            f"agent_traces_dropped_total{_labels(process=process)} {self.dropped}",
+            "# HELP agent_span_seconds_total Time attributed to each agent.",
+            "# TYPE agent_span_seconds_total counter",
+        ]
+        lines += [
+            f"agent_span_seconds_total{_labels(process=process, agent=agent)} {seconds:.6f}"
+            for agent, seconds in sorted(self.agent_seconds.items())
+        ]
+        lines += [
+            "# HELP agent_tool_seconds_total Time spent in each tool.",
+            "# TYPE agent_tool_seconds_total counter",
+        ]
+        lines += [
+            f"agent_tool_seconds_total{_labels(process=process, tool=tool)} {seconds:.6f}"
+            for tool, seconds in sorted(self.tool_seconds.items())
+        ]
+        lines += [
+            "# HELP agent_tool_calls_total Calls of each tool.",
+            "# TYPE agent_tool_calls_total counter",
+        ]
+        lines += [
+            f"agent_tool_calls_total{_labels(process=process, tool=tool)} {count}"
+            for tool, count in sorted(self.tool_calls.items())
+        ]
+        lines += [
+            "# HELP agent_tokens_total Model tokens reported per agent.",
+            "# TYPE agent_tokens_total counter",
+        ]
+        lines += [
+            f"agent_tokens_total{_labels(process=process, agent=agent, kind=kind)} {count}"
+            for (agent, kind), count in sorted(self.tokens.items())
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class _TraceSink:
+    """EventLog sink that exports finished traces, on the log's writer thread.
+
+    Each batch of traces is appended to the JSONL file and added to the
+    metrics, then the Prometheus file is rewritten once. File names are
+    picked on the first write, in the process that writes them: a worker
+    pool process gets its own pair, named after the process.
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.metrics = None
+        self.jsonl_path = None
+        self.prometheus_path = None
+        self._pid = None
+
+    def _open(self):
+        self._pid = os.getpid()
+        name = multiprocessing.current_process().name
+        process = None if name == "MainProcess" else name
+        suffix = f".{process}" if process else ""
+        self.metrics = Metrics(process)
+        self.jsonl_path = os.path.join(self.output_dir, f"turns{suffix}.jsonl")
+        self.prometheus_path = os.path.join(self.output_dir, f"metrics{suffix}.prom")
+
+    def write(self, records):
+        if self._pid != os.getpid():
+            # First write in this process (a forked worker starts over)
+            self._open()
+        lines = []
+        for record in records:
+            if record["type"] == "dropped":
+                self.metrics.dropped += record["count"]
+                continue
+            trace = record["trace"]
+            self.metrics.add(trace)
+            lines.append(json.dumps(trace.to_dict()) + "\n")
+        try:
+            with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+            # Write then rename so scrapers never read a partial file
+            tmp_path = self.prometheus_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.metrics.to_prometheus())
+            os.replace(tmp_path, self.prometheus_path)
+        except OSError as e:
+            print(f"Error writing instrumentation: {e}")
+
+    def close(self):
+        pass
+
+
+class Instrumentation:
+    """Per-turn tracing for call_agent_async.
+
+    Disabled unless an output directory is given; ``start_turn`` then
+    returns None and the hot path only pays for a None check per event.
+    Finished traces are handed to a writer thread, which exports them
+    every WRITE_INTERVAL_SECONDS, so no file is touched on the event loop.
+    """
+
+    def __init__(self, output_dir=None):
+        self._log = None
+        self.configure(output_dir)
+        atexit.register(self.close)
+
+    def configure(self, output_dir):
+        """Start writing to ``output_dir`` (or stop with None)."""
+        self.close()
+        self.output_dir = output_dir
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+            self._log = EventLog(_TraceSink(output_dir), linger=WRITE_INTERVAL_SECONDS)
+
+    def close(self):
+        """Export the traces still queued and stop writing."""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    @property
+    def enabled(self):
+        return bool(self.output_dir)
+
+    def start_turn(self, app_name, user_id, session_id, query):
+        if not self.output_dir:
+            return None
+        return TurnTrace(app_name, user_id, session_id, query)
+
+    def finish_turn(self, trace, final_agent=None, error=None):
+        """Close a trace and queue it for export (JSON line + Prometheus snapshot)."""
+        if trace is None or self._log is None:
+            return
+        trace.finish(final_agent, error)
+        self._log.emit("turn", trace=trace)
+
+
+instrumentation = Instrumentation(os.environ.get(INSTRUMENTATION_DIR_ENV))
+
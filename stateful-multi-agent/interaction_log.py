@@ -0,0 +1,314 @@
+import weakref
+from collections.abc import Sequence
+
+from google.adk.events import Event
+from google.adk.events.event_actions import EventActions
+from pydantic_core import SchemaSerializer, core_schema
+
+from customer_service_agent.records import HISTORY_KEY, HistoryEntry
+
+# Number of entries stored per segment
+SEGMENT_SIZE = 256
+
+
+class InteractionLog:
+    """Append-only, segmented storage for one session's interaction history.
+
+    Entries are stored in fixed-size segments so an append never copies or
+    re-allocates the existing history.
+
+    Positions are absolute and never reused. The oldest whole segments can
+    be moved out to an archive (see ``archive``); ``offset`` is then the
+    position of the first entry still held in memory, and ``len()`` is still
+    the position the next entry will get.
+    """
+
+    def __init__(self, entries=(), offset=0):
+        self._segments = [[]]
+        self.offset = offset
+        self._length = offset
+        self._listeners = []
+        # Bumped whenever entries are removed, so caches keyed on length
+        # can tell a truncated-then-regrown log from an unchanged one
+        self.generation = 0
+        for entry in entries:
+            self._append(entry)
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def live_length(self):
+        """Number of entries held in memory (not archived)."""
+        return self._length - self.offset
+
+    def __iter__(self):
+        for segment in self._segments:
+            yield from segment
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return list(self.entries(start, stop))
+        if index < 0:
+            index += self._length
+        if not self.offset <= index < self._length:
+            raise IndexError("interaction log index out of range (or archived)")
+        index -= self.offset
+        return self._segments[index // SEGMENT_SIZE][index % SEGMENT_SIZE]
+
+    def _append(self, entry):
+        segment = self._segments[-1]
+        if len(segment) >= SEGMENT_SIZE:
+            segment = []
+            self._segments.append(segment)
+        segment.append(entry)
+        self._length += 1
+
+    def append(self, entry):
+        """Append an entry and notify subscribers. O(1)."""
+        self._append(entry)
+        position = self._length - 1
+        for listener in self._listeners:
+            listener(self, position, entry)
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def truncate(self, length):
+        """Drop every entry after ``length`` (used to roll back a turn).
+
+        Subscribers are not notified; they must discard their own copies.
+        Archived entries are never truncated.
+        """
+        if length >= self._length:
+            return
+        length = max(length, self.offset)
+        live = length - self.offset
+        del self._segments[live // SEGMENT_SIZE + 1 :]
+        del self._segments[-1][live % SEGMENT_SIZE :]
+        self._length = length
+        self.generation += 1
+
+    def archive(self, stop, store=None):
+        """Drop the whole segments that end at or before ``stop`` from memory.
+
+        The segment being appended to is always kept. ``store(first_position,
+        entries)`` is called for each segment before anything is dropped; if
+        it raises, the log is left unchanged. Returns the dropped segments as
+        ``(first_position, entries)`` pairs, oldest first.
+        """
+        count = min((stop - self.offset) // SEGMENT_SIZE, len(self._segments) - 1)
+        if count <= 0:
+            return []
+        dropped = []
+        position = self.offset
+        for segment in self._segments[:count]:
+            if store is not None:
+                store(position, segment)
+            dropped.append((position, segment))
+            position += len(segment)
+        del self._segments[:count]
+        self.offset = position
+        # Live positions shifted for anything that indexes the view
+        self.generation += 1
+        return dropped
+
+    def entries(self, start=0, stop=None):
+        """Iterate over the entries in ``[start, stop)`` without copying."""
+        stop = self._length if stop is None else min(stop, self._length)
+        position = max(start, self.offset)
+        while position < stop:
+            segment_index, offset = divmod(position - self.offset, SEGMENT_SIZE)
+            segment = self._segments[segment_index]
+            end = min(len(segment), offset + (stop - position))
+            yield from segment[offset:end]
+            position += end - offset
+
+    def cursor(self, position=0):
+        """Return a cursor that reads entries from ``position`` onwards."""
+        return LogCursor(self, position)
+
+    def subscribe(self, listener):
+        """Register ``listener(log, position, entry)`` to be called on append."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def to_list(self):
+        return list(self)
+
+
+class LogCursor:
+    """A read position in an InteractionLog.
+
+    Consumers keep a cursor to pick up only the entries appended since their
+    last read.
+    """
+
+    def __init__(self, log, position=0):
+        self.log = log
+        self.position = position
+
+    @property
+    def pending(self):
+        """Number of entries appended since the last read."""
+        return max(len(self.log) - self.position, 0)
+
+    def read(self, limit=None):
+        """Return the unread entries (at most ``limit``) and advance."""
+        stop = len(self.log) if limit is None else self.position + limit
+        entries = list(self.log.entries(self.position, stop))
+        self.position += len(entries)
+        return entries
+
+    def seek(self, position):
+        self.position = max(self.log.offset, min(position, len(self.log)))
+
+
+class InteractionHistoryView(Sequence):
+    """Read-mostly list view of an InteractionLog stored in session state.
+
+    The view is what lives under ``state['interaction_history']``. It is only
+    materialized into a list when it is rendered (e.g. by instruction
+    templating) and the rendering is cached until the log grows. Copies of
+    the session share the same view, so appends are visible everywhere.
+
+    The view only contains the entries still in memory: ``view[0]`` is the
+    oldest entry that has not been archived.
+    """
+
+    def __init__(self, log):
+        self.log = log
+        self._rendered_key = None
+        self._rendered = ""
+
+    def __len__(self):
+        return self.log.live_length
+
+    def __getitem__(self, index):
+        offset = self.log.offset
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return list(self.log.entries(offset + start, offset + stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("interaction history index out of range")
+        return self.log[offset + index]
+
+    def __iter__(self):
+        return iter(self.log)
+
+    def __eq__(self, other):
+        if isinstance(other, InteractionHistoryView):
+            return self.log is other.log
+        if isinstance(other, (list, tuple)):
+            return self.to_list() == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        key = (self.log.generation, len(self.log))
+        if self._rendered_key != key:
+            self._rendered = repr(self.log.to_list())
+            self._rendered_key = key
+        return self._rendered
+
+    __str__ = __repr__
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def append(self, entry):
+        """Append to the underlying log (used by tools via tool_context.state)."""
+        self.log.append(HistoryEntry.from_dict(entry))
+
+    def extend(self, entries):
+        self.log.extend(map(HistoryEntry.from_dict, entries))
+
+    def to_list(self):
+        return self.log.to_list()
+
+
+# Let pydantic serialize views (e.g. inside Event.actions.state_delta) as lists
+InteractionHistoryView.__pydantic_serializer__ = SchemaSerializer(
+    core_schema.any_schema(
+        serialization=core_schema.plain_serializer_function_ser_schema(
+            lambda view: view.to_list()
+        )
+    )
+)
+
+
+# Logs are tracked per session store so separate stores never share history
+_logs = weakref.WeakKeyDictionary()
+
+
+def _store(session_service):
+    """The innermost service; wrappers share the logs of the store they wrap."""
+    while (inner := getattr(session_service, "inner", None)) is not None:
+        session_service = inner
+    return session_service
+
+
+def get_interaction_log(session_service, app_name, user_id, session_id):
+    """Return the interaction log for a session, attaching it on first use.
+
+    The first call for a session seeds the log from any existing list in
+    ``state['interaction_history']`` and replaces that key with an
+    InteractionHistoryView. Later calls are a dictionary lookup and never
+    touch the session service.
+    """
+    logs = _logs.setdefault(_store(session_service), {})
+    key = (app_name, user_id, session_id)
+    log = logs.get(key)
+    if log is not None:
+        return log
+
+    session = session_service.get_session(
+        app_name=app_name, user_id=user_id, session_id=session_id
+    )
+    if session is None:
+        raise ValueError(f"Session not found: {session_id}")
+
+    existing = session.state.get(HISTORY_KEY)
+    if isinstance(existing, InteractionHistoryView):
+        log = existing.log
+    else:
+        log = InteractionLog(map(HistoryEntry.from_dict, existing or []))
+        session_service.append_event(
+            session,
+            Event(
+                author="user",
+                actions=EventActions(
+                    state_delta={HISTORY_KEY: InteractionHistoryView(log)}
+                ),
+            ),
+        )
+
+    logs[key] = log
+    return log
+
+
+def forget_interaction_log(session_service, app_name, user_id, session_id):
+    """Drop the cached log for a session (e.g. after it was deleted)."""
+    _logs.get(_store(session_service), {}).pop((app_name, user_id, session_id), None)
+
+
+def history_as_list(value):
+    """Return a plain list for an interaction history value of any form."""
+    if isinstance(value, InteractionHistoryView):
+        return value.to_list()
+    return list(value or [])
@@ -1,17 +1,34 @@
 import asyncio
+import os
 
 # Import the main customer service agent
 from customer_service_agent.agent import customer_service_agent
 from dotenv import load_dotenv
+from event_log import event_log
 from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from utils import add_user_query_to_history, call_agent_async
+from session_snapshot import SnapshotSessionService
+from sqlite_session_service import SqliteSessionService
+from state_transaction import TransactionalSessionService, session_turn
+from utils import add_user_query_to_history, call_agent_async, set_display_level
 
 load_dotenv()
 
-# ===== PART 1: Initialize In-Memory Session Service =====
-# Using in-memory storage for this example (non-persistent)
-session_service = InMemorySessionService()
+# Only print what changed in the state each turn (off, summary, diff, full)
+set_display_level(os.getenv("STATE_DISPLAY_LEVEL", "diff"))
+
+# ===== PART 1: Initialize Persistent Session Service =====
+# Sessions are stored in a local SQLite file and survive restarts; each
+# turn's writes are buffered and committed once. Set SESSION_SNAPSHOT_PATH to
+# keep them in memory instead, snapshotted to that file every
+# SESSION_SNAPSHOT_INTERVAL seconds and on exit
+if os.getenv("SESSION_SNAPSHOT_PATH"):
+    session_store = SnapshotSessionService(
+        os.getenv("SESSION_SNAPSHOT_PATH"),
+        interval=float(os.getenv("SESSION_SNAPSHOT_INTERVAL", "60")),
+    )
+else:
+    session_store = SqliteSessionService(os.getenv("SESSION_DB_PATH", "sessions.db"))
+session_service = TransactionalSessionService(session_store)
 
 
 # ===== PART 2: Define Initial State =====
@@ -29,14 +46,21 @@ async def main_async():
     USER_ID = "customer_ai_agent"
 
     # ===== PART 3: Session Creation =====
-    # Create a new session with initial state
-    new_session = session_service.create_session(
-        app_name=APP_NAME,
-        user_id=USER_ID,
-        state=initial_state,
-    )
-    SESSION_ID = new_session.id
-    print(f"Created new session: {SESSION_ID}")
+    # Continue the user's most recent session, or create a new one
+    existing_sessions = session_service.list_sessions(
+        app_name=APP_NAME, user_id=USER_ID
+    ).sessions
+    if existing_sessions:
+        SESSION_ID = existing_sessions[-1].id
+        print(f"Continuing existing session: {SESSION_ID}")
+    else:
+        new_session = session_service.create_session(
+            app_name=APP_NAME,
+            user_id=USER_ID,
+            state=initial_state,
+        )
+        SESSION_ID = new_session.id
+        print(f"Created new session: {SESSION_ID}")
 
     # ===== PART 4: Agent Runner Setup =====
     # Create a runner with the main customer service agent
@@ -51,7 +75,9 @@ async def main_async():
     print("Type 'exit' or 'quit' to end the conversation.\n")
 
     while True:
-        # Get user input
+        # Get user input once the last turn's output has been written (or
+        # the writer has had FLUSH_TIMEOUT seconds to write it)
+        event_log.flush()
         user_input = input("You: ")
 
         # Check if user wants to exit
@@ -59,13 +85,15 @@ async def main_async():
             print("Ending conversation. Goodbye!")
             break
 
-        # Update interaction history with the user's query
-        add_user_query_to_history(
-            session_service, APP_NAME, USER_ID, SESSION_ID, user_input
-        )
+        # Record the query and run the agent as a single state transaction
+        async with session_turn(session_service, APP_NAME, USER_ID, SESSION_ID):
+            # Update interaction history with the user's query
+            add_user_query_to_history(
+                session_service, APP_NAME, USER_ID, SESSION_ID, user_input
+            )
 
-        # Process the user query through the agent
-        await call_agent_async(runner, USER_ID, SESSION_ID, user_input)
+            # Process the user query through the agent
+            await call_agent_async(runner, USER_ID, SESSION_ID, user_input)
 
     # ===== PART 6: State Examination =====
     # Show final session state
@@ -79,7 +107,10 @@ async def main_async():
 
 def main():
     """Entry point for the application."""
-    asyncio.run(main_async())
+    try:
+        asyncio.run(main_async())
+    finally:
+        session_service.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,372 @@
+"""In-memory sessions that survive restarts through a snapshot file.
+
+SnapshotSessionService is an InMemorySessionService that periodically (every
+``interval`` seconds) and on close writes every session to one file, and on
+startup restores from it lazily: only the index is read, and each session is
+decoded the first time it is accessed.
+
+File layout (integers little-endian):
+
+    b"ADKSNAP1"
+    session records, back to back; each is a JSON header line (id, state,
+        interaction logs) followed by one JSON line per event
+    index: JSON {"app_state", "user_state", "sessions": [[app_name,
+        user_id, session_id, offset, length, last_update_time], ...]}
+    footer: index offset (u64), index length (u64), b"ADKSNAP1"
+
+The file is memory-mapped, so restoring costs one read of the index no
+matter how many sessions it holds. When a snapshot is written, sessions that
+were never accessed, or were accessed but not changed, are copied over as raw
+bytes. Only changed sessions are encoded again. Snapshots are written to a
+temporary file and renamed into place, so a crash leaves the previous one
+intact.
+"""
+
+import atexit
+import json
+import mmap
+import os
+import struct
+import threading
+import weakref
+
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService, Session
+
+from customer_service_agent.records import HistoryEntry, json_default
+from interaction_log import InteractionHistoryView, InteractionLog
+
+MAGIC = b"ADKSNAP1"
+_FOOTER = struct.Struct("<QQ8s")
+
+
+# ----------------------------------------------------
+# Session records
+# ----------------------------------------------------
+def _log_marks(session):
+    """What must be unchanged for a session's stored record to still be current."""
+    return tuple(
+        (key, len(value.log), value.log.generation)
+        for key, value in session.state.items()
+        if isinstance(value, InteractionHistoryView)
+    )
+
+
+def _encode_session(session):
+    state = {}
+    logs = {}
+    for key, value in session.state.items():
+        if isinstance(value, InteractionHistoryView):
+            logs[key] = {"offset": value.log.offset, "entries": value.to_list()}
+        else:
+            state[key] = value
+    header = {
+        "id": session.id,
+        "app_name": session.app_name,
+        "user_id": session.user_id,
+        "last_update_time": session.last_update_time,
+        "state": state,
+        "logs": logs,
+    }
+    lines = [json.dumps(header, default=json_default, separators=(",", ":"))]
+    # State lives in the header; a delta may hold the whole history view
+    lines.extend(
+        event.model_dump_json(exclude_none=True, exclude={"actions": {"state_delta"}})
+        for event in session.events
+    )
+    return "\n".join(lines).encode("utf-8")
+
+
+def _decode_session(data):
+    lines = data.split(b"\n")
+    header = json.loads(lines[0])
+    state = header["state"]
+    for key, log in header["logs"].items():
+        entries = map(HistoryEntry.from_dict, log["entries"])
+        state[key] = InteractionHistoryView(InteractionLog(entries, offset=log["offset"]))
+    return Session(
+        id=header["id"],
+        app_name=header["app_name"],
+        user_id=header["user_id"],
+        state=state,
+        events=[Event.model_validate_json(line) for line in lines[1:]],
+        last_update_time=header["last_update_time"],
+    )
+
+
+def _close_at_exit(service_ref):
+    service = service_ref()
+    if service is not None:
+        service.close()
+
+
+# ----------------------------------------------------
+# Service
+# ----------------------------------------------------
+class SnapshotSessionService(InMemorySessionService):
+    """InMemorySessionService with snapshot-to-disk and lazy warm restart.
+
+    Usage:
+        service = SnapshotSessionService("sessions.snapshot", interval=60)
+        ...
+        service.close()   # also runs at interpreter exit
+    """
+
+    def __init__(self, path, interval=None):
+        super().__init__()
+        self.path = path
+        self.interval = interval
+        self.paged_in = 0
+        self._lock = threading.RLock()
+        self._snapshot_lock = threading.Lock()
+        self._file = None
+        self._map = None
+        # app_name -> user_id -> session_id -> (offset, length, last_update_time)
+        self._pending = {}
+        # (app_name, user_id, session_id) -> (offset, length, last_update_time, log marks)
+        # for loaded sessions whose record in the file is still current
+        self._clean = {}
+        self._deleted = False
+        self._closed = False
+        if os.path.exists(path):
+            self._restore()
+
+        self._stop = threading.Event()
+        self._thread = None
+        if interval:
+            self._thread = threading.Thread(
+                target=self._run_periodic, name="session-snapshot", daemon=True
+            )
+            self._thread.start()
+        atexit.register(_close_at_exit, weakref.ref(self))
+
+    # ----- file -----
+    def _open_map(self):
+        self._file = open(self.path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = self._file = None
+
+    def _restore(self):
+        self._open_map()
+        if len(self._map) < len(MAGIC) + _FOOTER.size or self._map[: len(MAGIC)] != MAGIC:
+            self._close_map()
+            raise ValueError(f"{self.path} is not a session snapshot")
+        index_offset, index_length, magic = _FOOTER.unpack(self._map[-_FOOTER.size :])
+        if magic != MAGIC:
+            self._close_map()
+            raise ValueError(f"{self.path} is incomplete (no snapshot footer)")
+        index = json.loads(self._map[index_offset : index_offset + index_length])
+        self.app_state = index["app_state"]
+        self.user_state = index["user_state"]
+        for app_name, user_id, session_id, offset, length, last_update_time in index["sessions"]:
+            self._pending.setdefault(app_name, {}).setdefault(user_id, {})[session_id] = (
+                offset,
+                length,
+                last_update_time,
+            )
+
+    def _page_in(self, app_name, user_id, session_id):
+        """Decode a session from the snapshot the first time it is needed."""
+        sessions = self._pending.get(app_name, {}).get(user_id)
+        entry = sessions.pop(session_id, None) if sessions else None
+        if entry is None:
+            return
+        offset, length, _ = entry
+        session = _decode_session(self._map[offset : offset + length])
+        self.sessions.setdefault(app_name, {}).setdefault(user_id, {})[session_id] = session
+        self._clean[(app_name, user_id, session_id)] = (
+            offset,
+            length,
+            session.last_update_time,
+            _log_marks(session),
+        )
+        self.paged_in += 1
+
+    def _stored_record(self, key, last_update_time, marks):
+        """The session's record in the current file, if it is still up to date."""
+        clean = self._clean.get(key)
+        if clean is None or clean[2:] != (last_update_time, marks):
+            return None
+        return clean[:2]
+
+    def _capture(self):
+        """Under the lock: encode the changed sessions and locate the rest.
+
+        Returns None if nothing changed since the last snapshot, else a list
+        of ``(key, data or (offset, length), last_update_time, marks)`` plus
+        the encoded app/user state. Marks are None for sessions not loaded.
+        """
+        records = []
+        changed = self._deleted or self._map is None
+        for app_name, users in self.sessions.items():
+            for user_id, sessions in users.items():
+                for session_id, session in sessions.items():
+                    key = (app_name, user_id, session_id)
+                    # Interaction logs are appended to without this lock; taking
+                    # the marks first means an entry appended while encoding
+                    # leaves the record dirty, so the next snapshot picks it up
+                    last_update_time = session.last_update_time
+                    marks = _log_marks(session)
+                    stored = self._stored_record(key, last_update_time, marks)
+                    if stored is None:
+                        stored = _encode_session(session)
+                        changed = True
+                    records.append((key, stored, last_update_time, marks))
+        if not changed:
+            return None
+        for app_name, users in self._pending.items():
+            for user_id, sessions in users.items():
+                for session_id, (offset, length, last_update_time) in sessions.items():
+                    key = (app_name, user_id, session_id)
+                    records.append((key, (offset, length), last_update_time, None))
+        shared_state = json.dumps(
+            {"app_state": self.app_state, "user_state": self.user_state}, default=json_default
+        )
+        self._deleted = False
+        return records, shared_state
+
+    def _write(self, records, shared_state):
+        """Write a new snapshot file from captured records; returns the new locations."""
+        tmp_path = self.path + ".tmp"
+        index = []
+        with open(tmp_path, "wb") as out:
+            out.write(MAGIC)
+            position = len(MAGIC)
+            for key, stored, last_update_time, _ in records:
+                if isinstance(stored, bytes):
+                    data = stored
+                else:
+                    offset, length = stored
+                    data = self._map[offset : offset + length]
+                out.write(data)
+                index.append([*key, position, len(data), last_update_time])
+                position += len(data)
+            index_data = (
+                shared_state[:-1] + ',"sessions":' + json.dumps(index, separators=(",", ":")) + "}"
+            ).encode("utf-8")
+            out.write(index_data)
+            out.write(_FOOTER.pack(position, len(index_data), MAGIC))
+            out.flush()
+            os.fsync(out.fileno())
+        return tmp_path, index
+
+    def _switch(self, tmp_path, records, index):
+        """Under the lock: put the new file in place and point sessions at it."""
+        # Close the old mapping first so the rename also works on Windows
+        self._close_map()
+        os.replace(tmp_path, self.path)
+        self._open_map()
+
+        old_clean = self._clean
+        self._clean = {}
+        for (key, _, _, marks), (_, _, _, offset, length, last_update_time) in zip(
+            records, index
+        ):
+            app_name, user_id, session_id = key
+            sessions = self._pending.get(app_name, {}).get(user_id, {})
+            if session_id in sessions:
+                # Still not accessed
+                sessions[session_id] = (offset, length, last_update_time)
+                continue
+            session = self.sessions.get(app_name, {}).get(user_id, {}).get(session_id)
+            if session is None:
+                # Deleted while the file was written
+                self._deleted = True
+            elif marks is not None:
+                self._clean[key] = (offset, length, last_update_time, marks)
+            elif key in old_clean:
+                # Paged in from the old file while the new one was written
+                self._clean[key] = (offset, length, *old_clean[key][2:])
+
+    def snapshot(self):
+        """Write every session to the snapshot file; returns False if nothing changed.
+
+        Only capturing changed sessions and switching files hold the service
+        lock; copying unchanged records into the new file does not.
+        """
+        with self._snapshot_lock:
+            with self._lock:
+                captured = self._capture()
+            if captured is None:
+                return False
+            records, shared_state = captured
+            tmp_path, index = self._write(records, shared_state)
+            with self._lock:
+                self._switch(tmp_path, records, index)
+            return True
+
+    def _run_periodic(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.snapshot()
+            except Exception as e:
+                print(f"Error writing session snapshot: {e}")
+
+    def close(self):
+        """Stop periodic snapshots and write a final one."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.snapshot()
+        finally:
+            self._close_map()
+
+    # ----- BaseSessionService -----
+    def create_session(self, *, app_name, user_id, state=None, session_id=None):
+        with self._lock:
+            if session_id:
+                # A new session replaces a stored one with the same id
+                sessions = self._pending.get(app_name, {}).get(user_id)
+                if sessions and sessions.pop(session_id.strip(), None) is not None:
+                    self._deleted = True
+            return super().create_session(
+                app_name=app_name, user_id=user_id, state=state, session_id=session_id
+            )
+
+    def get_session(self, *, app_name, user_id, session_id, config=None):
+        with self._lock:
+            self._page_in(app_name, user_id, session_id)
+            return super().get_session(
+                app_name=app_name, user_id=user_id, session_id=session_id, config=config
+            )
+
+    def list_sessions(self, *, app_name, user_id):
+        with self._lock:
+            response = super().list_sessions(app_name=app_name, user_id=user_id)
+            # Stored sessions are listed from the index without decoding them
+            pending = self._pending.get(app_name, {}).get(user_id, {})
+            response.sessions.extend(
+                Session(
+                    id=session_id,
+                    app_name=app_name,
+                    user_id=user_id,
+                    last_update_time=last_update_time,
+                )
+                for session_id, (_, _, last_update_time) in pending.items()
+            )
+            # Oldest first, so [-1] is the most recently updated session
+            response.sessions.sort(key=lambda session: session.last_update_time)
+            return response
+
+    def delete_session(self, *, app_name, user_id, session_id):
+        with self._lock:
+            self._page_in(app_name, user_id, session_id)
+            if self._clean.pop((app_name, user_id, session_id), None) is not None:
+                self._deleted = True
+            return super().delete_session(
+                app_name=app_name, user_id=user_id, session_id=session_id
+            )
+
+    def append_event(self, session, event):
+        with self._lock:
+            self._page_in(session.app_name, session.user_id, session.id)
+            return super().append_event(session=session, event=event)
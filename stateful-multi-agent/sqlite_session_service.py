@@ -0,0 +1,545 @@
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session, State
+from google.adk.sessions.base_session_service import (
+    GetSessionConfig,
+    ListEventsResponse,
+    ListSessionsResponse,
+)
+
+from customer_service_agent.records import HistoryEntry, json_default
+from interaction_log import (
+    InteractionHistoryView,
+    InteractionLog,
+    forget_interaction_log,
+)
+
+# Most sessions kept loaded in memory; the least recently used are dropped
+MAX_CACHED_SESSIONS = int(os.environ.get("SESSION_CACHE_SIZE", "1024"))
+
+# Value kinds stored in session_state.kind
+_KIND_JSON = "json"
+_KIND_LOG = "log"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    last_update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+);
+CREATE TABLE IF NOT EXISTS session_state (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (app_name, user_id, session_id, key)
+);
+CREATE TABLE IF NOT EXISTS interaction_entries (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, position)
+);
+CREATE TABLE IF NOT EXISTS events (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_by_session
+    ON events (app_name, user_id, session_id, seq);
+CREATE TABLE IF NOT EXISTS app_state (
+    app_name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (app_name, key)
+);
+CREATE TABLE IF NOT EXISTS user_state (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (app_name, user_id, key)
+);
+"""
+
+# Statements are kept as constants so sqlite3's statement cache reuses the
+# compiled (prepared) form on every call.
+_UPSERT_SESSION = (
+    "INSERT INTO sessions (app_name, user_id, id, last_update_time) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (app_name, user_id, id) DO UPDATE SET last_update_time = excluded.last_update_time"
+)
+_SELECT_SESSION = (
+    "SELECT last_update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?"
+)
+_LIST_SESSIONS = (
+    "SELECT id, last_update_time FROM sessions WHERE app_name = ? AND user_id = ? "
+    "ORDER BY last_update_time"
+)
+_UPSERT_STATE = (
+    "INSERT INTO session_state (app_name, user_id, session_id, key, kind, value) "
+    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (app_name, user_id, session_id, key) "
+    "DO UPDATE SET kind = excluded.kind, value = excluded.value"
+)
+_SELECT_STATE = (
+    "SELECT key, kind, value FROM session_state "
+    "WHERE app_name = ? AND user_id = ? AND session_id = ?"
+)
+_INSERT_ENTRY = (
+    "INSERT OR REPLACE INTO interaction_entries (app_name, user_id, session_id, position, entry) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+_SELECT_ENTRIES = (
+    "SELECT entry FROM interaction_entries WHERE app_name = ? AND user_id = ? "
+    "AND session_id = ? ORDER BY position"
+)
+_NEXT_ENTRY_POSITION = (
+    "SELECT MAX(position) + 1 FROM interaction_entries WHERE app_name = ? AND user_id = ? "
+    "AND session_id = ?"
+)
+_DELETE_ARCHIVED_ENTRIES = (
+    "DELETE FROM interaction_entries WHERE app_name = ? AND user_id = ? "
+    "AND session_id = ? AND position < ?"
+)
+_INSERT_EVENT = (
+    "INSERT INTO events (app_name, user_id, session_id, data) VALUES (?, ?, ?, ?)"
+)
+_SELECT_EVENTS = (
+    "SELECT data FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? "
+    "ORDER BY seq"
+)
+_UPSERT_APP_STATE = (
+    "INSERT INTO app_state (app_name, key, value) VALUES (?, ?, ?) "
+    "ON CONFLICT (app_name, key) DO UPDATE SET value = excluded.value"
+)
+_SELECT_APP_STATE = "SELECT key, value FROM app_state WHERE app_name = ?"
+_UPSERT_USER_STATE = (
+    "INSERT INTO user_state (app_name, user_id, key, value) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (app_name, user_id, key) DO UPDATE SET value = excluded.value"
+)
+_SELECT_USER_STATE = "SELECT key, value FROM user_state WHERE app_name = ? AND user_id = ?"
+_SESSION_TABLES = ("session_state", "interaction_entries", "events")
+
+
+def _json_default(value):
+    if isinstance(value, InteractionHistoryView):
+        return value.to_list()
+    return json_default(value)
+
+
+def _dumps(value):
+    return json.dumps(value, default=_json_default)
+
+
+class SqliteSessionService(BaseSessionService):
+    """A session service backed by a local SQLite file.
+
+    - The database runs in WAL mode so readers never block the writer. Several
+      processes may share one file (see worker_pool.py): a batch takes the
+      write lock when it begins and waits up to ``busy_timeout`` seconds for
+      another process's batch to finish.
+    - State is stored one row per key, so a tool changing ``purchased_courses``
+      only rewrites that row; ``interaction_history`` is stored one row per
+      entry and only new entries are ever written. Rows of archived entries
+      (see customer_service_agent/history_archive.py) are deleted.
+    - Writes made inside ``batch()`` are group-committed as one transaction.
+    - ``session_batch()`` holds back one session's history writes across
+      awaits and commits them when the block exits, without pulling other
+      sessions' writes into the same transaction.
+    - Sessions are loaded from disk on first access and cached afterwards,
+      up to ``max_cached_sessions``; the least recently used are dropped
+      (and reloaded if needed again), except while their writes are held.
+    """
+
+    def __init__(
+        self, db_path="sessions.db", busy_timeout=30.0, max_cached_sessions=MAX_CACHED_SESSIONS
+    ):
+        self.db_path = db_path
+        self.max_cached_sessions = max_cached_sessions
+        self._conn = sqlite3.connect(
+            db_path,
+            timeout=busy_timeout,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=256,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        # Sessions written inside the open batch, dropped from the cache if it rolls back
+        self._batch_keys: set[tuple] = set()
+        # Loaded sessions, keyed by (app_name, user_id, session_id), oldest use first
+        self._sessions: OrderedDict[tuple, Session] = OrderedDict()
+        # Interaction logs whose appends are being persisted
+        self._tracked_logs: dict[tuple, InteractionLog] = {}
+        self._log_listeners: dict[tuple, Any] = {}
+        # Sessions whose history writes are held by session_batch(), with depth
+        self._held: dict[tuple, int] = {}
+
+    # ----------------------------------------------------
+    # Transactions
+    # ----------------------------------------------------
+    @contextmanager
+    def batch(self):
+        """Group every write made inside the block into a single commit.
+
+        Batches nest; only the outermost one commits (or rolls back).
+        """
+        with self._lock:
+            if self._batch_depth == 0:
+                # IMMEDIATE: a batch reads before it writes, and upgrading a
+                # read transaction fails outright if another process wrote
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._batch_depth += 1
+        try:
+            yield self
+        except BaseException:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._conn.execute("ROLLBACK")
+                    # Those sessions' cached copies may hold rolled-back changes;
+                    # other sessions (and their held history) are untouched
+                    for key in self._batch_keys:
+                        self._evict(key)
+                    self._batch_keys.clear()
+            raise
+        else:
+            with self._lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._conn.execute("COMMIT")
+                    self._batch_keys.clear()
+
+    @contextmanager
+    def session_batch(self, app_name, user_id, session_id):
+        """Hold one session's interaction history writes until the block exits.
+
+        Unlike ``batch()``, the block may span awaits: the SQLite transaction
+        is only opened on exit, so concurrent turns on other sessions never
+        share it and an error only discards this session's held entries.
+        Blocks nest per session; only the outermost one writes.
+        """
+        key = (app_name, user_id, session_id)
+        with self._lock:
+            self._held[key] = self._held.get(key, 0) + 1
+        try:
+            yield self
+        except BaseException:
+            with self._lock:
+                self._release(key)
+            raise
+        else:
+            with self._lock:
+                if self._release(key):
+                    with self.batch():
+                        self._flush_log(key)
+
+    def _release(self, key):
+        """Drop one hold on a session; True if it was the last one."""
+        depth = self._held.get(key, 0) - 1
+        if depth > 0:
+            self._held[key] = depth
+            return False
+        self._held.pop(key, None)
+        return True
+
+    # ----------------------------------------------------
+    # Loading
+    # ----------------------------------------------------
+    def _load_session(self, app_name, user_id, session_id):
+        key = (app_name, user_id, session_id)
+        session = self._sessions.get(key)
+        if session is not None:
+            self._sessions.move_to_end(key)
+            return session
+
+        row = self._conn.execute(_SELECT_SESSION, key).fetchone()
+        if row is None:
+            return None
+
+        state = {}
+        for state_key, kind, value in self._conn.execute(_SELECT_STATE, key):
+            if kind == _KIND_LOG:
+                offset = json.loads(value)["offset"] if value else 0
+                entries = [
+                    HistoryEntry.from_dict(json.loads(entry))
+                    for (entry,) in self._conn.execute(_SELECT_ENTRIES, key)
+                ]
+                view = InteractionHistoryView(InteractionLog(entries, offset=offset))
+                self._track_log(key, view.log, persisted=offset + len(entries))
+                state[state_key] = view
+            else:
+                state[state_key] = json.loads(value)
+
+        events = [
+            Event.model_validate_json(data)
+            for (data,) in self._conn.execute(_SELECT_EVENTS, key)
+        ]
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=state,
+            events=events,
+            last_update_time=row[0],
+        )
+        self._cache_session(key, session)
+        return session
+
+    def _cache_session(self, key, session):
+        self._sessions[key] = session
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > self.max_cached_sessions:
+            # Least recently used first, skipping sessions with held writes
+            stale = next(
+                (old for old in self._sessions if old != key and old not in self._held), None
+            )
+            if stale is None:
+                break
+            self._evict(stale)
+
+    def _copy_session(self, session):
+        copied = session.model_copy()
+        copied.state = copy.deepcopy(session.state)
+        copied.events = list(session.events)
+        return self._merge_state(copied)
+
+    def _merge_state(self, session):
+        for key, value in self._conn.execute(_SELECT_APP_STATE, (session.app_name,)):
+            session.state[State.APP_PREFIX + key] = json.loads(value)
+        for key, value in self._conn.execute(
+            _SELECT_USER_STATE, (session.app_name, session.user_id)
+        ):
+            session.state[State.USER_PREFIX + key] = json.loads(value)
+        return session
+
+    # ----------------------------------------------------
+    # Writing
+    # ----------------------------------------------------
+    def _written(self, key):
+        """Record that the open batch (if any) writes this session's rows."""
+        if self._batch_depth:
+            self._batch_keys.add(key)
+
+    def _next_position(self, key, log):
+        """Position of the first entry of ``log`` that is not on disk yet."""
+        persisted = self._conn.execute(_NEXT_ENTRY_POSITION, key).fetchone()[0]
+        return max(persisted or 0, log.offset)
+
+    def _track_log(self, key, log, persisted=None):
+        """Persist an interaction log's entries as they are appended."""
+        if self._tracked_logs.get(key) is log:
+            return
+        previous = self._tracked_logs.get(key)
+        if previous is not None:
+            previous.unsubscribe(self._listener_for(key))
+        if persisted is None:
+            persisted = self._next_position(key, log)
+        for position, entry in enumerate(log.entries(persisted), start=persisted):
+            self._conn.execute(_INSERT_ENTRY, (*key, position, _dumps(entry)))
+        log.subscribe(self._listener_for(key))
+        self._tracked_logs[key] = log
+
+    def _flush_log(self, key):
+        """Write the entries of a tracked log that are not on disk yet."""
+        log = self._tracked_logs.get(key)
+        if log is None:
+            return
+        self._written(key)
+        persisted = self._next_position(key, log)
+        for position, entry in enumerate(log.entries(persisted), start=persisted):
+            self._conn.execute(_INSERT_ENTRY, (*key, position, _dumps(entry)))
+
+    def _listener_for(self, key):
+        listener = self._log_listeners.get(key)
+        if listener is None:
+
+            def listener(log, position, entry):
+                with self._lock:
+                    if key in self._held:
+                        # Written by session_batch() when it exits
+                        return
+                    self._written(key)
+                    self._conn.execute(_INSERT_ENTRY, (*key, position, _dumps(entry)))
+
+            self._log_listeners[key] = listener
+        return listener
+
+    def _evict(self, key):
+        log = self._tracked_logs.pop(key, None)
+        listener = self._log_listeners.pop(key, None)
+        if log is not None and listener is not None:
+            log.unsubscribe(listener)
+        self._sessions.pop(key, None)
+        forget_interaction_log(self, *key)
+
+    def _write_state_value(self, key, state_key, value):
+        app_name, user_id, _ = key
+        if state_key.startswith(State.TEMP_PREFIX):
+            return
+        if state_key.startswith(State.APP_PREFIX):
+            self._conn.execute(
+                _UPSERT_APP_STATE,
+                (app_name, state_key.removeprefix(State.APP_PREFIX), _dumps(value)),
+            )
+        elif state_key.startswith(State.USER_PREFIX):
+            self._conn.execute(
+                _UPSERT_USER_STATE,
+                (app_name, user_id, state_key.removeprefix(State.USER_PREFIX), _dumps(value)),
+            )
+        elif isinstance(value, InteractionHistoryView):
+            offset = value.log.offset
+            self._conn.execute(
+                _UPSERT_STATE, (*key, state_key, _KIND_LOG, _dumps({"offset": offset}))
+            )
+            if offset:
+                # Archived entries no longer live in the database
+                self._conn.execute(_DELETE_ARCHIVED_ENTRIES, (*key, offset))
+            self._track_log(key, value.log)
+        else:
+            self._conn.execute(_UPSERT_STATE, (*key, state_key, _KIND_JSON, _dumps(value)))
+
+    def _delete_session_rows(self, key):
+        self._written(key)
+        for table in _SESSION_TABLES:
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                key,
+            )
+        self._conn.execute(
+            "DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key
+        )
+        self._evict(key)
+
+    # ----------------------------------------------------
+    # BaseSessionService API
+    # ----------------------------------------------------
+    def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        session_id = (
+            session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        )
+        key = (app_name, user_id, session_id)
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=dict(state or {}),
+            last_update_time=time.time(),
+        )
+        with self._lock, self.batch():
+            # Re-creating an existing id replaces it, like InMemorySessionService
+            # (this also marks the session as written by the batch)
+            self._delete_session_rows(key)
+            self._conn.execute(_UPSERT_SESSION, (*key, session.last_update_time))
+            for state_key, value in session.state.items():
+                self._write_state_value(key, state_key, value)
+            self._cache_session(key, session)
+            return self._copy_session(session)
+
+    def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        with self._lock:
+            session = self._load_session(app_name, user_id, session_id)
+            if session is None:
+                return None
+            copied = self._copy_session(session)
+
+        if config:
+            if config.num_recent_events:
+                copied.events = copied.events[-config.num_recent_events :]
+            if config.after_timestamp:
+                copied.events = [
+                    e for e in copied.events if e.timestamp >= config.after_timestamp
+                ]
+        return copied
+
+    def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        with self._lock:
+            rows = self._conn.execute(_LIST_SESSIONS, (app_name, user_id)).fetchall()
+        return ListSessionsResponse(
+            sessions=[
+                Session(
+                    app_name=app_name,
+                    user_id=user_id,
+                    id=session_id,
+                    last_update_time=last_update_time,
+                )
+                for session_id, last_update_time in rows
+            ]
+        )
+
+    def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        with self._lock, self.batch():
+            self._delete_session_rows((app_name, user_id, session_id))
+
+    def list_events(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> ListEventsResponse:
+        with self._lock:
+            session = self._load_session(app_name, user_id, session_id)
+        return ListEventsResponse(events=list(session.events) if session else [])
+
+    def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+
+        # Update the caller's session object
+        super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+
+        key = (session.app_name, session.user_id, session.id)
+        with self._lock, self.batch():
+            stored = self._load_session(*key)
+            if stored is None:
+                return event
+            self._written(key)
+            super().append_event(session=stored, event=event)
+            stored.last_update_time = event.timestamp
+
+            self._conn.execute(_UPSERT_SESSION, (*key, event.timestamp))
+            # State is persisted per key below, so it isn't duplicated here
+            self._conn.execute(
+                _INSERT_EVENT,
+                (*key, event.model_dump_json(exclude={"actions": {"state_delta"}})),
+            )
+            if event.actions and event.actions.state_delta:
+                for state_key, value in event.actions.state_delta.items():
+                    self._write_state_value(key, state_key, value)
+        return event
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
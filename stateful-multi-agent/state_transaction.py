@@ -0,0 +1,339 @@
+import asyncio
+import weakref
+from contextlib import ExitStack, asynccontextmanager, nullcontext
+from typing import Any, Optional
+
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import (
+    GetSessionConfig,
+    ListEventsResponse,
+    ListSessionsResponse,
+)
+
+from customer_service_agent.history_archive import history_archive
+from interaction_log import forget_interaction_log, get_interaction_log
+
+
+class _Rollback(Exception):
+    """Raised into the backend batch to make it roll back."""
+
+
+class TurnTransaction:
+    """Buffers the state writes of one conversation turn.
+
+    While a transaction is open, events appended for its session (user query
+    bookkeeping, tool state deltas, the agent response) are applied to the
+    caller's in-memory session but held back from the underlying store. On
+    commit they are written in a single batch; on rollback they are dropped
+    and any interaction history entries added during the turn are removed.
+
+    Transactions nest: opening one for a session that already has an open
+    transaction joins it, and only the outermost exit commits. Work that
+    cannot be rolled back (e.g. writing files) is registered with
+    ``after_commit`` and runs only once the commit succeeded.
+    """
+
+    def __init__(self, service, app_name, user_id, session_id):
+        self.service = service
+        self.key = (app_name, user_id, session_id)
+        self.events: list[Event] = []
+        self.depth = 0
+        self.rollback_only = False
+        self._history_mark = None
+        self._stack = ExitStack()
+        self._after_commit = []
+
+    @property
+    def pending_state_delta(self):
+        """The merged state delta of every buffered event."""
+        delta = {}
+        for event in self.events:
+            if event.actions and event.actions.state_delta:
+                delta.update(event.actions.state_delta)
+        return delta
+
+    def rollback(self):
+        """Discard the turn's writes when the outermost transaction exits."""
+        self.rollback_only = True
+
+    def after_commit(self, callback):
+        """Call ``callback()`` after the turn commits; it is dropped on rollback."""
+        self._after_commit.append(callback)
+
+    def __enter__(self):
+        if self.depth == 0:
+            # Remember where the history stood so a rollback can cut it back
+            log = get_interaction_log(self.service, *self.key)
+            self._history_mark = (log, len(log))
+            # Hold the backend's history writes for this session so they
+            # land in the same commit as the buffered events
+            session_batch = getattr(self.service.inner, "session_batch", None)
+            if session_batch:
+                self._stack.enter_context(session_batch(*self.key))
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.depth -= 1
+        if exc_type is not None:
+            self.rollback_only = True
+        if self.depth == 0:
+            self.service._transactions.pop(self.key, None)
+            if self.rollback_only:
+                self._rollback()
+            else:
+                self._commit()
+        return False
+
+    def _commit(self):
+        inner = self.service.inner
+        batch = getattr(inner, "batch", None)
+        try:
+            # Nothing here awaits, so the backend transaction only ever
+            # contains this turn's writes
+            with batch() if batch else nullcontext():
+                if self.events:
+                    session = inner.get_session(
+                        app_name=self.key[0], user_id=self.key[1], session_id=self.key[2]
+                    )
+                    if session is not None:
+                        for event in self.events:
+                            inner.append_event(session, event)
+                self._stack.close()
+        except BaseException as e:
+            self._stack.__exit__(type(e), e, e.__traceback__)
+            raise
+        callbacks, self._after_commit = self._after_commit, []
+        for callback in callbacks:
+            callback()
+
+    def _rollback(self):
+        log, length = self._history_mark
+        log.truncate(length)
+        self.events.clear()
+        self._after_commit.clear()
+        # Drop the backend's held writes as well
+        self._stack.__exit__(_Rollback, _Rollback(), None)
+        # The backend may have dropped its cached copy of the log
+        forget_interaction_log(self.service, *self.key)
+
+
+class TransactionalSessionService(BaseSessionService):
+    """Session service wrapper that adds turn-scoped transactions.
+
+    Reads and session management go straight to ``inner``. Use
+    ``transaction(app_name, user_id, session_id)`` around a turn to collapse
+    all of its writes into one commit to the underlying store.
+    """
+
+    def __init__(self, inner: BaseSessionService):
+        self.inner = inner
+        self._transactions: dict[tuple, TurnTransaction] = {}
+
+    def transaction(self, app_name, user_id, session_id):
+        key = (app_name, user_id, session_id)
+        transaction = self._transactions.get(key)
+        if transaction is None:
+            transaction = self._transactions[key] = TurnTransaction(
+                self, app_name, user_id, session_id
+            )
+        return transaction
+
+    def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        if session_id:
+            # Re-creating an id replaces the session; its archive goes too
+            history_archive.delete(app_name, user_id, session_id)
+        return self.inner.create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+
+    def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        session = self.inner.get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+        transaction = self._transactions.get((app_name, user_id, session_id))
+        if session is not None and transaction is not None:
+            # Reads inside a turn see the turn's own uncommitted writes
+            session.state.update(transaction.pending_state_delta)
+            session.events.extend(transaction.events)
+        return session
+
+    def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        return self.inner.list_sessions(app_name=app_name, user_id=user_id)
+
+    def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        self._transactions.pop((app_name, user_id, session_id), None)
+        self.inner.delete_session(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+        history_archive.delete(app_name, user_id, session_id)
+
+    def list_events(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> ListEventsResponse:
+        return self.inner.list_events(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+
+    def append_event(self, session: Session, event: Event) -> Event:
+        transaction = self._transactions.get(
+            (session.app_name, session.user_id, session.id)
+        )
+        if transaction is None or transaction.depth == 0:
+            return self.inner.append_event(session, event)
+        if event.partial:
+            return event
+        # Apply to the caller's copy now; the store sees it on commit
+        super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        transaction.events.append(event)
+        return event
+
+    def __getattr__(self, name):
+        # Expose backend extras (e.g. SqliteSessionService.batch/close)
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+
+class StoreTurn:
+    """The TurnTransaction interface for session services without transactions.
+
+    Writes reach the store as they are made, so ``rollback`` cannot undo
+    them; it only releases the backend's held history writes (if it holds
+    any) as failed and drops the ``after_commit`` callbacks.
+    """
+
+    def __init__(self, session_service, app_name, user_id, session_id):
+        session_batch = getattr(session_service, "session_batch", None)
+        self._batch = (
+            session_batch(app_name, user_id, session_id) if session_batch else nullcontext()
+        )
+        self.rollback_only = False
+        self._after_commit = []
+
+    def rollback(self):
+        """Mark the turn as failed when it exits."""
+        self.rollback_only = True
+
+    def after_commit(self, callback):
+        """Call ``callback()`` after the turn exits cleanly; it is dropped on rollback."""
+        self._after_commit.append(callback)
+
+    def __enter__(self):
+        self._batch.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and self.rollback_only:
+            exc_type, exc, tb = _Rollback, _Rollback(), None
+        self._batch.__exit__(exc_type, exc, tb)
+        callbacks, self._after_commit = self._after_commit, []
+        if exc_type is None:
+            for callback in callbacks:
+                callback()
+        return False
+
+
+def turn_transaction(session_service, app_name, user_id, session_id):
+    """Return the transaction that scopes a turn's writes for any session service.
+
+    A TurnTransaction when the service supports it, a StoreTurn otherwise;
+    both offer ``rollback()`` and ``after_commit()``.
+    """
+    if isinstance(session_service, TransactionalSessionService):
+        return session_service.transaction(app_name, user_id, session_id)
+    return StoreTurn(session_service, app_name, user_id, session_id)
+
+
+class _SessionLock:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.owner = None
+        # Tasks holding or waiting for the lock
+        self.users = 0
+
+
+class SessionLocks:
+    """One asyncio lock per session, so turns on a session run one at a time.
+
+    Turns on the same session are served in arrival order; turns on other
+    sessions never wait. A lock is re-entrant within its task (a turn opened
+    by the caller and again by call_agent_async is one turn) and is dropped
+    once no task holds or waits for it.
+    """
+
+    def __init__(self):
+        self._locks: dict[tuple, _SessionLock] = {}
+        self.acquired = 0
+        # Acquisitions that had to wait for another turn on the same session
+        self.contended = 0
+
+    def __len__(self):
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, app_name, user_id, session_id):
+        key = (app_name, user_id, session_id)
+        task = asyncio.current_task()
+        session_lock = self._locks.get(key)
+        if session_lock is not None and session_lock.owner is task:
+            yield
+            return
+
+        if session_lock is None:
+            session_lock = self._locks[key] = _SessionLock()
+        if session_lock.lock.locked():
+            self.contended += 1
+        session_lock.users += 1
+        try:
+            async with session_lock.lock:
+                self.acquired += 1
+                session_lock.owner = task
+                try:
+                    yield
+                finally:
+                    session_lock.owner = None
+        finally:
+            session_lock.users -= 1
+            if session_lock.users == 0:
+                del self._locks[key]
+
+
+# Locks are tracked per session service, like the interaction logs
+_session_locks = weakref.WeakKeyDictionary()
+
+
+def session_locks(session_service):
+    """Return the SessionLocks shared by every turn on ``session_service``."""
+    locks = _session_locks.get(session_service)
+    if locks is None:
+        locks = _session_locks[session_service] = SessionLocks()
+    return locks
+
+
+@asynccontextmanager
+async def session_turn(session_service, app_name, user_id, session_id):
+    """Run a turn exclusively on its session, as one state transaction.
+
+    Waits for any earlier turn on the same session to finish, then opens
+    turn_transaction. Nested use within the same task joins the outer turn.
+    """
+    async with session_locks(session_service).hold(app_name, user_id, session_id):
+        with turn_transaction(session_service, app_name, user_id, session_id) as transaction:
+            yield transaction
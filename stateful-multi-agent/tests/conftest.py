@@ -0,0 +1,51 @@
+import os
+import sys
+
+# Keep the agent trace and state display out of the test output
+os.environ.setdefault("EVENT_SINK", "off")
+os.environ.setdefault("STATE_DISPLAY_LEVEL", "off")
+
+# The app's modules live at the top of this directory, next to tests/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+APP_NAME = "Customer Support"
+
+
+def initial_state(**state):
+    return {"user_name": "Jane", "purchased_courses": [], "interaction_history": [], **state}
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+@pytest.fixture(autouse=True)
+def archive_root(tmp_path, monkeypatch):
+    """Keep archived history segments inside the test's directory."""
+    from customer_service_agent.history_archive import history_archive
+
+    root = tmp_path / "history_archive"
+    monkeypatch.setattr(history_archive, "root", str(root))
+    return root
+
+
+def all_agents(agent):
+    yield agent
+    for sub_agent in agent.sub_agents:
+        yield from all_agents(sub_agent)
+
+
+@pytest.fixture
+def stub_models():
+    """Swap every model in the agent tree for the benchmark stub, then put them back."""
+    from benchmarks.stub_model import install_stub_models
+    from customer_service_agent.agent import customer_service_agent
+
+    models = {agent.name: agent.model for agent in all_agents(customer_service_agent)}
+    install_stub_models(customer_service_agent)
+    yield
+    for agent in all_agents(customer_service_agent):
+        agent.model = models[agent.name]
@@ -0,0 +1,17 @@
+from customer_service_agent.catalog import catalog
+from customer_service_agent.sub_agents.policy_agent.agent import POLICY_INSTRUCTION
+
+# The policy agent's course list before it was rendered from courses.json
+BASELINE_POLICY_INFO = """
+- Fullstack AI Marketing Platform: Includes 6 weeks of group support with weekly coaching calls.
+- AI Automation Engineer Bootcamp: Includes automation templates, project-based training, community support.
+- AI Chatbot Mastery: Includes deployment training + prebuilt bot templates.
+- AI SaaS Builder Accelerator: Includes product planning, payments, auth, billing, and deployment guidance.
+- Prompt Engineering Deep Dive: Includes 100+ prompt patterns and real-world examples.
+- Data Science & LLM Foundations: A beginner-friendly structured curriculum.
+"""
+
+
+def test_policy_fragment_matches_the_original_instruction_text():
+    assert catalog.policy_fragment == BASELINE_POLICY_INFO
+    assert f"<course_info>\n    {BASELINE_POLICY_INFO}\n    </course_info>" in POLICY_INSTRUCTION
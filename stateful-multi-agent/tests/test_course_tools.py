@@ -0,0 +1,78 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from customer_service_agent.catalog import catalog
+from customer_service_agent.owned_courses import owned_index
+from customer_service_agent.records import format_epoch
+from customer_service_agent.sub_agents.order_agent.agent import refund_course
+from customer_service_agent.sub_agents.sales_agent.agent import purchase_course
+
+COURSE_ID = "ai_marketing_platform"
+
+
+def tool_context(**state):
+    return SimpleNamespace(state={"purchased_courses": [], "interaction_history": [], **state})
+
+
+def test_purchase_by_exact_id():
+    context = tool_context()
+    result = purchase_course(context, COURSE_ID)
+
+    assert result["status"] == "success"
+    assert list(owned_index(context.state)) == [COURSE_ID]
+
+
+def test_purchase_by_display_name_ignores_case():
+    context = tool_context()
+    name = catalog.courses[COURSE_ID]["name"]
+    result = purchase_course(context, name.upper())
+
+    assert result["status"] == "success"
+    assert result["course_id"] == COURSE_ID
+
+
+@pytest.mark.parametrize("near_miss", ["ai_automation_platform", "ai_master", "ai_platform"])
+def test_purchase_never_acts_on_a_near_miss(near_miss):
+    context = tool_context()
+    result = purchase_course(context, near_miss)
+
+    assert result["status"] == "error"
+    assert all(set(s) == {"id", "name"} for s in result["suggestions"])
+    assert context.state["purchased_courses"] == []
+    assert context.state["interaction_history"] == []
+
+
+def test_purchase_suggests_the_closest_courses():
+    result = purchase_course(tool_context(), "ai_platform")
+
+    assert COURSE_ID in [suggestion["id"] for suggestion in result["suggestions"]]
+
+
+def test_refund_by_exact_id():
+    context = tool_context()
+    purchase_course(context, COURSE_ID)
+    result = refund_course(context, COURSE_ID)
+
+    assert result["status"] == "success"
+    assert owned_index(context.state) == {}
+
+
+def test_refund_never_acts_on_a_near_miss():
+    context = tool_context()
+    purchase_course(context, COURSE_ID)
+    result = refund_course(context, "ai_automation_platform")
+
+    assert result["status"] == "error"
+    assert list(owned_index(context.state)) == [COURSE_ID]
+
+
+def test_refund_outside_the_window_is_refused():
+    forty_days_ago = format_epoch(int(time.time()) - 40 * 24 * 3600)
+    context = tool_context(
+        purchased_courses=[{"id": COURSE_ID, "purchase_date": forty_days_ago}]
+    )
+
+    assert refund_course(context, COURSE_ID)["status"] == "error"
+    assert list(owned_index(context.state)) == [COURSE_ID]
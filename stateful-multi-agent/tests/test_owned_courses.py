@@ -0,0 +1,39 @@
+from customer_service_agent.owned_courses import (
+    add_owned_course,
+    owned_course_ids,
+    owned_index,
+    remove_owned_course,
+)
+
+
+def test_the_index_follows_purchases_and_refunds():
+    state = {"purchased_courses": []}
+    add_owned_course(state, "ai_chatbot_mastery", 1_700_000_000)
+    add_owned_course(state, "ai_saas_builder", 1_700_000_100)
+    remove_owned_course(state, "ai_chatbot_mastery")
+
+    assert list(owned_index(state)) == ["ai_saas_builder"]
+    assert owned_index(state)["ai_saas_builder"].purchased_at == 1_700_000_100
+
+
+def test_a_same_length_edit_to_the_list_rebuilds_the_index():
+    state = {"purchased_courses": []}
+    add_owned_course(state, "ai_chatbot_mastery", 1_700_000_000)
+
+    # Edited directly (e.g. by an operator), keeping the length
+    state["purchased_courses"] = [
+        {"id": "ai_saas_builder", "purchase_date": "2025-01-01 00:00:00"}
+    ]
+
+    assert owned_course_ids(state) == ["ai_saas_builder"]
+    assert list(owned_index(state)) == ["ai_saas_builder"]
+    assert "ai_chatbot_mastery" not in owned_index(state)
+
+
+def test_an_index_loaded_from_json_is_rebuilt_as_records():
+    state = {
+        "purchased_courses": [{"id": "ai_chatbot_mastery", "purchase_date": None}],
+        "owned_courses": {"ai_chatbot_mastery": {"id": "ai_chatbot_mastery"}},
+    }
+
+    assert owned_index(state)["ai_chatbot_mastery"].id == "ai_chatbot_mastery"
@@ -0,0 +1,151 @@
+import pytest
+from conftest import APP_NAME, initial_state
+from google.adk.events import Event
+from google.adk.events.event_actions import EventActions
+
+from customer_service_agent.owned_courses import add_owned_course, owned_index
+from interaction_log import history_as_list
+from session_snapshot import SnapshotSessionService
+from sqlite_session_service import SqliteSessionService
+from utils import add_agent_response_to_history, add_user_query_to_history
+
+
+def fill_session(service, session_id="s1", user_id="u"):
+    """A session with a purchase, two history entries and a plain state key."""
+    session = service.create_session(
+        app_name=APP_NAME, user_id=user_id, session_id=session_id, state=initial_state()
+    )
+    add_user_query_to_history(service, APP_NAME, user_id, session_id, "buy the chatbot course")
+    add_agent_response_to_history(
+        service, APP_NAME, user_id, session_id, "sales_agent", "Done, enjoy!"
+    )
+    session = service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    state = dict(session.state)
+    add_owned_course(state, "ai_chatbot_mastery", 1_700_000_000)
+    service.append_event(
+        session,
+        Event(
+            author="user",
+            actions=EventActions(
+                state_delta={
+                    "purchased_courses": state["purchased_courses"],
+                    "owned_courses": state["owned_courses"],
+                    "user_name": "Ann",
+                }
+            ),
+        ),
+    )
+
+
+def summary(service, session_id="s1", user_id="u"):
+    session = service.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+    history = history_as_list(session.state["interaction_history"])
+    return {
+        "user_name": session.state["user_name"],
+        "owned": sorted(owned_index(dict(session.state))),
+        "history": [
+            (entry["action"], entry.get("query") or entry.get("response")) for entry in history
+        ],
+    }
+
+
+EXPECTED = {
+    "user_name": "Ann",
+    "owned": ["ai_chatbot_mastery"],
+    "history": [
+        ("user_query", "buy the chatbot course"),
+        ("agent_response", "Done, enjoy!"),
+    ],
+}
+
+
+def test_sqlite_round_trip(db_path):
+    service = SqliteSessionService(db_path)
+    fill_session(service)
+    service.close()
+
+    assert summary(SqliteSessionService(db_path)) == EXPECTED
+
+
+def test_sqlite_reloads_sessions_dropped_from_its_cache(db_path):
+    service = SqliteSessionService(db_path, max_cached_sessions=1)
+    fill_session(service, "s1")
+    fill_session(service, "s2")
+    assert len(service._sessions) == 1
+
+    add_user_query_to_history(service, APP_NAME, "u", "s1", "and a refund?")
+    assert summary(SqliteSessionService(db_path), "s1")["history"][-1] == (
+        "user_query",
+        "and a refund?",
+    )
+
+
+def test_sqlite_delete_session(db_path):
+    service = SqliteSessionService(db_path)
+    fill_session(service)
+    service.delete_session(app_name=APP_NAME, user_id="u", session_id="s1")
+
+    assert SqliteSessionService(db_path).get_session(
+        app_name=APP_NAME, user_id="u", session_id="s1"
+    ) is None
+
+
+def test_a_failed_batch_leaves_other_sessions_alone(db_path):
+    service = SqliteSessionService(db_path)
+    fill_session(service, "s1")
+    fill_session(service, "s2")
+
+    with service.session_batch(APP_NAME, "u", "s2"):
+        # Held until the session batch exits...
+        add_user_query_to_history(service, APP_NAME, "u", "s2", "and a refund?")
+        # ...while a write to s1 rolls back
+        with pytest.raises(RuntimeError):
+            with service.batch():
+                add_user_query_to_history(service, APP_NAME, "u", "s1", "rolled back")
+                raise RuntimeError("commit failed")
+        assert (APP_NAME, "u", "s1") not in service._sessions
+        assert (APP_NAME, "u", "s2") in service._sessions
+
+    reloaded = SqliteSessionService(db_path)
+    assert summary(reloaded, "s1") == EXPECTED
+    assert summary(reloaded, "s2")["history"][-1] == ("user_query", "and a refund?")
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "sessions.snapshot")
+    service = SnapshotSessionService(path)
+    fill_session(service)
+    service.close()
+
+    restarted = SnapshotSessionService(path)
+    try:
+        assert summary(restarted) == EXPECTED
+        # Appends after the restart land in the next snapshot
+        add_user_query_to_history(restarted, APP_NAME, "u", "s1", "thanks")
+    finally:
+        restarted.close()
+
+    again = SnapshotSessionService(path)
+    try:
+        assert summary(again)["history"][-1] == ("user_query", "thanks")
+    finally:
+        again.close()
+
+
+def test_snapshot_leaves_deleted_sessions_out(tmp_path):
+    path = str(tmp_path / "sessions.snapshot")
+    service = SnapshotSessionService(path)
+    fill_session(service, "s1")
+    fill_session(service, "s2")
+    service.close()
+
+    restarted = SnapshotSessionService(path)
+    restarted.delete_session(app_name=APP_NAME, user_id="u", session_id="s1")
+    restarted.close()
+
+    again = SnapshotSessionService(path)
+    try:
+        ids = [s.id for s in again.list_sessions(app_name=APP_NAME, user_id="u").sessions]
+        assert ids == ["s2"]
+    finally:
+        again.close()
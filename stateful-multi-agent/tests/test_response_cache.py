@@ -0,0 +1,102 @@
+import itertools
+from types import SimpleNamespace
+
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from customer_service_agent.response_cache import ResponseCache
+from customer_service_agent.sub_agents.policy_agent.agent import POLICY_TOPICS
+
+INSTRUCTION = "You are the policy agent.\nCustomer: {name}"
+_invocations = itertools.count()
+
+
+def content(role, text):
+    return types.Content(role=role, parts=[types.Part(text=text)])
+
+
+def ask(cache, query, history=(), name="Valued Customer", answer=None):
+    """Run one model call through the cache; returns the cached response or None.
+
+    ``answer`` is what the "model" replies on a miss.
+    """
+    request = LlmRequest(
+        contents=[*history, content("user", query)],
+        config=types.GenerateContentConfig(system_instruction=INSTRUCTION.format(name=name)),
+    )
+    context = SimpleNamespace(
+        invocation_id=f"e-{next(_invocations)}", user_content=content("user", query)
+    )
+    cached = cache.before_model_callback(context, request)
+    if cached is None:
+        response = LlmResponse(content=content("model", answer or f"Answer to {query}"))
+        cache.after_model_callback(context, response)
+    return cached
+
+
+def test_fresh_sessions_share_an_answer():
+    cache = ResponseCache(template=lambda: "catalog v1")
+
+    assert ask(cache, "What is the refund policy?") is None
+    cached = ask(cache, "what is the refund policy")
+    assert cached.content.parts[0].text == "Answer to What is the refund policy?"
+    assert cache.stats.hits == 1
+
+
+REFUNDS = [content("user", "What is the refund policy?"), content("model", "30 days.")]
+PRIVACY = [content("user", "What is the privacy policy?"), content("model", "We keep nothing.")]
+
+
+def test_standalone_questions_are_shared_across_conversations():
+    cache = ResponseCache(template=lambda: "catalog v1", standalone=POLICY_TOPICS.search)
+
+    ask(cache, "Can I use course code commercially?", history=REFUNDS, answer="Yes.")
+    cached = ask(cache, "can I use course code commercially", history=PRIVACY)
+    assert cached.content.parts[0].text == "Yes."
+
+
+def test_follow_ups_depend_on_the_conversation():
+    cache = ResponseCache(template=lambda: "catalog v1", standalone=POLICY_TOPICS.search)
+
+    ask(cache, "why?", history=REFUNDS, answer="Because of refunds.")
+    assert ask(cache, "why?", history=PRIVACY) is None
+    assert ask(cache, "why?", history=REFUNDS).content.parts[0].text == "Because of refunds."
+
+
+def test_without_standalone_only_fresh_sessions_share():
+    cache = ResponseCache(template=lambda: "catalog v1")
+
+    ask(cache, "What is the privacy policy?", history=REFUNDS)
+    assert ask(cache, "What is the privacy policy?") is None
+
+
+def test_answers_are_not_shared_between_users_with_different_prompts():
+    cache = ResponseCache(template=lambda: "catalog v1")
+
+    ask(cache, "Which courses do I own?", name="Jane", answer="Jane owns one course.")
+    assert ask(cache, "Which courses do I own?", name="Ann") is None
+
+
+def test_a_template_change_drops_every_entry():
+    template = ["catalog v1"]
+    cache = ResponseCache(template=lambda: template[0])
+    ask(cache, "What is the refund policy?")
+
+    template[0] = "catalog v2"
+    assert ask(cache, "What is the refund policy?") is None
+    assert cache.stats.invalidations == 1
+
+
+def test_tool_calls_are_never_cached():
+    cache = ResponseCache(template=lambda: "catalog v1")
+    query = "Refund ai_chatbot_mastery"
+    request = LlmRequest(contents=[content("user", query)])
+    context = SimpleNamespace(invocation_id="e-tool", user_content=content("user", query))
+    assert cache.before_model_callback(context, request) is None
+    call = types.Part(function_call=types.FunctionCall(name="refund_course", args={}))
+    cache.after_model_callback(
+        context, LlmResponse(content=types.Content(role="model", parts=[call]))
+    )
+
+    assert cache.stats.stores == 0
@@ -0,0 +1,166 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from conftest import APP_NAME, initial_state
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import FunctionTool, transfer_to_agent
+from google.genai import types
+
+from customer_service_agent import router
+from customer_service_agent.agent import customer_service_agent
+from customer_service_agent.router import FastPathRouter, fast_router
+from utils import call_agent_async
+
+
+def user(text):
+    return types.Content(role="user", parts=[types.Part(text=text)])
+
+
+def request(text, transfer=True):
+    llm_request = LlmRequest(contents=[user(text)])
+    if transfer:
+        llm_request.tools_dict["transfer_to_agent"] = FunctionTool(transfer_to_agent)
+    return llm_request
+
+
+def context(invocation_id="e-1", query=None):
+    return SimpleNamespace(
+        invocation_id=invocation_id, user_content=user(query) if query is not None else None
+    )
+
+
+def route(fast_router, query, invocation_id="e-1"):
+    return fast_router.before_model_callback(context(invocation_id, query), request(query))
+
+
+def handed_back(query):
+    """A request as ADK builds it after sales_agent transfers back to the root agent."""
+    llm_request = request(query)
+    llm_request.contents += [
+        types.Content(
+            role="user",
+            parts=[
+                types.Part(text="For context:"),
+                types.Part(
+                    text="[sales_agent] called tool `transfer_to_agent` with parameters: "
+                    "{'agent_name': 'customer_service'}"
+                ),
+            ],
+        ),
+        types.Content(
+            role="user",
+            parts=[
+                types.Part(text="For context:"),
+                types.Part(
+                    text="[sales_agent] `transfer_to_agent` tool returned result: {'result': None}"
+                ),
+            ],
+        ),
+    ]
+    return llm_request
+
+
+def transferred_to(response):
+    call = response.content.parts[0].function_call
+    assert call.name == "transfer_to_agent"
+    return call.args["agent_name"]
+
+
+@pytest.mark.parametrize(
+    "query, agent_name",
+    [
+        ("I want a refund for ai_chatbot_mastery", "order_agent"),
+        ("What is your refund policy?", "policy_agent"),
+        ("I'm stuck on section 3", "course_support_agent"),
+        ("I'd like to buy a course, what courses do you offer?", "sales_agent"),
+    ],
+)
+def test_clear_queries_skip_the_model(query, agent_name):
+    fast_router = FastPathRouter(enabled=True)
+    response = route(fast_router, query)
+
+    assert transferred_to(response) == agent_name
+    assert fast_router.stats.hits == 1
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "hello there",
+        # One weak signal is not enough
+        "How much does the marketing course cost?",
+        # Two agents score too close to call
+        "I want to buy a course but also get a refund",
+    ],
+)
+def test_unclear_queries_fall_back_to_the_model(query):
+    fast_router = FastPathRouter(enabled=True)
+
+    assert route(fast_router, query) is None
+    assert fast_router.stats.hits == 0
+
+
+def test_a_hand_back_is_left_to_the_model():
+    fast_router = FastPathRouter(enabled=True)
+    query = "I want a refund for ai_chatbot_mastery"
+
+    # Even in a new invocation, the keywords in the hand-back are not routed
+    assert fast_router.before_model_callback(context("e-1", query), handed_back(query)) is None
+    assert fast_router.stats.queries == 0
+
+
+def test_only_the_first_model_call_of_an_invocation_is_routed():
+    fast_router = FastPathRouter(enabled=True)
+    query = "hello there"
+    route(fast_router, query, "e-1")
+
+    # A later call in the same invocation that ends with the user's message
+    assert route(fast_router, "I want a refund for ai_chatbot_mastery", "e-1") is None
+    assert fast_router.stats.queries == 1
+
+
+def test_a_turn_through_a_hand_back_counts_as_one_query(stub_models, monkeypatch):
+    monkeypatch.setattr(fast_router, "enabled", True)
+    monkeypatch.setattr(fast_router, "stats", router.RouterStats())
+    service = InMemorySessionService()
+    session = service.create_session(app_name=APP_NAME, user_id="u", state=initial_state())
+    runner = Runner(agent=customer_service_agent, app_name=APP_NAME, session_service=service)
+
+    # Routed to sales_agent, whose stub model hands it back to the root agent
+    asyncio.run(call_agent_async(runner, "u", session.id, "What courses do you offer?"))
+
+    events = service.get_session(app_name=APP_NAME, user_id="u", session_id=session.id).events
+    assert [event.author for event in events if event.get_function_calls()] == [
+        "customer_service",
+        "sales_agent",
+    ]
+    assert (fast_router.stats.queries, fast_router.stats.hits) == (1, 1)
+
+
+def test_agents_without_transfers_and_a_disabled_router_are_left_alone():
+    query = "I want a refund for ai_chatbot_mastery"
+
+    assert FastPathRouter(enabled=True).before_model_callback(
+        context("e-1", query), request(query, transfer=False)
+    ) is None
+    assert route(FastPathRouter(enabled=False), query) is None
+
+
+def test_model_calls_are_timed_and_forgotten_if_they_never_answer(monkeypatch):
+    fast_router = FastPathRouter(enabled=True)
+    route(fast_router, "hello there", "e-1")
+    answer = LlmResponse(content=types.Content(role="model", parts=[types.Part(text="Hi!")]))
+    fast_router.after_model_callback(context("e-1"), answer)
+    assert fast_router.stats.llm_calls == 1
+    assert fast_router._llm_started == {}
+
+    # e-2 raises in the model, so after_model_callback never runs for it
+    route(fast_router, "hello there", "e-2")
+    monkeypatch.setattr(router, "STALE_CALL_SECONDS", 0)
+    route(fast_router, "hello there", "e-3")
+    assert list(fast_router._llm_started) == ["e-3"]
+    assert list(fast_router._seen) == ["e-3"]
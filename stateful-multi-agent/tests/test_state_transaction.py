@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+from conftest import APP_NAME, initial_state
+from google.adk.events import Event
+from google.adk.events.event_actions import EventActions
+from google.adk.sessions import InMemorySessionService
+
+from interaction_log import get_interaction_log, history_as_list
+from sqlite_session_service import SqliteSessionService
+from state_transaction import TransactionalSessionService, session_turn, turn_transaction
+from utils import add_user_query_to_history
+
+
+def make_service(backend, db_path):
+    inner = SqliteSessionService(db_path) if backend == "sqlite" else InMemorySessionService()
+    # "plain" is a service without transactions: session_turn falls back to a StoreTurn
+    service = inner if backend == "plain" else TransactionalSessionService(inner)
+    session = service.create_session(app_name=APP_NAME, user_id="u", state=initial_state())
+    return service, session.id
+
+
+def write_state(service, session_id, **delta):
+    session = service.get_session(app_name=APP_NAME, user_id="u", session_id=session_id)
+    service.append_event(
+        session, Event(author="user", actions=EventActions(state_delta=delta))
+    )
+
+
+def queries(service, session_id):
+    session = service.get_session(app_name=APP_NAME, user_id="u", session_id=session_id)
+    return [entry["query"] for entry in history_as_list(session.state["interaction_history"])]
+
+
+def run_turn(service, session_id, query, fail=False, **delta):
+    async def turn():
+        async with session_turn(service, APP_NAME, "u", session_id) as transaction:
+            add_user_query_to_history(service, APP_NAME, "u", session_id, query)
+            write_state(service, session_id, **delta)
+            if fail:
+                transaction.rollback()
+
+    asyncio.run(turn())
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_commit_keeps_the_turns_writes(backend, db_path):
+    service, session_id = make_service(backend, db_path)
+    run_turn(service, session_id, "hello", user_name="Ann")
+
+    session = service.get_session(app_name=APP_NAME, user_id="u", session_id=session_id)
+    assert session.state["user_name"] == "Ann"
+    assert queries(service, session_id) == ["hello"]
+
+
+@pytest.mark.parametrize("backend", ["memory", "sqlite"])
+def test_rollback_discards_state_and_history(backend, db_path):
+    service, session_id = make_service(backend, db_path)
+    run_turn(service, session_id, "kept")
+    run_turn(service, session_id, "dropped", fail=True, user_name="Ann")
+
+    session = service.get_session(app_name=APP_NAME, user_id="u", session_id=session_id)
+    assert session.state["user_name"] == "Jane"
+    assert queries(service, session_id) == ["kept"]
+
+
+def test_history_after_a_rollback_is_still_persisted(db_path):
+    service, session_id = make_service("sqlite", db_path)
+    run_turn(service, session_id, "dropped", fail=True)
+    run_turn(service, session_id, "kept")
+
+    reloaded = SqliteSessionService(db_path)
+    session = reloaded.get_session(app_name=APP_NAME, user_id="u", session_id=session_id)
+    assert [entry["query"] for entry in history_as_list(session.state["interaction_history"])] == [
+        "kept"
+    ]
+
+
+def test_nested_turns_commit_once():
+    service, session_id = make_service("memory", None)
+    committed = []
+
+    async def turn():
+        async with session_turn(service, APP_NAME, "u", session_id) as outer:
+            async with session_turn(service, APP_NAME, "u", session_id) as inner:
+                assert inner is outer
+                inner.after_commit(lambda: committed.append("inner"))
+                write_state(service, session_id, user_name="Ann")
+            # The inner exit only left the turn; nothing is committed yet
+            assert committed == []
+            assert service.inner.get_session(
+                app_name=APP_NAME, user_id="u", session_id=session_id
+            ).state["user_name"] == "Jane"
+
+    asyncio.run(turn())
+    assert committed == ["inner"]
+
+
+@pytest.mark.parametrize("backend", ["memory", "plain"])
+@pytest.mark.parametrize("fail", [False, True])
+def test_after_commit_callbacks_run_only_on_commit(backend, fail):
+    service, session_id = make_service(backend, None)
+    called = []
+
+    async def turn():
+        async with session_turn(service, APP_NAME, "u", session_id) as transaction:
+            transaction.after_commit(lambda: called.append(True))
+            if fail:
+                transaction.rollback()
+
+    asyncio.run(turn())
+    assert called == ([] if fail else [True])
+
+
+def test_services_without_transactions_keep_their_held_history_on_commit(db_path):
+    service, session_id = make_service("sqlite", db_path)
+    plain = service.inner
+    with turn_transaction(plain, APP_NAME, "u", session_id):
+        add_user_query_to_history(plain, APP_NAME, "u", session_id, "held")
+        assert plain._held
+
+    assert not plain._held
+    assert queries(SqliteSessionService(db_path), session_id) == ["held"]
+
+
+def test_an_exception_rolls_the_turn_back():
+    service, session_id = make_service("memory", None)
+
+    async def turn():
+        async with session_turn(service, APP_NAME, "u", session_id):
+            add_user_query_to_history(service, APP_NAME, "u", session_id, "boom")
+            raise RuntimeError("model failed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(turn())
+    assert queries(service, session_id) == []
+    assert len(get_interaction_log(service, APP_NAME, "u", session_id)) == 0
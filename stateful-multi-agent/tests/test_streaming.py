@@ -0,0 +1,85 @@
+import asyncio
+import os
+
+import pytest
+import streamlit as st
+from conftest import APP_NAME, initial_state
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from streamlit.testing.v1 import AppTest
+
+from customer_service_agent.agent import customer_service_agent
+from interaction_log import history_as_list
+from sqlite_session_service import SqliteSessionService
+from state_transaction import TransactionalSessionService
+from utils import call_agent_async
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Routed straight to course_support_agent, whose answer is never cached
+QUERY = "I'm stuck on section 3 of the chatbot course"
+ANSWER = f"[course_support_agent] Here is what I can tell you about: {QUERY}"
+
+
+def responses(session):
+    history = history_as_list(session.state["interaction_history"])
+    return [entry for entry in history if entry["action"] == "agent_response"]
+
+
+def test_call_agent_async_streams_chunks_in_order(stub_models):
+    service = TransactionalSessionService(InMemorySessionService())
+    session = service.create_session(app_name=APP_NAME, user_id="u", state=initial_state())
+    runner = Runner(agent=customer_service_agent, app_name=APP_NAME, session_service=service)
+    chunks = []
+
+    final = asyncio.run(
+        call_agent_async(
+            runner, "u", session.id, QUERY, on_partial=lambda *chunk: chunks.append(chunk)
+        )
+    )
+
+    # Each agent announces itself with an empty chunk before it streams
+    assert [name for name, text in chunks if not text] == [
+        "customer_service",
+        "course_support_agent",
+    ]
+    streamed = [text for name, text in chunks if text]
+    assert all(name == "course_support_agent" for name, text in chunks if text)
+    assert len(streamed) > 1
+    assert "".join(streamed) == final == ANSWER
+
+    session = service.get_session(app_name=APP_NAME, user_id="u", session_id=session.id)
+    assert [entry["response"] for entry in responses(session)] == [ANSWER]
+
+
+def test_streaming_turn_writes_chunks_in_order(stub_models, db_path, monkeypatch):
+    monkeypatch.setenv("SESSION_DB_PATH", db_path)
+    monkeypatch.chdir(APP_DIR)
+    st.cache_resource.clear()
+    streamed = []
+
+    def write_stream(stream):
+        # Record what StreamingTurn hands to Streamlit, in arrival order
+        for chunk in stream:
+            streamed.append(chunk)
+        st.markdown("".join(streamed))
+        return "".join(streamed)
+
+    monkeypatch.setattr(st, "write_stream", write_stream)
+
+    at = AppTest.from_file(os.path.join(APP_DIR, "app.py"), default_timeout=60).run()
+    at.chat_input[0].set_value(QUERY).run()
+    assert not at.exception
+
+    assert len(streamed) > 1
+    assert "".join(streamed) == ANSWER
+    assert at.session_state.messages[-1] == {"role": "assistant", "content": ANSWER}
+
+    user_id, session_id = at.session_state.user_id, at.session_state.session_id
+    st.cache_resource.clear()  # closes the app's store so the turn is on disk
+    store = SqliteSessionService(db_path)
+    try:
+        session = store.get_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+        assert [entry["response"] for entry in responses(session)] == [ANSWER]
+    finally:
+        store.close()
@@ -0,0 +1,32 @@
+import asyncio
+import random
+
+import pytest
+
+from benchmarks.stress_sessions import stress, unlocked_turn
+
+WRITES = 200
+SESSIONS = 4
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    random.seed(0)
+
+
+def test_concurrent_turns_lose_no_updates(db_path):
+    result = asyncio.run(stress(db_path, WRITES, SESSIONS))
+
+    assert result.unexpected == []
+    assert result.problems == {}
+    assert result.rolled_back == WRITES // 10
+    # The turns really did overlap on their sessions
+    assert result.lock_waits > 0
+    assert result.locks_left == 0
+
+
+def test_without_the_session_lock_updates_are_lost(db_path):
+    result = asyncio.run(stress(db_path, WRITES, SESSIONS, turn=unlocked_turn, fail_every=0))
+
+    assert result.unexpected == []
+    assert len(result.problems) == SESSIONS
@@ -1,100 +1,52 @@
-from datetime import datetime
+import functools
+import os
+import sys
+import time
 
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.genai import types
 
+from customer_service_agent.history_archive import history_archive
+from customer_service_agent.history_compaction import default_compactor
+from customer_service_agent.owned_courses import OWNED_KEY
+from customer_service_agent.records import ARCHIVE_KEY, DICT_TYPES, HistoryEntry, format_epoch
+from event_log import Colors, TerminalSink, event_log
+from instrumentation import instrumentation
+from interaction_log import get_interaction_log
+from state_transaction import session_turn
+
 
-# ANSI color codes for terminal output
-class Colors:
-    RESET = "\033[0m"
-    BOLD = "\033[1m"
-    UNDERLINE = "\033[4m"
-    ITALIC = "\033[3m"
-    STRIKETHROUGH = "\033[9m"
-
-
-
-    # Foreground colors
-    BLACK = "\033[30m"
-    RED = "\033[31m"
-    GREEN = "\033[32m"
-    YELLOW = "\033[33m"
-    BLUE = "\033[34m"
-    MAGENTA = "\033[35m"
-    CYAN = "\033[36m"
-    WHITE = "\033[37m"
-
-
-    # Bright foreground colors
-    BRIGHT_BLACK = "\033[90m"
-    BRIGHT_RED = "\033[91m"
-    BRIGHT_GREEN = "\033[92m"
-    BRIGHT_YELLOW = "\033[93m"
-    BRIGHT_BLUE = "\033[94m"
-    BRIGHT_MAGENTA = "\033[95m"
-    BRIGHT_CYAN = "\033[96m"
-    BRIGHT_WHITE = "\033[97m"
-
-    # Background colors
-    BG_BLACK = "\033[40m"
-    BG_RED = "\033[41m"
-    BG_GREEN = "\033[42m"
-    BG_YELLOW = "\033[43m"
-    BG_BLUE = "\033[44m"
-    BG_MAGENTA = "\033[45m"
-    BG_CYAN = "\033[46m"
-    BG_WHITE = "\033[47m"
-
-    # Bright background colors
-    BG_BRIGHT_BLACK = "\033[100m"
-    BG_BRIGHT_RED = "\033[101m"
-    BG_BRIGHT_GREEN = "\033[102m"
-    BG_BRIGHT_YELLOW = "\033[103m"
-    BG_BRIGHT_BLUE = "\033[104m"
-    BG_BRIGHT_MAGENTA = "\033[105m"
-    BG_BRIGHT_CYAN = "\033[106m"
-    BG_BRIGHT_WHITE = "\033[107m"
 
 
 
 def update_interaction_history(session_service, app_name, user_id, session_id, entry):
     """Add an entry to the interaction history in state.
 
+    Entries are appended to the session's InteractionLog in O(1); the session
+    itself is not re-read or re-created.
+
     Args:
         session_service: The session service instance
         app_name: The application name
         user_id: The user ID
         session_id: The session ID
-        entry: A dictionary containing the interaction data
+        entry: A HistoryEntry, or a dictionary containing the interaction data
             - requires 'action' key (e.g., 'user_query', 'agent_response')
             - other keys are flexible depending on the action type
     """
     try:
-        # Get current session
-        session = session_service.get_session(
-            app_name=app_name, user_id=user_id, session_id=session_id
+        # Look up the session's append-only log (attached on first use)
+        interaction_log = get_interaction_log(
+            session_service, app_name, user_id, session_id
         )
 
-        # Get current interaction history
-        interaction_history = session.state.get("interaction_history", [])
-
-        # Add timestamp if not already present
-        if "timestamp" not in entry:
-            entry["timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        # Add the entry to interaction history
-        interaction_history.append(entry)
+        # Store a compact record, stamped now unless it already has a time
+        if isinstance(entry, DICT_TYPES) and "timestamp" not in entry:
+            entry = {**entry, "timestamp": format_epoch(int(time.time()))}
+        entry = HistoryEntry.from_dict(entry)
 
-        # Create updated state
-        updated_state = session.state.copy()
-        updated_state["interaction_history"] = interaction_history
-
-        # Create a new session with updated state
-        session_service.create_session(
-            app_name=app_name,
-            user_id=user_id,
-            session_id=session_id,
-            state=updated_state,
-        )
+        # Append the entry; state['interaction_history'] is a view of the log
+        interaction_log.append(entry)
     except Exception as e:
         print(f"Error updating interaction history: {e}")
 
@@ -106,10 +58,7 @@ def add_user_query_to_history(session_service, app_name, user_id, session_id, qu
         app_name,
         user_id,
         session_id,
-        {
-            "action": "user_query",
-            "query": query,
-        },
+        HistoryEntry("user_query", timestamp=int(time.time()), query=query),
     )
 
 
@@ -122,22 +71,121 @@ def add_agent_response_to_history(
         app_name,
         user_id,
         session_id,
-        {
-            "action": "agent_response",
-            "agent": agent_name,
-            "response": response,
-        },
+        HistoryEntry(
+            "agent_response", timestamp=int(time.time()), agent=agent_name, response=response
+        ),
     )
 
 
-def display_state(
-    session_service, app_name, user_id, session_id, label="Current State"
-):
-    """Display the current session state in a formatted way."""
-    try:
-        session = session_service.get_session(
-            app_name=app_name, user_id=user_id, session_id=session_id
-        )
+# Verbosity levels for display_state
+DISPLAY_OFF = "off"
+DISPLAY_SUMMARY = "summary"
+DISPLAY_DIFF = "diff"
+DISPLAY_FULL = "full"
+DISPLAY_LEVELS = (DISPLAY_OFF, DISPLAY_SUMMARY, DISPLAY_DIFF, DISPLAY_FULL)
+
+# owned_courses is an index of purchased_courses, so it is not shown separately
+_CORE_STATE_KEYS = (
+    "user_name",
+    "purchased_courses",
+    "interaction_history",
+    ARCHIVE_KEY,
+    OWNED_KEY,
+)
+
+
+def _format_interaction(idx, interaction):
+    """Format one interaction history entry for display."""
+    # Pretty format dict entries and records, or just show strings
+    if not isinstance(interaction, DICT_TYPES):
+        return f"  {idx}. {interaction}"
+
+    timestamp = interaction.get("timestamp", "unknown time")
+    if type(interaction) is HistoryEntry and not interaction.extra:
+        # Read the record's slots directly; this runs for every entry shown
+        action = interaction.action or "interaction"
+        query = interaction.query or ""
+        agent = interaction.agent or "unknown"
+        response = interaction.response or ""
+    else:
+        action = interaction.get("action", "interaction")
+        query = interaction.get("query", "")
+        agent = interaction.get("agent", "unknown")
+        response = interaction.get("response", "")
+
+    if action == "user_query":
+        return f'  {idx}. User query at {timestamp}: "{query}"'
+    if action == "agent_response":
+        # Truncate very long responses for display
+        if len(response) > 100:
+            response = response[:97] + "..."
+        return f'  {idx}. {agent} response at {timestamp}: "{response}"'
+    details = ", ".join(
+        f"{k}: {v}" for k, v in interaction.items() if k not in ["action", "timestamp"]
+    )
+    return f"  {idx}. {action} at {timestamp}" + (f" ({details})" if details else "")
+
+
+def _format_courses(purchased_courses):
+    if not (purchased_courses and any(purchased_courses)):
+        return ["📚 Courses: None"]
+    lines = ["📚 Courses:"]
+    for course in purchased_courses:
+        if isinstance(course, DICT_TYPES):
+            course_id = course.get("id", "Unknown")
+            purchase_date = course.get("purchase_date", "Unknown date")
+            lines.append(f"  - {course_id} (purchased on {purchase_date})")
+        elif course:  # Handle string format for backward compatibility
+            lines.append(f"  - {course}")
+    return lines
+
+
+class StateRenderer:
+    """Renders session state for the terminal at a configurable verbosity.
+
+    Levels:
+        off: render nothing (and don't fetch the session at all)
+        summary: one line with counts
+        diff: only history entries and keys that changed since the last
+            render of the same session
+        full: the complete state, as before
+
+    Each render is assembled in memory and written to ``stream`` in one call.
+    Without a stream, renders go through the terminal event log when it is
+    the sink, so they stay in order with the trace, and to stdout otherwise.
+    """
+
+    def __init__(self, level=DISPLAY_FULL, stream=None):
+        self.level = level
+        self.stream = stream
+        # Per session: (history generation, rendered history length, key reprs)
+        self._rendered = {}
+
+    @property
+    def level(self):
+        return self._level
+
+    @level.setter
+    def level(self, level):
+        if level not in DISPLAY_LEVELS:
+            raise ValueError(
+                f"Unknown display level '{level}', expected one of {DISPLAY_LEVELS}"
+            )
+        self._level = level
+
+    def _write(self, lines):
+        if self.stream is None and isinstance(event_log.sink, TerminalSink):
+            # Queue behind the turn's trace so the two come out in order
+            event_log.emit("state", text="\n".join(lines))
+            return
+        stream = self.stream or sys.stdout
+        stream.write("\n".join(lines) + "\n")
+        stream.flush()
+
+    def render(self, session, label="Current State"):
+        """Render a session's state according to the current level."""
+        if self.level == DISPLAY_OFF:
+            return
 
         # Choose color based on label
         label_color = Colors.BOLD
@@ -148,157 +196,283 @@ def display_state(
         else:
             label_color += Colors.WHITE
 
+        state = session.state
+        user_name = state.get("user_name", "Unknown")
+        purchased_courses = state.get("purchased_courses", [])
+        interaction_history = state.get("interaction_history", [])
+        other_keys = [k for k in state.keys() if k not in _CORE_STATE_KEYS]
+
+        if self.level == DISPLAY_SUMMARY:
+            self._write(
+                [
+                    f"{label_color}{label}:{Colors.RESET} 👤 {user_name} | "
+                    f"📚 {len(purchased_courses or [])} courses | "
+                    f"📝 {len(interaction_history or [])} interactions | "
+                    f"🔑 {len(other_keys)} other keys"
+                ]
+            )
+            return
+
         # Format the output with clear sections
-        print(f"\n{label_color}{'-' * 10} {label} {'-' * 10}{Colors.RESET}")
-
-        # Handle the user name
-        user_name = session.state.get("user_name", "Unknown")
-        print(f"👤 User: {user_name}")
-
-        # Handle purchased courses
-        purchased_courses = session.state.get("purchased_courses", [])
-        if purchased_courses and any(purchased_courses):
-            print("📚 Courses:")
-            for course in purchased_courses:
-                if isinstance(course, dict):
-                    course_id = course.get("id", "Unknown")
-                    purchase_date = course.get("purchase_date", "Unknown date")
-                    print(f"  - {course_id} (purchased on {purchase_date})")
-                elif course:  # Handle string format for backward compatibility
-                    print(f"  - {course}")
+        lines = [f"\n{label_color}{'-' * 10} {label} {'-' * 10}{Colors.RESET}"]
+        if self.level == DISPLAY_DIFF:
+            self._render_diff(
+                session, lines, user_name, purchased_courses, interaction_history, other_keys
+            )
         else:
-            print("📚 Courses: None")
+            self._render_full(
+                state, lines, user_name, purchased_courses, interaction_history, other_keys
+            )
+        lines.append(f"{label_color}{'-' * (22 + len(label))}{Colors.RESET}")
+        self._write(lines)
+
+    def _render_full(
+        self, state, lines, user_name, purchased_courses, interaction_history, other_keys
+    ):
+        lines.append(f"👤 User: {user_name}")
+        lines.extend(_format_courses(purchased_courses))
+
+        archive = state.get(ARCHIVE_KEY)
+        if archive:
+            lines.append(f"📦 Archived: {archive.get('text')}")
 
         # Handle interaction history in a more readable way
-        interaction_history = session.state.get("interaction_history", [])
         if interaction_history:
-            print("📝 Interaction History:")
+            lines.append("📝 Interaction History:")
             for idx, interaction in enumerate(interaction_history, 1):
-                # Pretty format dict entries, or just show strings
-                if isinstance(interaction, dict):
-                    action = interaction.get("action", "interaction")
-                    timestamp = interaction.get("timestamp", "unknown time")
-
-                    if action == "user_query":
-                        query = interaction.get("query", "")
-                        print(f'  {idx}. User query at {timestamp}: "{query}"')
-                    elif action == "agent_response":
-                        agent = interaction.get("agent", "unknown")
-                        response = interaction.get("response", "")
-                        # Truncate very long responses for display
-                        if len(response) > 100:
-                            response = response[:97] + "..."
-                        print(f'  {idx}. {agent} response at {timestamp}: "{response}"')
-                    else:
-                        details = ", ".join(
-                            f"{k}: {v}"
-                            for k, v in interaction.items()
-                            if k not in ["action", "timestamp"]
-                        )
-                        print(
-                            f"  {idx}. {action} at {timestamp}"
-                            + (f" ({details})" if details else "")
-                        )
-                else:
-                    print(f"  {idx}. {interaction}")
+                lines.append(_format_interaction(idx, interaction))
         else:
-            print("📝 Interaction History: None")
+            lines.append("📝 Interaction History: None")
 
         # Show any additional state keys that might exist
-        other_keys = [
-            k
-            for k in session.state.keys()
-            if k not in ["user_name", "purchased_courses", "interaction_history"]
-        ]
         if other_keys:
-            print("🔑 Additional State:")
+            lines.append("🔑 Additional State:")
             for key in other_keys:
-                print(f"  {key}: {session.state[key]}")
+                lines.append(f"  {key}: {state[key]}")
+
+    def _render_diff(
+        self, session, lines, user_name, purchased_courses, interaction_history, other_keys
+    ):
+        session_key = (session.app_name, session.user_id, session.id)
+        log = getattr(interaction_history, "log", None)
+        generation = log.generation if log is not None else 0
+        last_generation, start, last_values = self._rendered.get(
+            session_key, (generation, 0, {})
+        )
+        # Positions in the log are absolute, so archived entries still count
+        history_length = len(log) if log is not None else len(interaction_history or [])
+        if generation != last_generation or start > history_length:
+            # History was rolled back or archived; show it from the start again
+            start = 0
+        if log is not None:
+            start = max(start, log.offset)
+
+        values = {
+            "user_name": repr(user_name),
+            "purchased_courses": repr(purchased_courses),
+        }
+        values.update({key: repr(session.state[key]) for key in other_keys})
+        changed = [key for key, value in values.items() if last_values.get(key) != value]
+
+        if "user_name" in changed:
+            lines.append(f"👤 User: {user_name}")
+        if "purchased_courses" in changed:
+            lines.extend(_format_courses(purchased_courses))
+        if history_length > start:
+            lines.append(
+                f"📝 New Interactions ({history_length - start} of {history_length}):"
+            )
+            if log is not None:
+                new_entries = log.entries(start)
+            else:
+                new_entries = interaction_history[start:]
+            for idx, interaction in enumerate(new_entries, start + 1):
+                lines.append(_format_interaction(idx, interaction))
+        changed_other = [key for key in other_keys if key in changed]
+        if changed_other:
+            lines.append("🔑 Changed State:")
+            for key in changed_other:
+                lines.append(f"  {key}: {session.state[key]}")
+        if len(lines) == 1:
+            lines.append("(no changes)")
+
+        self._rendered[session_key] = (generation, history_length, values)
+
+    def forget(self, app_name, user_id, session_id):
+        """Drop the diff position for a session."""
+        self._rendered.pop((app_name, user_id, session_id), None)
+
+
+state_renderer = StateRenderer(level=os.getenv("STATE_DISPLAY_LEVEL", DISPLAY_FULL))
 
-        print(f"{label_color}{'-' * (22 + len(label))}{Colors.RESET}")
+
+def set_display_level(level):
+    """Set the verbosity used by display_state (off, summary, diff, full)."""
+    state_renderer.level = level
+
+
+def display_state(
+    session_service, app_name, user_id, session_id, label="Current State"
+):
+    """Display the current session state in a formatted way.
+
+    Verbosity is controlled by set_display_level() or STATE_DISPLAY_LEVEL.
+    """
+    if state_renderer.level == DISPLAY_OFF:
+        return
+    try:
+        session = session_service.get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+        state_renderer.render(session, label)
     except Exception as e:
         print(f"Error displaying state: {e}")
 
-async def process_agent_response(event):
-    """Process and display agent response events."""
-    print(f"Event ID: {event.id}, Author: {event.author}")
 
-    # Check for specific parts first
-    has_specific_part = False
+async def process_agent_response(event, session_id=None):
+    """Log an agent event; returns the final response text, if this is it.
+
+    Records go to event_log, whose writer thread does the terminal output.
+    """
+    texts = []
     if event.content and event.content.parts:
         for part in event.content.parts:
-            if hasattr(part, "text") and part.text and not part.text.isspace():
-                print(f"  Text: '{part.text.strip()}'")
+            if part.text and not part.text.isspace():
+                texts.append(part.text.strip())
+    event_log.emit(
+        "event", session_id=session_id, event_id=event.id, author=event.author, texts=texts
+    )
 
-    # Check for final response after specific parts
     final_response = None
-    if not has_specific_part and event.is_final_response():
-        if (
-            event.content
-            and event.content.parts
-            and hasattr(event.content.parts[0], "text")
-            and event.content.parts[0].text
-        ):
+    if event.is_final_response():
+        if event.content and event.content.parts and event.content.parts[0].text:
             final_response = event.content.parts[0].text.strip()
-            # Use colors and formatting to make the final response stand out
-            print(
-                f"\n{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD} || ----------------- AGENT RESPONSE ----------------- || {Colors.RESET}"
-            )
-            print(f"{Colors.CYAN}{Colors.BOLD}{final_response}{Colors.RESET}")
-            print(
-                f"{Colors.BG_BLUE}{Colors.WHITE}{Colors.BOLD} || ----------------- END OF AGENT RESPONSE ------------- || {Colors.RESET}\n"
-            )
-        else:
-            print(
-                f"\n{Colors.BG_RED}{Colors.WHITE}{Colors.BOLD} ==> Final Agent Response: [No text content in final event]{Colors.RESET}\n"
-            )
+        event_log.emit(
+            "response", session_id=session_id, author=event.author, text=final_response
+        )
 
     return final_response
 
 
-async def call_agent_async(runner, user_id, session_id, query):
-    """Call the agent asynchronously with the user's query."""
-    content = types.Content(role="user", parts=[types.Part(text=query)])
-    print(
-        f"\n{Colors.BG_GREEN}{Colors.BLACK}{Colors.BOLD}--- Running Query: {query} ---{Colors.RESET}"
-    )
-    final_response_text = None
-    agent_name = None
-
-    # Display state before processing the message
-    display_state(
-        runner.session_service,
-        runner.app_name,
-        user_id,
-        session_id,
-        "State BEFORE processing",
-    )
-
+def archive_history(session_service, app_name, user_id, session_id):
+    """Move a session's oldest interactions to the history archive, if due."""
     try:
-        async for event in runner.run_async(
-            user_id=user_id, session_id=session_id, new_message=content
-        ):
-            # Capture the agent name from the event if available
-            if event.author:
-                agent_name = event.author
-
-            response = await process_agent_response(event)
-            if response:
-                final_response_text = response
+        archived = history_archive.maybe_archive(session_service, app_name, user_id, session_id)
+        if archived:
+            event_log.emit(
+                "note", session_id=session_id, message=f"Archived {archived} old interactions"
+            )
     except Exception as e:
-        print(f"{Colors.BG_RED}{Colors.WHITE}ERROR during agent run: {e}{Colors.RESET}")
+        print(f"Error archiving interaction history: {e}")
+
+
+async def call_agent_async(runner, user_id, session_id, query, on_partial=None, raise_errors=False):
+    """Call the agent asynchronously with the user's query.
 
-    # Add the agent response to interaction history if we got a final response
-    if final_response_text and agent_name:
-        add_agent_response_to_history(
+    If ``on_partial(agent_name, text)`` is given, the model output is streamed
+    and the callback receives each text chunk as it arrives. It is also called
+    with empty text whenever another agent takes over the turn.
+
+    A failed run is logged, rolled back and returns None; with
+    ``raise_errors=True`` its exception is re-raised once the turn is closed.
+    """
+    content = types.Content(role="user", parts=[types.Part(text=query)])
+    event_log.emit("query", user_id=user_id, session_id=session_id, query=query)
+    final_response_text = None
+    agent_name = None
+    error = None
+    failure = None
+    # None unless INSTRUMENTATION_DIR is set
+    trace = instrumentation.start_turn(runner.app_name, user_id, session_id, query)
+
+    # Wait for any other turn on this session, then buffer every state
+    # write made during this turn and commit it once
+    async with session_turn(
+        runner.session_service, runner.app_name, user_id, session_id
+    ) as transaction:
+        # Display state before processing the message
+        display_state(
             runner.session_service,
             runner.app_name,
             user_id,
             session_id,
-            agent_name,
-            final_response_text,
+            "State BEFORE processing",
         )
 
+        try:
+            async for event in runner.run_async(
+                user_id=user_id,
+                session_id=session_id,
+                new_message=content,
+                run_config=RunConfig(
+                    streaming_mode=StreamingMode.SSE if on_partial else StreamingMode.NONE
+                ),
+            ):
+                if trace:
+                    trace.record(event)
+
+                if on_partial and event.author and event.author != agent_name:
+                    on_partial(event.author, "")
+
+                # Capture the agent name from the event if available
+                if event.author:
+                    agent_name = event.author
+
+                if event.partial:
+                    if on_partial and event.content and event.content.parts:
+                        text = "".join(part.text or "" for part in event.content.parts)
+                        if text:
+                            on_partial(event.author, text)
+                    # The complete text follows in a final, non-partial event
+                    continue
+
+                response = await process_agent_response(event, session_id)
+                if response:
+                    final_response_text = response
+        except Exception as e:
+            event_log.emit("error", session_id=session_id, message=str(e))
+            error = str(e)
+            failure = e
+            # Discard the partial writes of the failed run
+            transaction.rollback()
+            final_response_text = None
+
+        # Add the agent response to interaction history if we got a final response
+        if final_response_text and agent_name:
+            add_agent_response_to_history(
+                runner.session_service,
+                runner.app_name,
+                user_id,
+                session_id,
+                agent_name,
+                final_response_text,
+            )
+            # Move old history to cold storage, but only once the turn is
+            # committed: archived segment files can't be rolled back
+            transaction.after_commit(
+                functools.partial(
+                    archive_history, runner.session_service, runner.app_name, user_id, session_id
+                )
+            )
+
+    instrumentation.finish_turn(trace, agent_name, error)
+
+    # Report the prompt tokens saved by history compaction this turn
+    try:
+        saved_tokens = default_compactor.pop_saved_tokens(
+            get_interaction_log(
+                runner.session_service, runner.app_name, user_id, session_id
+            )
+        )
+        if saved_tokens:
+            event_log.emit(
+                "note",
+                session_id=session_id,
+                message=f"History compaction saved ~{saved_tokens} prompt tokens this turn",
+            )
+    except Exception as e:
+        print(f"Error reading history compaction stats: {e}")
+
     # Display state after processing the message
     display_state(
         runner.session_service,
@@ -308,5 +482,7 @@ async def call_agent_async(runner, user_id, session_id, query):
         "State AFTER processing",
     )
 
-    print(f"{Colors.YELLOW}{'-' * 30}{Colors.RESET}")
+    event_log.emit("turn_end", session_id=session_id)
+    if failure is not None and raise_errors:
+        raise failure
     return final_response_text
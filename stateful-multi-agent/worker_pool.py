@@ -0,0 +1,358 @@
+"""Multi-process serving: N worker processes, each with its own Runner.
+
+One process runs all of our own code (JSON, templating, tools, display) on a
+single core. A WorkerPool starts ``workers`` processes, each with its own
+customer_service_agent and Runner, and routes every request for a session
+to the same worker (crc32 of the session id modulo the pool size), so the
+session stays in that worker's cache. Workers are forked from a forkserver
+that imports the agent tree once, so starting or restarting one takes well
+under a second instead of a full google.adk import.
+
+All workers share one SQLite session store (WAL mode; batches take the write
+lock up front, so concurrent writers wait instead of failing). If a worker
+dies, its in-flight requests fail with WorkerError and it is restarted under
+the same index; the new process loads its sessions back from the store.
+
+Usage:
+    pool = WorkerPool(workers=4, db_path="sessions.db")
+    session_id = pool.create_session("user_1", initial_state).result()
+    response = await asyncio.wrap_future(pool.run_turn("user_1", session_id, "Hi"))
+    pool.close()
+"""
+
+import asyncio
+import contextlib
+import itertools
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import time
+import types
+import uuid
+import zlib
+from concurrent.futures import Future
+
+from customer_service_agent.agent import customer_service_agent
+from event_log import event_log, set_event_sink
+from google.adk.runners import Runner
+from instrumentation import instrumentation
+from interaction_log import history_as_list
+from sqlite_session_service import SqliteSessionService
+from state_transaction import TransactionalSessionService, session_turn
+from utils import add_user_query_to_history, call_agent_async, set_display_level
+
+APP_NAME = "Customer Support"
+
+# How often the result reader checks that every worker is still alive
+HEALTH_CHECK_SECONDS = 0.5
+
+
+class WorkerError(RuntimeError):
+    """A request failed in its worker, or was lost when the worker died."""
+
+
+def worker_index(key, workers):
+    """The worker ``key`` is pinned to; the same in every process and run."""
+    return zlib.crc32(key.encode("utf-8")) % workers
+
+
+# ----------------------------------------------------
+# Worker process
+# ----------------------------------------------------
+async def _handle(runner, results, request_id, kind, args):
+    session_service = runner.session_service
+    app_name = runner.app_name
+    try:
+        if kind == "turn":
+            user_id, session_id, query, stream = args
+
+            def on_partial(agent_name, text):
+                results.put((request_id, "partial", (agent_name, text)))
+
+            async with session_turn(session_service, app_name, user_id, session_id):
+                add_user_query_to_history(session_service, app_name, user_id, session_id, query)
+                value = await call_agent_async(
+                    runner, user_id, session_id, query, on_partial=on_partial if stream else None
+                )
+        elif kind == "create_session":
+            user_id, session_id, state = args
+            value = session_service.create_session(
+                app_name=app_name, user_id=user_id, state=state, session_id=session_id
+            ).id
+        elif kind == "history":
+            user_id, session_id = args
+            session = session_service.get_session(
+                app_name=app_name, user_id=user_id, session_id=session_id
+            )
+            value = history_as_list(session.state.get("interaction_history")) if session else None
+        elif kind == "latest_session":
+            (user_id,) = args
+            sessions = session_service.list_sessions(app_name=app_name, user_id=user_id).sessions
+            value = sessions[-1].id if sessions else None
+        else:
+            raise ValueError(f"Unknown request kind '{kind}'")
+        results.put((request_id, "done", value))
+    except Exception as e:
+        results.put((request_id, "error", f"{type(e).__name__}: {e}"))
+
+
+async def _serve(db_path, app_name, requests, results, initializer):
+    # customer_service_agent here is this process's own copy of the tree
+    if initializer:
+        initializer(customer_service_agent)
+    session_service = TransactionalSessionService(SqliteSessionService(db_path))
+    runner = Runner(
+        agent=customer_service_agent, app_name=app_name, session_service=session_service
+    )
+
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    while (request := await loop.run_in_executor(None, requests.get)) is not None:
+        task = asyncio.create_task(_handle(runner, results, *request))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    # Finish what was already accepted before shutting down
+    if tasks:
+        await asyncio.gather(*tasks)
+    session_service.close()
+
+
+def _worker_main(db_path, app_name, requests, results, initializer, verbose):
+    set_display_level("off")
+    if not verbose:
+        set_event_sink("off")
+    with contextlib.ExitStack() as stack:
+        if not verbose:
+            devnull = stack.enter_context(open(os.devnull, "w"))
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+        try:
+            asyncio.run(_serve(db_path, app_name, requests, results, initializer))
+        finally:
+            # Worker processes skip atexit handlers; write what is still queued
+            instrumentation.close()
+            event_log.close()
+
+
+# ----------------------------------------------------
+# Pool (parent process)
+# ----------------------------------------------------
+@contextlib.contextmanager
+def _without_main_module():
+    """Keep a worker (or the forkserver) from re-running the parent's __main__ script.
+
+    Streamlit executes app.py as __main__, so a worker would otherwise run
+    the whole app (and start another pool) on import. Workers only need
+    this module.
+    """
+    main_module = sys.modules.get("__main__")
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main_module
+
+
+def _worker_context(start_method=None):
+    """Fork workers from a server process that has already imported the agent.
+
+    Not plain fork: the parent may already be running threads. A spawned
+    worker would re-import google.adk and rebuild the agent tree on every
+    (re)start, which takes seconds; the forkserver does that once and each
+    worker is forked from it in milliseconds. Spawn where there is no
+    forkserver (Windows), or if ``start_method`` says so.
+    """
+    if start_method is None and "forkserver" in multiprocessing.get_all_start_methods():
+        start_method = "forkserver"
+    if start_method != "forkserver":
+        return multiprocessing.get_context(start_method or "spawn")
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+class WorkerPool:
+    """Routes requests to worker processes by session id.
+
+    Every method returns a concurrent.futures.Future; use
+    ``asyncio.wrap_future`` to await one. ``initializer(agent)``, if given,
+    runs in each worker on its root agent before it starts serving (e.g. to
+    install stub models) and must be picklable. ``start_method`` overrides
+    how workers are started ("forkserver" where available, else "spawn").
+    """
+
+    def __init__(
+        self,
+        workers=None,
+        db_path="sessions.db",
+        app_name=APP_NAME,
+        initializer=None,
+        verbose=False,
+        start_method=None,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.db_path = db_path
+        self.app_name = app_name
+        self.initializer = initializer
+        self.verbose = verbose
+        self.restarts = 0
+        self._context = _worker_context(start_method)
+        self._results = self._context.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        # Set by close(): no new requests and no restarts, then stop reading
+        self._closing = False
+        self._closed = False
+        self._processes = [None] * self.workers
+        self._requests = [None] * self.workers
+        for index in range(self.workers):
+            self._start(index)
+        self._reader = threading.Thread(
+            target=self._read_results, name="worker-pool-results", daemon=True
+        )
+        self._reader.start()
+
+    def _start(self, index):
+        requests = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(
+                self.db_path,
+                self.app_name,
+                requests,
+                self._results,
+                self.initializer,
+                self.verbose,
+            ),
+            name=f"agent-worker-{index}",
+            daemon=True,
+        )
+        with _without_main_module():
+            process.start()
+        self._requests[index] = requests
+        self._processes[index] = process
+
+    def _fail_pending(self, index, message):
+        with self._lock:
+            lost = [
+                request_id
+                for request_id, (worker, _, _) in self._pending.items()
+                if index is None or worker == index
+            ]
+            entries = [self._pending.pop(request_id) for request_id in lost]
+        for _, future, _ in entries:
+            future.set_exception(WorkerError(message))
+
+    def _check_workers(self):
+        for index, process in enumerate(self._processes):
+            if self._closing or process.is_alive():
+                continue
+            print(f"Worker {index} exited with code {process.exitcode}; restarting")
+            self._fail_pending(index, f"worker {index} exited with code {process.exitcode}")
+            self._start(index)
+            self.restarts += 1
+
+    def _read_results(self):
+        last_check = time.monotonic()
+        while not self._closed:
+            try:
+                request_id, kind, value = self._results.get(timeout=HEALTH_CHECK_SECONDS)
+            except queue.Empty:
+                request_id = None
+            except (EOFError, OSError):
+                break
+            if time.monotonic() - last_check >= HEALTH_CHECK_SECONDS:
+                self._check_workers()
+                last_check = time.monotonic()
+            if request_id is None:
+                continue
+
+            with self._lock:
+                entry = self._pending.get(request_id)
+                if entry is not None and kind != "partial":
+                    del self._pending[request_id]
+            if entry is None:
+                continue
+            _, future, on_partial = entry
+            if kind == "partial":
+                if on_partial:
+                    on_partial(*value)
+            elif kind == "done":
+                future.set_result(value)
+            else:
+                future.set_exception(WorkerError(value))
+
+    def _submit(self, key, kind, args, on_partial=None):
+        if self._closing:
+            raise WorkerError("worker pool is closed")
+        index = worker_index(key, self.workers)
+        future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            self._pending[request_id] = (index, future, on_partial)
+            requests = self._requests[index]
+        requests.put((request_id, kind, args))
+        return future
+
+    def run_turn(self, user_id, session_id, query, on_partial=None):
+        """Run one turn on the session's worker; resolves to the response text.
+
+        ``on_partial(agent_name, text)`` streams the response as in
+        call_agent_async; it is called on the pool's reader thread.
+        """
+        return self._submit(
+            session_id, "turn", (user_id, session_id, query, on_partial is not None), on_partial
+        )
+
+    def create_session(self, user_id, state=None, session_id=None):
+        """Create a session on the worker it will live on; resolves to its id."""
+        session_id = session_id or str(uuid.uuid4())
+        return self._submit(session_id, "create_session", (user_id, session_id, state))
+
+    def history(self, user_id, session_id):
+        """Resolves to the session's interaction history as a list (None if missing)."""
+        return self._submit(session_id, "history", (user_id, session_id))
+
+    def latest_session(self, user_id):
+        """Resolves to the id of the user's most recently updated session, or None."""
+        return self._submit(user_id, "latest_session", (user_id,))
+
+    def close(self, timeout=10.0):
+        """Let workers finish their accepted requests, then stop them."""
+        if self._closing:
+            return
+        self._closing = True
+        for requests in self._requests:
+            requests.put(None)
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self._closed = True
+        self._reader.join()
+        # Results that were still queued
+        while True:
+            try:
+                request_id, kind, value = self._results.get_nowait()
+            except (queue.Empty, EOFError, OSError):
+                break
+            with self._lock:
+                entry = self._pending.pop(request_id, None) if kind != "partial" else None
+            if entry is not None:
+                _, future, _ = entry
+                if kind == "done":
+                    future.set_result(value)
+                else:
+                    future.set_exception(WorkerError(value))
+        self._fail_pending(None, "worker pool closed")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False